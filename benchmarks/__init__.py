@@ -0,0 +1,7 @@
+"""
+Benchmarks (run from the repo root):
+
+    python -m benchmarks.startup      # CLI import time + heavy-module check
+    python -m benchmarks.pipeline     # per-stage files/s, MB/s, peak RSS vs baseline.json
+    python -m benchmarks.synth        # just generate a synthetic tree (seeded)
+"""
@@ -0,0 +1,455 @@
+"""
+pipeline.py
+-----------
+How fast is each stage, and how much memory does it take?
+
+What this script does:
+- Generates a synthetic tree (benchmarks/synth.py) from a seed and a profile
+- Runs the stages on it, in order, each in a fresh interpreter
+  (so peak RSS is that stage's own, not the leftovers of the one before):
+    organize   organize_folder, recursive, journaled (collision sets included)
+    report     generate_excel_report from the journal
+    backup     zip_folder of the organized tree
+    cleanup    cleanup_old_backups over many old zips
+    restore    restore_run of the organize run (every file back to its place)
+    safe_move  safe_move of the whole restored tree into one flat folder
+               (one DestinationIndex; every same-named file collides)
+- Checks every stage's counts against the tree (a stage that organizes, backs
+  up or restores fewer files than the tree has fails the run, however fast)
+- Reports files/s, MB/s and peak RSS per stage (median of --repeat runs)
+- Compares against benchmarks/baseline.json and fails past the thresholds
+
+Usage (from the repo root):
+    python -m benchmarks.pipeline                              # small profile
+    python -m benchmarks.pipeline --profile medium --repeat 3
+    python -m benchmarks.pipeline --stages organize,backup --files 1000000 --median-kb 1
+    python -m benchmarks.pipeline --save-baseline              # store this machine's numbers
+
+The baseline holds one entry per profile. Numbers only compare on the same
+machine: save it on the box (or CI runner) the checks run on.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synth import MB, PROFILES, REPO_ROOT, generate_tree
+
+
+STAGES = ["organize", "report", "backup", "cleanup", "restore", "safe_move"]
+
+BASELINE_FILE = REPO_ROOT / "benchmarks" / "baseline.json"
+
+# Old zips the cleanup stage has to sort through (keeps CLEANUP_KEEP)
+CLEANUP_ARCHIVES = 500
+CLEANUP_KEEP = 5
+
+
+# Peak memory
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where it cannot be read)."""
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def _peak_rss_windows() -> Optional[float]:
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                "PagefileUsage", "PeakPagefileUsage")]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    return counters.PeakWorkingSetSize / MB if ok else None
+
+
+# Stages (run inside the child process; work = the benchmark folder)
+#
+# Layout of work:
+#   base/        the synthetic tree (base/Organized/ after organize)
+#   runs/        run journal of the organize stage
+#   report.xlsx, cleanup/, flat/
+
+def _config() -> Dict[str, Any]:
+    return json.loads((REPO_ROOT / "config" / "rules.json").read_text(encoding="utf-8"))
+
+
+def stage_organize(work: Path, workers: int) -> Dict[str, Any]:
+    from src.journal import RunJournal
+    from src.organizer import organize_folder
+
+    cfg = _config()
+    journal = RunJournal(runs_dir=work / "runs")
+    with journal:
+        _, summary = organize_folder(
+            base_folder=work / "base",
+            target_root_folder="Organized",
+            categories=cfg["categories"],
+            unknown_category=cfg["unknown_category"],
+            ignore_folders=["Organized"],
+            workers=workers,
+            recursive=True,
+            max_depth=None,
+            on_record=journal.append,
+            collect=False
+        )
+        journal.close(summary)
+
+    return {
+        "files": summary["moved_count"],
+        "bytes": sum(b for _, b in summary["aggregates"]["categories"].values()),
+        "collisions": summary["ops"]["collisions"],
+    }
+
+
+def stage_report(work: Path, workers: int) -> Dict[str, Any]:
+    from src.journal import iter_records, latest_run, read_summary, run_path
+    from src.reporter import generate_excel_report
+
+    path = run_path(latest_run(work / "runs"), work / "runs")
+    summary = read_summary(path)
+    report_path = work / "report.xlsx"
+    generate_excel_report(iter_records(path), report_path, aggregates=summary.get("aggregates"))
+    return {"files": summary["moved_count"], "output_bytes": report_path.stat().st_size}
+
+
+def stage_backup(work: Path, workers: int) -> Dict[str, Any]:
+    from src.backup import zip_folder
+    from src.compression import CompressionStats
+
+    stats = CompressionStats()
+    zip_path = work / "base" / "Organized" / "_backups" / "backup_bench.zip"
+    zip_folder(work / "base" / "Organized", zip_path, skip_dir_names=["_backups"],
+               workers=workers, stats=stats)
+    total = stats.overall()
+    size = zip_path.stat().st_size
+    zip_path.unlink()
+    return {"files": total["files"], "bytes": total["bytes_in"], "archive_bytes": size}
+
+
+def stage_cleanup(work: Path, workers: int) -> Dict[str, Any]:
+    from src.backup import cleanup_old_backups
+
+    deleted = cleanup_old_backups(work / "cleanup", keep_last=CLEANUP_KEEP)
+    return {"files": CLEANUP_ARCHIVES, "deleted": len(deleted)}
+
+
+def _prepare_cleanup(work: Path) -> None:
+    """Old zips, one minute apart (made before the clock starts)."""
+    folder = work / "cleanup"
+    folder.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    for i in range(CLEANUP_ARCHIVES):
+        path = folder / f"backup_{i:05d}.zip"
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("file.txt", "x")
+        os.utime(path, (now - i * 60, now - i * 60))
+
+
+def stage_restore(work: Path, workers: int) -> Dict[str, Any]:
+    from src.journal import iter_records, latest_run, run_path
+    from src.restore import restore_run
+
+    path = run_path(latest_run(work / "runs"), work / "runs")
+    counts = restore_run(iter_records(path), workers=workers)
+    return {"files": counts["restored"], "missing": counts["missing"]}
+
+
+def stage_safe_move(work: Path, workers: int) -> Dict[str, Any]:
+    from src.organizer import DestinationIndex, safe_move
+    from src.walker import walk_files
+
+    flat = work / "flat"
+    flat.mkdir(exist_ok=True)
+    index = DestinationIndex()
+    files = size = 0
+    for entry in walk_files(work / "base", skip_dir_names=["Organized"], max_depth=None):
+        safe_move(Path(entry.path), flat / entry.name, index)
+        files += 1
+        size += entry.size
+    return {"files": files, "bytes": size, "collisions": index.collisions}
+
+
+STAGE_FUNCS: Dict[str, Callable[[Path, int], Dict[str, Any]]] = {
+    "organize": stage_organize,
+    "report": stage_report,
+    "backup": stage_backup,
+    "cleanup": stage_cleanup,
+    "restore": stage_restore,
+    "safe_move": stage_safe_move,
+}
+
+
+def run_child(stage: str, work: Path, workers: int) -> Dict[str, Any]:
+    """One stage in this process: timings, counts and peak RSS."""
+    if stage == "cleanup":
+        _prepare_cleanup(work)
+    start = time.perf_counter()
+    result = STAGE_FUNCS[stage](work, workers)
+    seconds = time.perf_counter() - start
+
+    result["seconds"] = round(seconds, 4)
+    result["rss_peak_mb"] = peak_rss_mb()
+    if seconds > 0:
+        result["files_per_s"] = round(result["files"] / seconds, 1)
+        if "bytes" in result:
+            result["mb_per_s"] = round(result["bytes"] / MB / seconds, 2)
+    return result
+
+
+# Count checks
+
+def check_counts(stage: str, row: Dict[str, Any], tree: Dict[str, Any]) -> List[str]:
+    """
+    What the stage should have done to this tree, vs what it reports ([] if all match).
+    Every stage handles every file of the tree once (organize has no dedupe here).
+    """
+    expected: Dict[str, Any] = {
+        "organize": {"files": tree["files"], "bytes": tree["bytes"]},
+        "report": {"files": tree["files"]},
+        "backup": {"files": tree["files"], "bytes": tree["bytes"]},
+        "cleanup": {"deleted": CLEANUP_ARCHIVES - CLEANUP_KEEP},
+        "restore": {"files": tree["files"], "missing": 0},
+        "safe_move": {"files": tree["files"], "bytes": tree["bytes"]},
+    }[stage]
+    return [f"{stage}: {key} = {row.get(key)}, expected {value}"
+            for key, value in expected.items() if row.get(key) != value]
+
+
+# Runner
+
+def run_stage(stage: str, work: Path, workers: int) -> Dict[str, Any]:
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.pipeline", "--child", stage, "--work", str(work),
+         "--workers", str(workers)],
+        cwd=work, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"stage {stage} failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _with_prerequisites(stages: List[str]) -> List[str]:
+    """
+    stages plus the ones they need run first (untimed), in pipeline order:
+    report / backup / restore need an organized tree; safe_move after an
+    organize needs the files restored first.
+    """
+    wanted = set(stages)
+    if wanted & {"report", "backup", "restore"}:
+        wanted.add("organize")
+    if {"organize", "safe_move"} <= wanted:
+        wanted.add("restore")
+    return [s for s in STAGES if s in wanted]
+
+
+def run_suite(
+    profile: str,
+    seed: int,
+    stages: List[str],
+    repeat: int,
+    workers: int,
+    overrides: Dict[str, Any],
+    keep: Optional[Path] = None
+) -> Dict[str, Any]:
+    """
+    repeat x (fresh tree + every stage in order).
+
+    Returns:
+        {"profile", "seed", "files", "bytes", "stages": {stage: median row}}
+
+    Raises RuntimeError if a stage's counts do not match the tree (check_counts).
+    """
+    runs: Dict[str, List[Dict[str, Any]]] = {s: [] for s in STAGES if s in stages}
+    tree: Dict[str, Any] = {}
+
+    for i in range(repeat):
+        work = keep or Path(tempfile.mkdtemp(prefix="autodesktop_bench_"))
+        try:
+            if keep is not None and work.exists():
+                shutil.rmtree(work)
+            work.mkdir(parents=True, exist_ok=True)
+
+            t = time.perf_counter()
+            tree = generate_tree(work / "base", profile, seed, **overrides)
+            print(f"[{i + 1}/{repeat}] tree: {tree['files']} files, {tree['bytes'] / MB:.1f} MB "
+                  f"({time.perf_counter() - t:.1f} s)")
+
+            for stage in _with_prerequisites(stages):
+                row = run_stage(stage, work, workers)
+                # Prerequisites too: later stages measure nothing useful on a half-done tree
+                problems = check_counts(stage, row, tree)
+                if problems:
+                    raise RuntimeError("counts do not match the tree:\n  " + "\n  ".join(problems))
+                if stage not in stages:
+                    continue
+                runs[stage].append(row)
+                print(f"  {stage:<10} {row['seconds']:8.2f} s")
+        finally:
+            if keep is None:
+                shutil.rmtree(work, ignore_errors=True)
+
+    return {
+        "profile": profile,
+        "seed": seed,
+        "files": tree.get("files"),
+        "bytes": tree.get("bytes"),
+        "stages": {stage: _median_row(rows) for stage, rows in runs.items() if rows},
+    }
+
+
+def _median_row(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of every numeric value across the repeats (peak RSS: the highest)."""
+    out: Dict[str, Any] = {}
+    for key in rows[0]:
+        values = [r[key] for r in rows if isinstance(r.get(key), (int, float))]
+        if not values:
+            out[key] = rows[0][key]
+        elif key == "rss_peak_mb":
+            out[key] = round(max(values), 1)
+        else:
+            out[key] = round(statistics.median(values), 4)
+    return out
+
+
+# Baseline
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_slowdown: float, max_rss_growth: float) -> List[str]:
+    """Regressions against one baseline entry ([] if none)."""
+    if baseline.get("files") != result["files"] or baseline.get("seed") != result["seed"]:
+        return [f"baseline is for a different tree ({baseline.get('files')} files, seed {baseline.get('seed')}); "
+                f"save a new one with --save-baseline"]
+
+    problems = []
+    for stage, row in result["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        if base.get("files_per_s") and row.get("files_per_s") is not None:
+            ratio = row["files_per_s"] / base["files_per_s"]
+            if ratio < 1 - max_slowdown:
+                problems.append(f"{stage}: {row['files_per_s']:.0f} files/s is {1 - ratio:.0%} "
+                                f"below the baseline {base['files_per_s']:.0f}")
+        if base.get("rss_peak_mb") and row.get("rss_peak_mb") is not None:
+            growth = row["rss_peak_mb"] / base["rss_peak_mb"] - 1
+            if growth > max_rss_growth:
+                problems.append(f"{stage}: peak RSS {row['rss_peak_mb']:.1f} MB is {growth:.0%} "
+                                f"above the baseline {base['rss_peak_mb']:.1f} MB")
+    return problems
+
+
+def _load_baselines(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def _save_baseline(path: Path, result: Dict[str, Any]) -> None:
+    baselines = _load_baselines(path)
+    baselines[result["profile"]] = result
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def print_table(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"\nprofile {result['profile']}, seed {result['seed']}: "
+          f"{result['files']} files, {result['bytes'] / MB:.1f} MB")
+    print(f"  {'stage':<10} {'seconds':>9} {'files/s':>10} {'MB/s':>8} {'peak MB':>8}  vs baseline")
+    for stage, row in result["stages"].items():
+        vs = ""
+        base = (baseline or {}).get("stages", {}).get(stage)
+        if base and base.get("files_per_s") and row.get("files_per_s"):
+            vs = f"{row['files_per_s'] / base['files_per_s'] - 1:+.0%} files/s"
+        mb_s = f"{row['mb_per_s']:.1f}" if row.get("mb_per_s") is not None else "-"
+        rss = f"{row['rss_peak_mb']:.1f}" if row.get("rss_peak_mb") is not None else "-"
+        print(f"  {stage:<10} {row['seconds']:9.2f} {row.get('files_per_s', 0):10.0f} {mb_s:>8} {rss:>8}  {vs}")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark the AutoDesktop stages on a synthetic tree")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated, from: {', '.join(STAGES)}")
+    p.add_argument("--repeat", type=int, default=1, help="runs per stage (median is reported)")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--files", type=int, default=None, help="override the profile's file count")
+    p.add_argument("--median-kb", type=float, default=None, help="override the profile's median file size")
+    p.add_argument("--keep", default=None, help="work in this folder and keep it (default: a temp folder)")
+    p.add_argument("--baseline", default=str(BASELINE_FILE))
+    p.add_argument("--save-baseline", action="store_true", help="store the results as the baseline of this profile")
+    p.add_argument("--max-slowdown", type=float, default=0.25, help="fail if files/s drops by more than this")
+    p.add_argument("--max-rss-growth", type=float, default=0.25, help="fail if peak RSS grows by more than this")
+    p.add_argument("--json", default=None, help="also write the results to this file")
+    p.add_argument("--child", choices=STAGES, help=argparse.SUPPRESS)
+    p.add_argument("--work", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, Path(args.work), args.workers)))
+        return 0
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        p.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    overrides = {"files": args.files, "median_kb": args.median_kb}
+    try:
+        result = run_suite(args.profile, args.seed, stages, args.repeat, args.workers, overrides,
+                           Path(args.keep).resolve() if args.keep else None)
+    except RuntimeError as e:
+        print(f"FAIL: {e}")
+        return 1
+
+    baseline_path = Path(args.baseline)
+    baseline = _load_baselines(baseline_path).get(args.profile)
+    print_table(result, baseline)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        _save_baseline(baseline_path, result)
+        print(f"\nbaseline saved: {baseline_path} ({args.profile})")
+        return 0
+
+    if baseline is None:
+        print(f"\nno baseline for {args.profile} in {baseline_path} (save one with --save-baseline)")
+        return 0
+
+    problems = compare(result, baseline, args.max_slowdown, args.max_rss_growth)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+startup.py
+----------
+How long does `main.py` take to start?
+
+What this script does:
+- Imports main in a fresh interpreter N times and reports min / median import time
+- Lists the slowest imports (python -X importtime)
+- Fails if a heavy module (pandas, openpyxl, numpy, smtplib, ...) is loaded at startup,
+  or if the median is above --max-ms
+
+Usage (from the repo root):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --max-ms 150
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Must only be imported by the stage that needs them
+# (bz2 / lzma are not listed: shutil imports them itself)
+HEAVY_MODULES = ["pandas", "openpyxl", "numpy", "smtplib", "email.mime.multipart", "sqlite3"]
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import main
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({"ms": ms, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(runs: int) -> Tuple[List[float], List[str]]:
+    times: List[float] = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result["ms"])
+        heavy = result["heavy"]
+    return times, heavy
+
+
+def slowest_imports(limit: int = 10) -> List[Tuple[int, str]]:
+    """(cumulative microseconds, module) of the slowest imports under main."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stderr
+
+    rows = []
+    for line in err.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Measure main.py startup (import) time")
+    p.add_argument("--runs", type=int, default=10)
+    p.add_argument("--max-ms", type=float, default=None, help="fail if the median is slower than this")
+    args = p.parse_args()
+
+    times, heavy = measure(args.runs)
+    median = statistics.median(times)
+
+    print(f"import main: min {min(times):.1f} ms, median {median:.1f} ms ({args.runs} runs)")
+    print("slowest imports (cumulative):")
+    for us, name in slowest_imports():
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules loaded at startup: {', '.join(heavy)}")
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.1f} ms > {args.max_ms} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+synth.py
+--------
+Synthetic "Downloads" folders for the benchmarks
+
+What this module does:
+- Builds the same tree every time for the same seed and profile
+- File sizes follow a log-normal distribution (many small files, a few big ones)
+- Extensions are drawn from the categories in rules.json, plus a share of
+  unknown / missing extensions (-> unknown_category)
+- Collision sets: the same file name in many sub-folders, so every copy
+  after the first needs a "name (i).ext" when organized
+- Large incompressible files (random bytes) for the backup / zip path
+- Writes tree.json next to the tree: profile, seed, file count, total bytes
+
+Usage (from the repo root):
+    python -m benchmarks.synth --out /tmp/bench/base
+    python -m benchmarks.synth --out /tmp/bench/base --profile large --seed 7
+    python -m benchmarks.synth --out /tmp/bench/base --files 1000000 --median-kb 1
+"""
+
+import argparse
+import json
+import math
+import random
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# files / median_kb / sigma: log-normal sizes (sigma 1.5: most files < 4x the median)
+# collision_groups x collision_copies: same-named files in different sub-folders
+# large_files x large_mb: random bytes (nothing to compress)
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {"files": 2_000, "median_kb": 8, "sigma": 1.5, "max_mb": 8, "subfolders": 20,
+              "unknown_share": 0.05, "collision_groups": 20, "collision_copies": 10,
+              "large_files": 2, "large_mb": 16},
+    "medium": {"files": 20_000, "median_kb": 8, "sigma": 1.5, "max_mb": 16, "subfolders": 200,
+               "unknown_share": 0.05, "collision_groups": 100, "collision_copies": 50,
+               "large_files": 4, "large_mb": 64},
+    "large": {"files": 200_000, "median_kb": 2, "sigma": 1.5, "max_mb": 16, "subfolders": 2_000,
+              "unknown_share": 0.05, "collision_groups": 200, "collision_copies": 200,
+              "large_files": 4, "large_mb": 256},
+    "huge": {"files": 1_000_000, "median_kb": 1, "sigma": 1.0, "max_mb": 4, "subfolders": 10_000,
+             "unknown_share": 0.05, "collision_groups": 500, "collision_copies": 500,
+             "large_files": 2, "large_mb": 256},
+}
+
+UNKNOWN_EXTENSIONS = [".xyz", ".bak", ".dat", ""]
+
+# Extensions that hold already-compressed data in real life: filled with random bytes
+RANDOM_CONTENT = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp4", ".mkv", ".mov", ".avi",
+                  ".wmv", ".mp3", ".m4a", ".aac", ".zip", ".rar", ".7z", ".gz", ".tgz",
+                  ".xlsx", ".docx", ".pptx", ".exe", ".msi"}
+
+WORDS = ["invoice", "report", "photo", "scan", "notes", "setup", "draft", "final",
+         "budget", "meeting", "holiday", "project", "backup", "export", "data", "slides"]
+
+# Contents are slices of these pools (built once per tree from the seed)
+POOL_BYTES = 4 * 1024 * 1024
+MB = 1024 * 1024
+
+
+def load_extensions(config_path: Path) -> Dict[str, List[str]]:
+    """category -> extensions, from rules.json."""
+    cfg = json.loads(Path(config_path).read_text(encoding="utf-8"))
+    return {cat: [e for e in exts if e.count(".") == 1] for cat, exts in cfg["categories"].items()}
+
+
+def _text_pool(rng: random.Random) -> bytes:
+    """Compressible content: lines of words and numbers (~3-4x with deflate)."""
+    lines = []
+    size = 0
+    while size < POOL_BYTES:
+        line = " ".join(rng.choice(WORDS) for _ in range(8)) + f" {rng.randrange(10**6)}\n"
+        lines.append(line)
+        size += len(line)
+    return "".join(lines).encode("ascii")[:POOL_BYTES]
+
+
+def _write(path: Path, pool: bytes, size: int, offset: int) -> None:
+    with open(path, "wb") as f:
+        while size > 0:
+            take = min(size, len(pool) - offset)
+            f.write(pool[offset:offset + take])
+            size -= take
+            offset = 0
+
+
+def generate_tree(
+    out: Path,
+    profile: str = "small",
+    seed: int = 1,
+    config_path: Optional[Path] = None,
+    **overrides: Any
+) -> Dict[str, Any]:
+    """
+    Creates the tree under out (emptied first).
+
+    overrides: any PROFILES key (files=1_000_000, median_kb=1, ...)
+
+    Returns:
+        {"profile", "seed", "settings", "files", "bytes", "collision_files", "large_files"}
+        (also saved as out/../tree.json)
+    """
+    settings = {**PROFILES[profile], **{k: v for k, v in overrides.items() if v is not None}}
+    extensions = load_extensions(config_path or REPO_ROOT / "config" / "rules.json")
+    categories = sorted(extensions)
+
+    rng = random.Random(seed)
+    text_pool = _text_pool(rng)
+    random_pool = rng.randbytes(POOL_BYTES)
+
+    out = Path(out)
+    if out.exists():
+        shutil.rmtree(out)
+    out.mkdir(parents=True)
+
+    folders = [out] + [out / f"sub_{i:05d}" for i in range(settings["subfolders"])]
+    for folder in folders[1:]:
+        folder.mkdir()
+
+    mu = math.log(settings["median_kb"] * 1024)
+    max_bytes = int(settings["max_mb"] * MB)
+    total_bytes = 0
+
+    def pick_extension() -> str:
+        if rng.random() < settings["unknown_share"]:
+            return rng.choice(UNKNOWN_EXTENSIONS)
+        return rng.choice(extensions[rng.choice(categories)])
+
+    def add_file(path: Path) -> None:
+        nonlocal total_bytes
+        size = min(int(rng.lognormvariate(mu, settings["sigma"])), max_bytes)
+        pool = random_pool if path.suffix.lower() in RANDOM_CONTENT else text_pool
+        _write(path, pool, size, rng.randrange(len(pool)))
+        total_bytes += size
+
+    # Half the files at the top level (what a non-recursive organize sees), the rest below
+    plain = settings["files"]
+    for i in range(plain):
+        folder = out if i % 2 == 0 or len(folders) == 1 else folders[1 + rng.randrange(len(folders) - 1)]
+        add_file(folder / f"{rng.choice(WORDS)}_{i:07d}{pick_extension()}")
+
+    # Same name in collision_copies different folders
+    copies = min(settings["collision_copies"], len(folders))
+    collision_files = 0
+    for g in range(settings["collision_groups"]):
+        name = f"{WORDS[g % len(WORDS)]}_dup_{g:04d}{pick_extension()}"
+        for folder in rng.sample(folders, copies):
+            add_file(folder / name)
+            collision_files += 1
+
+    # Large files: fresh random bytes per MB (no repeats for any compressor to find)
+    for i in range(settings["large_files"]):
+        with open(out / f"video_{i:03d}.mp4", "wb") as f:
+            for _ in range(int(settings["large_mb"])):
+                f.write(rng.randbytes(MB))
+        total_bytes += int(settings["large_mb"]) * MB
+
+    info = {
+        "profile": profile,
+        "seed": seed,
+        "settings": settings,
+        "files": plain + collision_files + settings["large_files"],
+        "bytes": total_bytes,
+        "collision_files": collision_files,
+        "large_files": settings["large_files"],
+    }
+    (out.parent / "tree.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+    return info
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Generate a synthetic download folder")
+    p.add_argument("--out", required=True, help="folder to create (emptied if it exists)")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--config", default=str(REPO_ROOT / "config" / "rules.json"),
+                   help="rules.json to take the extension mix from")
+    for key in ("files", "subfolders", "collision_groups", "collision_copies", "large_files"):
+        p.add_argument(f"--{key.replace('_', '-')}", type=int, default=None)
+    for key in ("median_kb", "max_mb", "large_mb"):
+        p.add_argument(f"--{key.replace('_', '-')}", type=float, default=None)
+    args = p.parse_args()
+
+    overrides = {k: getattr(args, k) for k in ("files", "subfolders", "collision_groups", "collision_copies",
+                                               "large_files", "median_kb", "max_mb", "large_mb")}
+    info = generate_tree(Path(args.out), args.profile, args.seed, Path(args.config), **overrides)
+    print(f"{info['files']} files, {info['bytes'] / MB:.1f} MB "
+          f"({info['collision_files']} in collision sets, {info['large_files']} large) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
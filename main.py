@@ -2,17 +2,27 @@ from __future__ import annotations
 
 import argparse
 import json
+import logging
 import os
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
-from dotenv import load_dotenv
-
+# Only what every run needs is imported here. Each stage imports its own heavy
+# dependencies (openpyxl, numpy, smtplib/email, sqlite3, ...) when it runs,
+# so a short --organize run from cron starts fast.
+# Startup time is tracked by benchmarks/startup.py.
 from src.organizer import organize_folder
-from src.reporter import generate_excel_report
-from src.backup import zip_folder, cleanup_old_backups
-from src.logger_utils import setup_logger
-from src.mailer import send_email_with_attachment
+from src.logger_utils import LOG_FILE, WATCH_LOG_FILE, flush_logs, setup_logger
+from src.alerts import AlertGate, fingerprint, format_digest, log_excerpt, log_offset
+from src.metrics import RunMetrics, StageMetrics
+from src.scheduler import StageScheduler
+from src.history import HistoryStore, PERIODS, iso_day
+from src.journal import RunJournal, latest_run, find_run, run_path, iter_records, read_summary
+from src.sniffer import ContentSniffer
+from src.rules import load_rule_matcher
+
+REPORT_FORMATS = ("xlsx", "csv", "json")
 
 
 
@@ -22,37 +32,57 @@ def load_rules(path: str) -> dict:
     return json.loads(Path(path).read_text(encoding="utf-8"))
 
 
-def save_run(moved_files: list, summary: dict) -> Path:
-    """Save moved file list into runs/last_run.json (used for reporting)."""
-    Path("runs").mkdir(exist_ok=True)
-    payload = {
-        "saved_at": datetime.now().isoformat(timespec="seconds"),
-        "summary": summary,
-        "moved_files": moved_files,
+def load_last_run() -> dict:
+    """Newest run from runs/index.jsonl (records are streamed, not loaded)."""
+    run = latest_run()
+    path = run_path(run)
+    return {
+        "path": path,
+        "summary": read_summary(path),
+        "moved_files": iter_records(path),
     }
-    out_path = Path("runs/last_run.json")
-    out_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    return out_path
 
 
-def load_last_run(path: str = "runs/last_run.json") -> dict:
-    p = Path(path)
-    if not p.exists():
-        raise FileNotFoundError("runs/last_run.json not found. Run --organize first.")
-    return json.loads(p.read_text(encoding="utf-8"))
+def organize_options(cfg: dict, config_path: str, dry_run: bool, workers: int) -> dict:
+    """organize_folder() arguments taken from rules.json."""
+    target_root = cfg["target_root_folder"]
+    organize_cfg = cfg.get("organize", {})
+    dedupe_cfg = cfg.get("dedupe", {})
+    return {
+        "base_folder": Path(cfg["base_folder"]),
+        "target_root_folder": target_root,
+        "categories": cfg["categories"],
+        "unknown_category": cfg["unknown_category"],
+        "ignore_folders": cfg["ignore_folders"] + [target_root],
+        "dry_run": dry_run,
+        "workers": workers,
+        "recursive": bool(organize_cfg.get("recursive", False)),
+        "max_depth": organize_cfg.get("max_depth"),
+        "sniffer": ContentSniffer.from_config(cfg.get("sniff", {})),
+        # Compiled once and cached until rules.json is edited
+        "matcher": load_rule_matcher(Path(config_path)),
+        "dedupe": dedupe_cfg if dedupe_cfg.get("enabled", False) else None,
+    }
 
 
-def now_stamp() -> str:
-    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
+# CLI args
 
+def _date_arg(value: str) -> str:
+    try:
+        return iso_day(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-# CLI args
 
 def parse_args():
     p = argparse.ArgumentParser(description="AutoDesktop - Organizer + Report + Backup + Email")
     p.add_argument("--config", default="config/rules.json")
     p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--verbose", action="store_true",
+                   help="log every moved / backed-up file (DEBUG lines in logs/app.log)")
+    p.add_argument("--workers", type=int, default=None,
+                   help="parallel file moves (overrides organize.workers in rules.json)")
 
     p.add_argument("--organize", action="store_true")
     p.add_argument("--report", action="store_true")
@@ -60,6 +90,24 @@ def parse_args():
     p.add_argument("--email", action="store_true")
 
     p.add_argument("--run-all", action="store_true")
+    p.add_argument("--watch", action="store_true",
+                   help="keep running and organize new files as they arrive (Linux)")
+
+    p.add_argument("--restore", action="store_true",
+                   help="undo one organize run (moves files back to their original paths)")
+    p.add_argument("--run-id", default=None,
+                   help="run to restore (default: latest run in runs/index.jsonl)")
+    p.add_argument("--category", action="append", default=None,
+                   help="only restore this category (can be repeated)")
+
+    p.add_argument("--since", type=_date_arg, default=None, metavar="YYYY-MM-DD",
+                   help="with --report: add a Trends sheet from run history starting this day")
+    p.add_argument("--until", type=_date_arg, default=None, metavar="YYYY-MM-DD",
+                   help="with --report: last day of the Trends sheet (inclusive)")
+    p.add_argument("--trend-period", choices=PERIODS, default="week",
+                   help="Trends sheet granularity (default: week)")
+    p.add_argument("--report-format", choices=REPORT_FORMATS, default="xlsx",
+                   help="xlsx (Excel, default), csv (all rows) or json (summary); csv/json need no pandas/openpyxl")
 
     return p.parse_args()
 
@@ -67,14 +115,45 @@ def parse_args():
 
 # Email (report + error alert)
 
-def send_report_email(logger, report_path: Path):
-    smtp_host = os.getenv("SMTP_HOST", "")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_pass = os.getenv("SMTP_PASS", "")
-    mail_to = os.getenv("MAIL_TO", "")
+def load_env() -> None:
+    """Loads .env (SMTP settings) - only when an email is about to be sent."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def open_mail_queue(logger, cfg: dict):
+    """
+    Background mail queue (src/mailqueue.py), started; None if .env has no SMTP settings.
+    Messages queued by earlier runs are sent too.
+    """
+    from src.mailer import smtp_settings_from_env
+    from src.mailqueue import MailQueue
+
+    load_env()
+    smtp = smtp_settings_from_env()
+    if smtp is None:
+        return None
+
+    mail_cfg = cfg.get("mail", {})
+    outbox = MailQueue(
+        smtp,
+        queue_dir=Path(mail_cfg.get("queue_dir", "runs/mail_queue")),
+        max_attempts=int(mail_cfg.get("max_attempts", 8)),
+        base_delay=float(mail_cfg.get("retry_base_seconds", 30)),
+        max_delay=float(mail_cfg.get("retry_max_seconds", 3600)),
+        attachments=mail_cfg.get("attachments"),
+        logger=logger,
+    )
+    return outbox.start()
+
 
-    if not all([smtp_host, smtp_user, smtp_pass, mail_to]):
+def has_queued_mail(cfg: dict) -> bool:
+    from src.mailqueue import pending_count
+    return pending_count(Path(cfg.get("mail", {}).get("queue_dir", "runs/mail_queue"))) > 0
+
+
+def send_report_email(logger, outbox, report_path: Path):
+    if outbox is None:
         logger.warning("Email config missing in .env. Skipping report email.")
         return
 
@@ -86,57 +165,338 @@ def send_report_email(logger, report_path: Path):
         "AutoDesk Assistant"
     )
 
-    send_email_with_attachment(
-        smtp_host=smtp_host,
-        smtp_port=smtp_port,
-        smtp_user=smtp_user,
-        smtp_pass=smtp_pass,
-        mail_to=mail_to,
-        subject=subject,
-        body=body,
-        attachment_path=report_path if report_path.exists() else None
+    # The attachment is read when the queue sends it
+    outbox.enqueue(outbox.smtp["mail_to"], subject, body, report_path if report_path.exists() else None)
+    logger.info("Report email queued")
+
+
+def send_error_alert_email(logger, outbox, cfg: dict, error: Exception, log_start: int,
+                           log_file: Path = LOG_FILE):
+    """
+    Alert with this run's log lines (at most alerts.excerpt_kb) when something fails.
+    The same failure is emailed once per cooldown; repeats are listed in the next alert.
+    """
+    if outbox is None:
+        logger.info("Email config missing in .env. Error alert email not sent.")
+        return
+
+    alert_cfg = cfg.get("alerts", {})
+    gate = AlertGate(
+        cooldown_minutes=float(alert_cfg.get("cooldown_minutes", 60)),
+        max_per_hour=int(alert_cfg.get("max_per_hour", 6)),
+        keep_days=int(alert_cfg.get("keep_days", 30)),
     )
 
-    logger.info("Report email sent")
+    fp = fingerprint(error)
+    digest = gate.check(fp, f"{type(error).__name__}: {error}")
+    if digest is None:
+        logger.info(f"Error alert not sent: failure [{fp}] was alerted recently (counted for the next alert)")
+        return
 
+    flush_logs()   # the failure's own lines may still be queued for the log thread
+    excerpt = gate.save_excerpt(log_excerpt(log_file, log_start, max_kb=int(alert_cfg.get("excerpt_kb", 64))))
+    body = f"Automation failed.\n\nError [{fp}]:\n{type(error).__name__}: {error}\n\n"
+    if digest:
+        body += format_digest(digest) + "\n\n"
+    body += "Attached: this run's log lines."
 
-def send_error_alert_email(logger, error_text: str):
-    """Send logs/app.log as attachment when something fails."""
-    smtp_host = os.getenv("SMTP_HOST", "")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_pass = os.getenv("SMTP_PASS", "")
-    mail_to = os.getenv("MAIL_TO", "")
+    # The queue sends its own copy: excerpts beyond alerts.keep_excerpts are deleted,
+    # maybe before a retry of this message
+    outbox.enqueue(outbox.smtp["mail_to"], " AutoDesktop Automation Failed", body, excerpt,
+                   copy_attachment=True)
+    logger.info(f"Error alert email queued (log excerpt: {excerpt})")
 
-    if not all([smtp_host, smtp_user, smtp_pass, mail_to]):
-        logger.info("Email config missing in .env. Error alert email not sent.")
+
+def close_mail_queue(logger, outbox, cfg: dict, m: Optional[StageMetrics] = None):
+    """Gives queued mail up to mail.drain_seconds to go out; the rest waits for the next run."""
+    if outbox is None:
         return
+    left = outbox.close(timeout=float(cfg.get("mail", {}).get("drain_seconds", 60)))
+
+    if m is not None:
+        smtp = outbox.smtp_stats
+        m.update({
+            "queued_left": left,
+            "smtp_connects": smtp["connects"],
+            "smtp_connect_ms": round(smtp["connect_seconds"] * 1000 / smtp["connects"], 1) if smtp["connects"] else None,
+            "messages": smtp["messages"],
+            "smtp_send_ms_avg": round(smtp["send_seconds"] * 1000 / smtp["messages"], 1) if smtp["messages"] else None,
+            "smtp_send_ms_max": round(smtp["send_seconds_max"] * 1000, 1),
+            "bytes": smtp["bytes_sent"],
+        })
+
+    if left:
+        logger.warning(f"{left} email(s) still queued in {outbox.queue_dir} (retried on the next run)")
+    else:
+        logger.info("Email queue delivered")
+
+
+
+# Verbose logging (one DEBUG line per file, only with --verbose)
 
-    log_path = Path("logs/app.log")
-    send_email_with_attachment(
-        smtp_host=smtp_host,
-        smtp_port=smtp_port,
-        smtp_user=smtp_user,
-        smtp_pass=smtp_pass,
-        mail_to=mail_to,
-        subject=" AutoDesktop Automation Failed",
-        body=f"Automation failed.\n\nError:\n{error_text}\n\nSee attached log file.",
-        attachment_path=log_path if log_path.exists() else None
+def with_file_log(logger, on_record):
+    """on_record that also logs each moved file with its fields."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return on_record
+
+    def record_and_log(rec):
+        on_record(rec)
+        logger.debug("organized %s", rec["dst"], extra={
+            "category": rec["category"], "bytes": rec["size_bytes"], "action": rec.get("action", "moved")})
+
+    return record_and_log
+
+
+def member_log(logger):
+    """CompressionStats callback: one line per backed-up file (None unless --verbose)."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return None
+
+    def log_member(rel, method, bytes_in, bytes_out, seconds):
+        logger.debug("backed up %s", rel, extra={
+            "method": method, "bytes": bytes_in, "bytes_out": bytes_out, "duration_ms": round(seconds * 1000, 2)})
+
+    return log_member
+
+
+# Watch mode (organize on inotify events)
+
+def run_watch(logger, cfg: dict, config_path: str, dry_run: bool, workers: int):
+    from src.dedupe import OrganizedIndex
+    from src.watcher import watch_folder
+
+    base_folder = Path(cfg["base_folder"])
+    watch_cfg = cfg.get("watch", {})
+
+    # Dedupe: Organized is walked on the first batch, then kept up to date from each batch's moves
+    dedupe_cfg = cfg.get("dedupe", {})
+    organized = OrganizedIndex(base_folder / cfg["target_root_folder"],
+                               skip_dir_names=dedupe_cfg.get("skip_dir_names", ["_backups"]))
+
+    def organize_batch(entries):
+        journal = RunJournal()
+        with journal:
+            _, summary = organize_folder(
+                **organize_options(cfg, config_path, dry_run, workers),
+                entries=entries,
+                organized=organized,
+                on_record=with_file_log(logger, journal.append),
+                collect=False
+            )
+            journal.close(summary)
+        HistoryStore().add_run(journal.run_id, iter_records(journal.path))
+        if summary["moved_count"]:
+            logger.info(f"Watch batch moved: {summary['moved_count']} (run log: {journal.path})")
+
+    # Files that arrived while we were not watching are picked up by the
+    # watcher itself (same partial-download and settle checks as new files)
+    logger.info(f"Watching: {base_folder} (Ctrl+C to stop)")
+    try:
+        watch_folder(
+            base_folder,
+            organize_batch,
+            settle_seconds=float(watch_cfg.get("settle_seconds", 2.0)),
+            batch_window_seconds=float(watch_cfg.get("batch_window_seconds", 1.0)),
+            max_batch=int(watch_cfg.get("max_batch", 500)),
+            partial_suffixes=watch_cfg.get("partial_suffixes", [])
+        )
+    except KeyboardInterrupt:
+        pass
+    logger.info("Watch stopped")
+
+
+
+# Restore (undo one run from its journal)
+
+def run_restore(logger, run_id, categories, dry_run: bool, workers: int):
+    from src.restore import restore_run
+
+    run = find_run(run_id) if run_id else latest_run()
+    path = run_path(run)
+
+    logger.info(f"Restoring run {run['run_id']} from {path} "
+                f"(categories={categories or 'all'}, dry_run={dry_run}, workers={workers})")
+
+    counts = restore_run(
+        iter_records(path),
+        categories=categories,
+        workers=workers,
+        dry_run=dry_run
     )
-    logger.info("Error alert email sent (log attached)")
 
+    logger.info(f"Restore done. Restored: {counts['restored']}, "
+                f"missing: {counts['missing']}, skipped: {counts['skipped']}")
+
+
+
+# Report (from the latest run journal)
+
+def run_report(logger, args, report_path: Path, m: Optional[StageMetrics] = None):
+    logger.info(f"Generating {args.report_format} report...")
+
+    run_data = load_last_run()
+    moved_for_report = run_data["moved_files"]
+
+    # Counted during organize (older journals have none: the report counts the rows)
+    aggregates = run_data["summary"].get("aggregates")
+
+    trends = None
+    if args.since or args.until:
+        history = HistoryStore()
+        history.sync()   # picks up runs made before history existed
+        trends = history.trends(args.since, args.until, period=args.trend_period)
+        logger.info(f"Trends: {len(trends)} row(s) from {args.since or 'start'} to {args.until or 'now'}")
+
+    if args.report_format == "csv":
+        from src.light_report import generate_csv_report
+        generate_csv_report(moved_for_report, report_path)
+    elif args.report_format == "json":
+        from src.light_report import generate_json_report
+        generate_json_report(moved_for_report, report_path, trends=trends, aggregates=aggregates)
+    else:
+        from src.reporter import generate_excel_report
+        generate_excel_report(moved_for_report, report_path, trends=trends, aggregates=aggregates)
+
+    if m is not None:
+        m.set("rows", run_data["summary"].get("moved_count"))
+        m.set("output_bytes", report_path.stat().st_size)
+    logger.info(f"Report created: {report_path}")
+
+
+
+# Backup
+
+def run_backup(logger, cfg: dict, m: Optional[StageMetrics] = None):
+    from src.backup import zip_folder, incremental_backup, cleanup_old_backups, new_backup_path
+    from src.catalog import BackupCatalog
+    from src.chunkstore import ChunkStore
+    from src.compression import CompressionPolicy, CompressionStats
+
+    backup_cfg = cfg.get("backup", {"enabled": False})
+    if not backup_cfg.get("enabled", False):
+        logger.info("Backup disabled in rules.json")
+        return
+
+    organized_folder = Path(cfg["base_folder"]) / cfg["target_root_folder"]
+    if not organized_folder.exists():
+        raise FileNotFoundError(f"Organized folder not found: {organized_folder}")
+
+    backup_dir = organized_folder / backup_cfg.get("backup_folder_name", "_backups")
+    keep_last = int(backup_cfg.get("keep_last", 5))
+    mode = backup_cfg.get("mode", "full")
+    # Compression threads (null in rules.json = every core)
+    backup_workers = int(backup_cfg.get("workers") or os.cpu_count() or 1)
+
+    comp_cfg = cfg.get("compression", {})
+    policy = CompressionPolicy.from_config(comp_cfg)
+    # Always counted (run metrics); saved to the stats file only with a policy
+    comp_stats = CompressionStats(member_log(logger))
+
+    if mode == "chunked":
+        store = ChunkStore(backup_dir / "store", workers=backup_workers)
+        logger.info(f"Adding snapshot to chunk store: {store.root}")
+        info = store.backup(organized_folder, skip_dir_names=["_backups"], max_file_mb=500)
+        logger.info(
+            f"Snapshot done: {Path(info['snapshot']).name}. Files: {info['file_count']}, read: {info['files_read']}, "
+            f"new chunks: {info['new_chunks']} ({info['bytes_stored']} bytes)"
+        )
+        if m is not None:
+            m.update({"files": info["file_count"], "files_read": info["files_read"],
+                      "new_chunks": info["new_chunks"], "bytes_stored": info["bytes_stored"]})
+        pruned = store.prune(keep_last)
+        logger.info(
+            f"Backup done. Deleted old snapshots: {len(pruned['deleted_snapshots'])}, "
+            f"freed chunks: {pruned['deleted_chunks']}"
+        )
+    elif mode == "incremental":
+        zip_path = new_backup_path(backup_dir)
+        logger.info(f"Creating incremental backup: {zip_path}")
+        info = incremental_backup(
+            organized_folder,
+            zip_path,
+            skip_dir_names=["_backups"],
+            max_file_mb=500,
+            full_every=int(backup_cfg.get("full_every", 7)),
+            policy=policy,
+            stats=comp_stats
+        )
+        logger.info(
+            f"Backup kind: {info['kind']}, stored files: {info['stored_count']}, "
+            f"deleted since last: {len(info['deleted'])}"
+        )
+    else:
+        zip_path = new_backup_path(backup_dir)
+        logger.info(f"Creating backup zip: {zip_path}")
+
+        zip_folder(
+            organized_folder,
+            zip_path,
+            skip_dir_names=["_backups"],
+            max_file_mb=500,
+            workers=backup_workers,
+            policy=policy,
+            stats=comp_stats
+        )
+
+    if m is not None and mode != "chunked":
+        total = comp_stats.overall()
+        m.update({
+            "files": total["files"],
+            "bytes": total["bytes_in"],
+            "bytes_out": total["bytes_out"],
+            "compression_ratio": round(total["bytes_out"] / total["bytes_in"], 4) if total["bytes_in"] else None,
+            "compress_seconds": round(total["seconds"], 3),
+            "archive_bytes": zip_path.stat().st_size,
+        })
+
+    if policy is not None:
+        stats_file = Path(comp_cfg.get("stats_file", "runs/compression_stats.json"))
+        comp_stats.save(stats_file)
+        logger.info(f"Compression stats saved: {stats_file}")
+
+    if mode != "chunked":
+        deleted = cleanup_old_backups(backup_dir, keep_last=keep_last)
+        logger.info(f"Backup done. Deleted old backups: {len(deleted)}")
+
+        if backup_cfg.get("catalog", True):
+            with BackupCatalog(backup_dir) as catalog:
+                synced = catalog.sync()
+            logger.info(
+                f"Catalog updated. Archives added: {synced['added']}, removed: {synced['removed']}"
+            )
+
+
+
+# Metrics
+
+def save_metrics(logger, metrics: RunMetrics, cfg: dict, args):
+    """runs/metrics_<stamp>.json (+ Prometheus textfile if metrics.prometheus_textfile is set)."""
+    metrics_cfg = cfg.get("metrics", {})
+    if not metrics_cfg.get("enabled", True) or args.watch or args.restore or not metrics.stages:
+        return
+    try:
+        path = metrics.save()
+        logger.info(f"Run metrics saved: {path}")
+        prom = metrics_cfg.get("prometheus_textfile")
+        if prom:
+            metrics.write_prometheus(Path(prom))
+    except OSError as e:
+        logger.error(f"Run metrics not saved: {e}")
 
 
 # Main
 
 def main():
-    load_dotenv()  # load .env for SMTP settings 
     args = parse_args()
-    logger = setup_logger()
-
     cfg = load_rules(args.config)
+
+    # Where this run's lines start in its log file (the error alert attaches only those)
+    # The watch daemon keeps its own log file (rotation is safe with one writer per file)
+    log_file = WATCH_LOG_FILE if args.watch else LOG_FILE
+    log_start = log_offset(log_file)
+
+    logger = setup_logger(settings=cfg.get("logging"), verbose=args.verbose, log_file=log_file)
     base_folder = Path(cfg["base_folder"])
-    target_root = cfg["target_root_folder"]
 
     run_all = args.run_all or not (args.organize or args.report or args.backup or args.email)
 
@@ -145,79 +505,100 @@ def main():
     do_backup = run_all or args.backup
     do_email = run_all or args.email
 
-    moved_files = []
-    summary = {}
+    organize_cfg = cfg.get("organize", {})
+    workers = args.workers or int(organize_cfg.get("workers", 1))
 
     # Report path
-    report_path = Path("reports") / f"report_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
+    report_path = Path("reports") / f"report_{datetime.now().strftime('%Y-%m-%d')}.{args.report_format}"
     Path("reports").mkdir(exist_ok=True)
 
+    # Mail goes out in the background while the other stages run
+    outbox = None
+
+    # Wall time + counts per stage -> runs/metrics_<stamp>.json (+ Prometheus textfile)
+    metrics = RunMetrics()
+
     try:
-        # 1) ORGANIZE
-        if do_organize:
-            logger.info(f"Organizing: {base_folder} (dry_run={args.dry_run})")
-
-            moved_files, summary = organize_folder(
-                base_folder=base_folder,
-                target_root_folder=target_root,
-                categories=cfg["categories"],
-                unknown_category=cfg["unknown_category"],
-                ignore_folders=cfg["ignore_folders"] + [target_root],
-                dry_run=args.dry_run
-            )
+        # WATCH (long-running, replaces the one-shot pipeline)
+        if args.watch:
+            run_watch(logger, cfg, args.config, args.dry_run, workers)
+            return
+
+        # RESTORE (undo instead of the normal pipeline)
+        if args.restore:
+            run_restore(logger, args.run_id, args.category, args.dry_run, workers)
+            return
+
+        # Stages run as soon as what they need is done: report and backup
+        # both only need organize, and the email only needs the report
+        # ("auto": only with more than one CPU, where the overlap can pay off)
+        pipeline_cfg = cfg.get("pipeline", {})
+        parallel = pipeline_cfg.get("parallel", "auto")
+        if parallel == "auto":
+            parallel = (os.cpu_count() or 1) > 1
+        scheduler = StageScheduler(logger, max_workers=int(pipeline_cfg.get("workers", 4)) if parallel else 1)
 
-            logger.info(f"Moved count: {summary['moved_count']}")
+        # 1) ORGANIZE
+        def organize_stage():
+            logger.info(f"Organizing: {base_folder} (dry_run={args.dry_run}, workers={workers})")
+
+            # Every move is appended to the run journal as it happens
+            journal = RunJournal()
+            with metrics.stage("organize") as m, journal:
+                _, summary = organize_folder(
+                    **organize_options(cfg, args.config, args.dry_run, workers),
+                    on_record=with_file_log(logger, journal.append),
+                    collect=False
+                )
+                journal.close(summary)
 
-            # Save for reporting
-            saved = save_run(moved_files, summary)
-            logger.info(f"Saved run log: {saved}")
+                m.set("files", summary["moved_count"])
+                m.set("bytes", sum(b for _, b in summary["aggregates"]["categories"].values()))
+                m.update(summary["ops"])
 
-        #  Generate REPORT from last_run.json
-        if do_report:
-            logger.info("Generating Excel report...")
+            logger.info(f"Moved count: {summary['moved_count']}")
+            if summary["duplicates_skipped"]:
+                logger.info(f"Duplicates left in place: {summary['duplicates_skipped']}")
+            logger.info(f"Saved run log: {journal.path}")
 
-            run_data = load_last_run()
-            moved_for_report = run_data["moved_files"]
+            # Keep the run in the long-term history (daily rollups for trends)
+            HistoryStore().add_run(journal.run_id, iter_records(journal.path))
 
-            generate_excel_report(moved_for_report, report_path)
-            logger.info(f"Report created: {report_path}")
+        #  Generate REPORT from the latest run journal
+        def report_stage():
+            with metrics.stage("report") as m:
+                run_report(logger, args, report_path, m)
 
         #  BACKUP
-        if do_backup:
-            backup_cfg = cfg.get("backup", {"enabled": False})
-            if not backup_cfg.get("enabled", False):
-                logger.info("Backup disabled in rules.json")
-            else:
-                organized_folder = base_folder / target_root
-                if not organized_folder.exists():
-                    raise FileNotFoundError(f"Organized folder not found: {organized_folder}")
-
-                backup_dir = organized_folder / backup_cfg.get("backup_folder_name", "_backups")
-                keep_last = int(backup_cfg.get("keep_last", 5))
-                zip_path = backup_dir / f"backup_{now_stamp()}.zip"
-
-                logger.info(f"Creating backup zip: {zip_path}")
-
-                zip_folder(
-                    organized_folder,
-                    zip_path,
-                    skip_dir_names=["_backups"],
-                    max_file_mb=500
-                )
-
-                deleted = cleanup_old_backups(backup_dir, keep_last=keep_last)
-                logger.info(f"Backup done. Deleted old backups: {len(deleted)}")
+        def backup_stage():
+            with metrics.stage("backup") as m:
+                run_backup(logger, cfg, m)
 
         # send latest report
-        if do_email:
+        def email_stage():
+            nonlocal outbox
             # pick latest report file
-            reports = sorted(Path("reports").glob("report_*.xlsx"))
+            reports = sorted(Path("reports").glob(f"report_*.{args.report_format}"))
             if not reports:
                 raise FileNotFoundError("No report found. Run --report first.")
             latest_report = reports[-1]
 
             logger.info(f"Emailing report: {latest_report}")
-            send_report_email(logger, latest_report)
+            with metrics.stage("email"):
+                if outbox is None:
+                    outbox = open_mail_queue(logger, cfg)
+                send_report_email(logger, outbox, latest_report)
+
+        if do_organize:
+            scheduler.add("organize", organize_stage)
+        if do_report:
+            scheduler.add("report", report_stage, needs=["organize"])
+        if do_backup:
+            scheduler.add("backup", backup_stage, needs=["organize"])
+        if do_email:
+            scheduler.add("email", email_stage, needs=["report"])
+
+        scheduler.run()
 
         logger.info("All selected tasks completed successfully")
 
@@ -227,12 +608,27 @@ def main():
 
         # Send error alert email 
         try:
-            send_error_alert_email(logger, str(e))
+            if outbox is None:
+                outbox = open_mail_queue(logger, cfg)
+            send_error_alert_email(logger, outbox, cfg, e, log_start, log_file)
         except Exception as mail_err:
             logger.error(f"Error alert email failed: {mail_err}")
 
         raise
 
+    finally:
+        try:
+            if outbox is None and has_queued_mail(cfg):
+                # Mail left over from an earlier run
+                outbox = open_mail_queue(logger, cfg)
+            if outbox is not None:
+                with metrics.stage("mail_delivery") as m:
+                    close_mail_queue(logger, outbox, cfg, m)
+        except Exception as mail_err:
+            logger.error(f"Email queue failed: {mail_err}")
+
+        save_metrics(logger, metrics, cfg, args)
+
 
 if __name__ == "__main__":
     main()
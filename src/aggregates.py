@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+"""
+aggregates.py
+-------------
+Running totals over moved-file records (no pandas, constant memory)
+
+- files + bytes per category
+- the K largest files (bounded heap: O(N log K), no full sort)
+
+organize_folder() keeps one while it runs and saves it in the run summary
+(to_dict), so a report reads O(categories + K) values instead of every record.
+"""
+
+import heapq
+from typing import Any, Dict, List, Tuple
+
+
+class RunAggregates:
+    """
+    Usage:
+        agg = RunAggregates()
+        for rec in records:
+            agg.add(rec)
+        agg.summary()   # [{"category", "files", "total_bytes"}, ...] most files first
+        agg.top()       # K largest records, biggest first
+
+        saved = agg.to_dict()                    # JSON-safe, goes in the run summary
+        agg = RunAggregates.from_dict(saved)     # same summary() / top() again
+    """
+
+    def __init__(self, top_k: int = 10) -> None:
+        self.top_k = top_k
+        self.by_category: Dict[str, List[int]] = {}   # category -> [files, total_bytes]
+        self._top: List[Tuple[int, int, Dict[str, Any]]] = []   # min-heap of (size, -order, record)
+        self._order = 0
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        size = rec.get("size_bytes") or 0
+        stats = self.by_category.setdefault(rec.get("category"), [0, 0])
+        stats[0] += 1
+        stats[1] += size
+
+        # Ties keep the earlier record (larger -order wins)
+        item = (size, -self._order, rec)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, item)
+        elif item[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, item)
+        self._order += 1
+
+    @property
+    def count(self) -> int:
+        return self._order
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "count": self._order,
+            "categories": {c: list(stats) for c, stats in self.by_category.items()},
+            "top": self.top(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunAggregates":
+        agg = cls(top_k=data.get("top_k", 10))
+        agg.by_category = {c: list(stats) for c, stats in data.get("categories", {}).items()}
+        # Saved biggest first: earlier (smaller order) wins ties, as in add()
+        agg._top = [((rec.get("size_bytes") or 0), -i, rec) for i, rec in enumerate(data.get("top", []))]
+        heapq.heapify(agg._top)
+        agg._order = data.get("count", sum(f for f, _ in agg.by_category.values()))
+        return agg
+
+    def summary(self) -> List[Dict[str, Any]]:
+        rows = [{"category": c, "files": f, "total_bytes": b} for c, (f, b) in self.by_category.items()]
+        rows.sort(key=lambda r: r["files"], reverse=True)
+        return rows
+
+    def top(self) -> List[Dict[str, Any]]:
+        return [rec for _, _, rec in sorted(self._top, key=lambda t: t[:2], reverse=True)]
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+"""
+alerts.py
+---------
+Error alert emails that stay small and do not repeat
+
+What this module does:
+- Takes only the log lines of the current run (from the app.log size at start),
+  or the last max_kb of the log, found by seeking from the end
+- Gives every failure a fingerprint: exception type + where it was raised +
+  the message with numbers / paths / ids blanked out
+- Sends one alert per fingerprint per cooldown, and at most max_per_hour in total
+- Counts the suppressed repeats and lists them in the next alert that goes out
+
+Layout (runs/alerts/):
+    state.json               fingerprint -> first / last seen, last sent, suppressed count
+    alert_<stamp>.log        log excerpt attached to one alert (last keep_excerpts kept)
+
+Reads are bounded by max_kb, so an alert costs the same however big app.log is.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.journal import RUNS_DIR
+
+
+ALERTS_DIR = RUNS_DIR / "alerts"
+
+# Blanked out before fingerprinting (they change between otherwise identical failures)
+_VOLATILE = [
+    (re.compile(r"(?:[A-Za-z]:)?[\\/][^\s'\"]+"), "<path>"),
+    (re.compile(r"0x[0-9a-fA-F]+|\b[0-9a-f]{8,}\b"), "<id>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+
+
+def log_offset(log_path: Path) -> int:
+    """Current size of the log: pass it to log_excerpt() to get this run's lines only."""
+    try:
+        return Path(log_path).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def log_excerpt(log_path: Path, start: Optional[int] = None, max_kb: int = 64) -> str:
+    """
+    Log lines from byte offset start (None = the last max_kb) to the end,
+    at most max_kb, beginning at a whole line.
+    """
+    max_bytes = max_kb * 1024
+    try:
+        with open(log_path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            if start is None:
+                start = 0
+            elif start > end:
+                start = 0   # log rotated since the run started
+            cut = max(start, end - max_bytes, 0)
+            f.seek(cut)
+            data = f.read(end - cut)
+    except FileNotFoundError:
+        return ""
+
+    if cut > start and b"\n" in data:
+        # Cut inside the run's lines: skip the partial first line
+        data = data.split(b"\n", 1)[1]
+    return data.decode("utf-8", errors="replace")
+
+
+def fingerprint(error: BaseException) -> str:
+    """Same failure (type, raising code, message shape) -> same 12-character id."""
+    frames = [f"{Path(fr.filename).name}:{fr.name}" for fr in traceback.extract_tb(error.__traceback__)]
+    message = str(error)
+    for pattern, repl in _VOLATILE:
+        message = pattern.sub(repl, message)
+    key = "|".join([type(error).__name__, message, *frames])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+class AlertGate:
+    """
+    Decides whether an alert goes out (dedupe + rate limit).
+
+    Usage:
+        gate = AlertGate()
+        digest = gate.check(fingerprint(e), f"{type(e).__name__}: {e}")
+        if digest is not None:
+            ... send, listing digest (repeats suppressed since the last alert)
+    """
+
+    def __init__(
+        self,
+        alerts_dir: Path = ALERTS_DIR,
+        cooldown_minutes: float = 60,
+        max_per_hour: int = 6,
+        keep_days: int = 30,
+        keep_excerpts: int = 20
+    ) -> None:
+        self.alerts_dir = Path(alerts_dir)
+        self.state_path = self.alerts_dir / "state.json"
+        self.cooldown = cooldown_minutes * 60
+        self.max_per_hour = max_per_hour
+        self.keep_seconds = keep_days * 86400
+        self.keep_excerpts = keep_excerpts
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"sent": [], "fingerprints": {}}
+
+    def _save(self, state: Dict[str, Any]) -> None:
+        self.alerts_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def check(self, fp: str, summary: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Records one occurrence of failure fp.
+
+        Returns:
+            None if the alert is suppressed (repeat within the cooldown, or over max_per_hour),
+            else the digest of repeats suppressed so far: [{"fingerprint", "summary",
+            "count", "first_seen", "last_seen"}] (their counters restart)
+        """
+        now = time.time()
+        state = self._load()
+        fps = state["fingerprints"]
+
+        # Forget failures not seen for keep_days
+        for key in [k for k, v in fps.items() if now - v["last_seen"] > self.keep_seconds]:
+            del fps[key]
+        state["sent"] = [t for t in state["sent"] if now - t < 3600]
+
+        entry = fps.setdefault(fp, {"summary": summary, "first_seen": now, "last_sent": 0,
+                                    "suppressed": 0, "suppressed_since": None})
+        entry["last_seen"] = now
+        entry["summary"] = summary
+
+        if now - entry["last_sent"] < self.cooldown or len(state["sent"]) >= self.max_per_hour:
+            entry["suppressed"] += 1
+            entry["suppressed_since"] = entry["suppressed_since"] or now
+            self._save(state)
+            return None
+
+        digest = []
+        for key, other in fps.items():
+            if other["suppressed"]:
+                digest.append({
+                    "fingerprint": key,
+                    "summary": other["summary"],
+                    "count": other["suppressed"],
+                    "first_seen": _iso(other["suppressed_since"]),
+                    "last_seen": _iso(other["last_seen"]),
+                })
+                other["suppressed"] = 0
+                other["suppressed_since"] = None
+
+        entry["last_sent"] = now
+        state["sent"].append(now)
+        self._save(state)
+        return digest
+
+    def save_excerpt(self, text: str) -> Path:
+        """Writes the log excerpt for one alert (older excerpts beyond keep_excerpts are deleted)."""
+        self.alerts_dir.mkdir(parents=True, exist_ok=True)
+        path = self.alerts_dir / f"alert_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')}.log"
+        path.write_text(text, encoding="utf-8")
+
+        excerpts = sorted(self.alerts_dir.glob("alert_*.log"))
+        for old in excerpts[:-self.keep_excerpts]:
+            old.unlink()
+        return path
+
+
+def format_digest(digest: List[Dict[str, Any]]) -> str:
+    """Body text for the suppressed repeats ("" if none)."""
+    if not digest:
+        return ""
+    lines = ["Also failed since the last alert (not emailed again):"]
+    for d in digest:
+        lines.append(f"  {d['count']} x [{d['fingerprint']}] {d['summary']} "
+                     f"({d['first_seen']} .. {d['last_seen']})")
+    return "\n".join(lines)
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
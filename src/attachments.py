@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+"""
+attachments.py
+--------------
+Email attachments that fit the mail server, read in small blocks
+
+What this module does:
+- Zips an attachment first when a sample shows it will shrink (logs, csv, ...)
+  - xlsx / pdf / images are already compressed and are sent as they are
+- Checks the size against the message limit (base64 + line breaks: 78 bytes per 57)
+- Too big for one message:
+    "split" - cut into numbered parts, one email each (join: cat / copy /b)
+    "path"  - no attachment; the email says where the file is
+- Encodes base64 block by block while the message is sent (memory does not
+  grow with the file)
+
+A plan is plain JSON, so a queued message keeps it across retries (src/mailqueue.py).
+Split parts are read from a file the plan owns (its zip, or a copy of the attachment)
+under a unique name in work_dir: a retry sends the rest of the same bytes even if
+the original was rewritten since, and two messages never share a part file.
+"""
+
+import base64
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+MB = 1024 * 1024
+
+DEFAULTS: Dict[str, Any] = {
+    "max_message_mb": 20,       # most providers refuse bigger mails (Gmail: 25)
+    "compress": True,
+    "compress_min_kb": 64,      # smaller files are sent as they are
+    "oversize": "split",        # "split" or "path"
+    "max_parts": 5,             # more parts than this -> path reference instead
+}
+
+OVERSIZE = ("split", "path")
+
+# Already compressed: zipping again only costs time
+COMPRESSED_SUFFIXES = {".zip", ".gz", ".xlsx", ".docx", ".pptx", ".pdf", ".jpg", ".jpeg", ".png", ".mp4", ".7z"}
+
+# Bytes per base64 block: a multiple of 57, so every line is exactly 76 characters
+ENCODE_BLOCK = 57 * 1024
+
+# Room left in each message for headers + body text
+HEADROOM = 64 * 1024
+
+
+def _worth_zipping(path: Path, size: int, sample_bytes: int = 64 * 1024) -> bool:
+    """True if a fast deflate of one block from the middle saves at least 10%."""
+    if path.suffix.lower() in COMPRESSED_SUFFIXES:
+        return False
+    with open(path, "rb") as f:
+        if size > sample_bytes:
+            f.seek((size - sample_bytes) // 2)
+        sample = f.read(sample_bytes)
+    return bool(sample) and len(zlib.compress(sample, 1)) < 0.9 * len(sample)
+
+
+def plan_attachment(path: Path, work_dir: Path, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Decides how one file is attached.
+
+    Returns:
+        {"parts": [{"filename", "path", "offset", "length"}, ...]   one email per part
+         "note": text for the email body (or None),
+         "work_file": zip / copy made for this mail (delete with discard_plan) or None}
+    """
+    settings = {**DEFAULTS, **(settings or {})}
+    if settings["oversize"] not in OVERSIZE:
+        raise ValueError(f"oversize must be one of {OVERSIZE}, got {settings['oversize']!r}")
+
+    path = Path(path)
+    size = path.stat().st_size
+    send_path, send_name, work_file = path, path.name, None
+
+    if settings["compress"] and size >= settings["compress_min_kb"] * 1024 and _worth_zipping(path, size):
+        zipped = _work_file(work_dir, ".zip")
+        # zipfile reads and deflates in blocks
+        with zipfile.ZipFile(zipped, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            zf.write(path, arcname=path.name)
+        if zipped.stat().st_size < 0.9 * size:
+            send_path, send_name, work_file = zipped, f"{path.name}.zip", zipped
+        else:
+            zipped.unlink()
+
+    send_size = send_path.stat().st_size
+    # Raw bytes that still fit once base64-encoded (whole encode blocks)
+    per_part = int(settings["max_message_mb"] * MB - HEADROOM) * 57 // 78
+    per_part = max(ENCODE_BLOCK, per_part - per_part % ENCODE_BLOCK)
+
+    plan: Dict[str, Any] = {"parts": [], "note": None, "work_file": str(work_file) if work_file else None}
+
+    if send_size <= per_part:
+        plan["parts"] = [{"filename": send_name, "path": str(send_path), "offset": 0, "length": send_size}]
+        return plan
+
+    count = -(-send_size // per_part)
+    if settings["oversize"] == "path" or count > settings["max_parts"]:
+        if work_file is not None:
+            work_file.unlink()
+            plan["work_file"] = None
+        plan["note"] = (f"The attachment {path.name} ({size / MB:.1f} MB) is too big to email.\n"
+                        f"It is saved at: {path.resolve()}")
+        return plan
+
+    if work_file is None:
+        # Parts go out in separate emails (maybe across retries): all from one snapshot
+        work_file = _work_file(work_dir, path.suffix)
+        shutil.copyfile(path, work_file)
+        send_path = work_file
+        plan["work_file"] = str(work_file)
+
+    parts: List[Dict[str, Any]] = []
+    for i in range(count):
+        offset = i * per_part
+        parts.append({
+            "filename": f"{send_name}.{i + 1:03d}",
+            "path": str(send_path),
+            "offset": offset,
+            "length": min(per_part, send_size - offset),
+        })
+    plan["parts"] = parts
+    plan["note"] = (f"{send_name} is split into {count} emails ({send_size / MB:.1f} MB).\n"
+                    f"Save all parts, then join them:\n"
+                    f"  Windows: copy /b {'+'.join(p['filename'] for p in parts)} {send_name}\n"
+                    f"  Linux/macOS: cat {send_name}.0* > {send_name}")
+    return plan
+
+
+def _work_file(work_dir: Path, suffix: str) -> Path:
+    """A new, empty file with a unique name in work_dir (never one another plan uses)."""
+    work_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix="part_", suffix=suffix, dir=work_dir)
+    os.close(fd)
+    return Path(name)
+
+
+def discard_plan(plan: Dict[str, Any]) -> None:
+    """Deletes the zip / copy made for this mail (after the last part is sent)."""
+    if plan.get("work_file"):
+        try:
+            os.unlink(plan["work_file"])
+        except FileNotFoundError:
+            pass
+
+
+def iter_base64(part: Dict[str, Any]) -> Iterator[bytes]:
+    """base64 of one part, 76-character CRLF lines, ENCODE_BLOCK bytes read at a time."""
+    with open(part["path"], "rb") as f:
+        f.seek(part["offset"])
+        left = part["length"]
+        while left > 0:
+            block = f.read(min(ENCODE_BLOCK, left))
+            if not block:
+                break
+            left -= len(block)
+            yield base64.encodebytes(block).replace(b"\n", b"\r\n")
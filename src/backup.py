@@ -1,70 +1,358 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import time
 import zipfile
+from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+from src.compression import METHODS, CompressionPolicy, CompressionStats
+from src.walker import walk_files
+from src.zipwriter import ParallelZipWriter
 
-def _is_inside(path: Path, parent: Path) -> bool:
-    try:
-        path.relative_to(parent)
-        return True
-    except ValueError:
-        return False
+
+READ_CHUNK = 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.jsonl"
 
 
 def zip_folder(
     source_folder: Path,
     zip_path: Path,
     skip_dir_names: Optional[List[str]] = None,
-    max_file_mb: Optional[int] = None
+    max_file_mb: Optional[int] = None,
+    workers: int = 1,
+    policy: Optional[CompressionPolicy] = None,
+    stats: Optional[CompressionStats] = None
 ) -> Path:
     """
     Zips source_folder to zip_path safely.
 
     - allowZip64=True: supports very large files/archives (fixes force_zip64 error)
-    - skip_dir_names: avoid zipping _backups folder (prevents zip growing forever)
+    - skip_dir_names: avoid zipping _backups folder (prevents zip growing forever);
+      these folders are pruned by the walker, so they are never even listed
     - max_file_mb: optional, skip files bigger than this (keeps backup fast)
+    - workers: > 1 compresses on that many cores (see zipwriter.py); same zip format
+    - policy: optional, picks store / fast / deflate / bzip2 / lzma per file
+      (None = deflate everything, as before)
+    - stats: optional, records bytes in/out and time per category and method
     """
     zip_path.parent.mkdir(parents=True, exist_ok=True)
 
     skip_dir_names = skip_dir_names or ["_backups"]
-    skip_dirs = [source_folder / name for name in skip_dir_names]
 
     max_bytes = None
     if max_file_mb is not None:
         max_bytes = max_file_mb * 1024 * 1024
 
+    entries = walk_files(source_folder, skip_dir_names=skip_dir_names, max_depth=None)
+
+    def method_for(entry) -> str:
+        return policy.choose(entry.path, entry.rel, entry.size) if policy is not None else "deflate"
+
+    if workers > 1:
+        with ParallelZipWriter(zip_path, workers=workers, stats=stats) as zw:
+            for entry in entries:
+                if max_bytes is not None and entry.size > max_bytes:
+                    continue
+                try:
+                    zw.add(entry.path, entry.rel, method_for(entry))
+                except PermissionError:
+                    continue
+        return zip_path
+
     # ✅ allowZip64=True fixes "File size too large"
     with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
-        for p in source_folder.rglob("*"):
-            if not p.is_file():
+        for entry in entries:
+            # ✅ Skip huge files if you set a limit (size comes from the walker, no extra stat)
+            if max_bytes is not None and entry.size > max_bytes:
                 continue
 
-            # ✅ Skip backup folder itself
-            if any(_is_inside(p, d) for d in skip_dirs):
+            method = method_for(entry)
+            compress_type, level = METHODS[method]
+
+            # ✅ Skip locked/unreadable files
+            try:
+                start = time.perf_counter()
+                zf.write(entry.path, entry.rel, compress_type=compress_type, compresslevel=level)
+            except PermissionError:
                 continue
 
-            # ✅ Skip huge files if you set a limit
-            if max_bytes is not None and p.stat().st_size > max_bytes:
+            if stats is not None:
+                info = zf.filelist[-1]
+                stats.record(info.filename, method, info.file_size, info.compress_size,
+                             time.perf_counter() - start)
+
+    return zip_path
+
+
+def new_backup_path(backup_dir: Path) -> Path:
+    """
+    backup_<stamp>.zip in backup_dir, stamped to the microsecond and created empty
+    with exclusive create, so two backups never get the same name ("_001", "_002"...
+    if the name is taken anyway).
+    """
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+    n = 0
+    while True:
+        path = backup_dir / f"backup_{stamp}{f'_{n:03d}' if n else ''}.zip"
+        try:
+            with open(path, "x"):
+                return path
+        except FileExistsError:
+            n += 1
+
+
+# Incremental backups
+#
+# Every backup made in "incremental" mode gets a manifest next to it:
+#     backup_<stamp>.zip          (name from new_backup_path())
+#     backup_<stamp>.manifest.jsonl
+# Line 1 is a small header (kind, parent, chain root, deleted files),
+# every other line is one file of the FULL folder state: [path, size, mtime, hash].
+# A "full" backup stores every file; an "incremental" one only stores files that
+# are new or changed since its parent, and lists deleted paths in the header.
+
+def manifest_path(zip_path: Path) -> Path:
+    return zip_path.with_name(zip_path.stem + MANIFEST_SUFFIX)
+
+
+def read_manifest_header(zip_path: Path) -> Optional[Dict[str, Any]]:
+    """Header line of a backup's manifest (None for plain zip_folder() backups)."""
+    path = manifest_path(zip_path)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.readline())
+
+
+def iter_manifest_files(zip_path: Path) -> Iterator[Tuple[str, int, float, str]]:
+    """(path, size, mtime, hash) for every file in the folder at backup time."""
+    with open(manifest_path(zip_path), "r", encoding="utf-8") as f:
+        f.readline()  # header
+        for line in f:
+            if line.strip():
+                rel, size, mtime, digest = json.loads(line)
+                yield rel, size, mtime, digest
+
+
+def _write_manifest(zip_path: Path, header: Dict[str, Any], files: Dict[str, List[Any]]) -> None:
+    path = manifest_path(zip_path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for rel, (size, mtime, digest) in files.items():
+            f.write(json.dumps([rel, size, mtime, digest], ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def latest_incremental_backup(backup_dir: Path) -> Optional[Path]:
+    """Newest backup that has a manifest (plain zips are ignored)."""
+    manifests = sorted(backup_dir.glob("backup_*" + MANIFEST_SUFFIX))
+    for m in reversed(manifests):
+        zip_path = m.with_name(m.name[:-len(MANIFEST_SUFFIX)] + ".zip")
+        if zip_path.exists():
+            return zip_path
+    return None
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_and_hash(zf: zipfile.ZipFile, path: str, arcname: str, method: str = "deflate") -> str:
+    """
+    Hashes one file, then adds it with zf.write() (type and level of the method,
+    like zip_folder()). The second read comes from the OS cache; hashing costs
+    far less than compressing.
+    A locked file fails in the hash, before a zip entry is started.
+    """
+    digest = _hash_file(path)
+    compress_type, level = METHODS[method]
+    zf.write(path, arcname, compress_type=compress_type, compresslevel=level)
+    return digest
+
+
+def incremental_backup(
+    source_folder: Path,
+    zip_path: Path,
+    skip_dir_names: Optional[List[str]] = None,
+    max_file_mb: Optional[int] = None,
+    full_every: int = 7,
+    policy: Optional[CompressionPolicy] = None,
+    stats: Optional[CompressionStats] = None
+) -> Dict[str, Any]:
+    """
+    Backs up source_folder to zip_path, storing only what changed.
+    zip_path must be a new name (see new_backup_path()); ValueError if it is
+    the backup this one would build on.
+
+    - No earlier manifest, or the chain already has full_every increments -> full backup
+    - Otherwise: only new/changed files go into the zip, deleted paths are recorded
+    - A file with the same size and mtime as last time is not read at all;
+      same size but new mtime is hashed, and skipped if the content is unchanged
+    - policy / stats: same as zip_folder()
+
+    Returns:
+        the manifest header (kind, parent, stored/deleted counts...)
+    """
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    skip_dir_names = skip_dir_names or ["_backups"]
+    max_bytes = max_file_mb * 1024 * 1024 if max_file_mb is not None else None
+
+    parent_zip = latest_incremental_backup(zip_path.parent)
+    if parent_zip is not None and parent_zip.resolve() == zip_path.resolve():
+        # Writing it would truncate the parent and make it its own parent
+        raise ValueError(f"{zip_path.name} already exists as the latest backup; use a new name")
+    parent_header = read_manifest_header(parent_zip) if parent_zip else None
+
+    is_full = parent_header is None or parent_header["depth"] >= full_every
+
+    previous: Dict[str, List[Any]] = {}
+    if not is_full:
+        previous = {rel: [size, mtime, digest] for rel, size, mtime, digest in iter_manifest_files(parent_zip)}
+
+    files: Dict[str, List[Any]] = {}
+    stored = 0
+
+    # strict_timestamps=False: files dated before 1980 are stored as 1980, not refused
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True,
+                         strict_timestamps=False) as zf:
+        for entry in walk_files(source_folder, skip_dir_names=skip_dir_names, max_depth=None):
+            if max_bytes is not None and entry.size > max_bytes:
                 continue
 
-            # ✅ Skip locked/unreadable files
+            old = previous.get(entry.rel)
             try:
-                zf.write(p, p.relative_to(source_folder))
+                if old is not None and old[0] == entry.size:
+                    if old[1] == entry.mtime:
+                        # Unchanged: not read, not stored
+                        files[entry.rel] = old
+                        continue
+
+                    digest = _hash_file(entry.path)
+                    if digest == old[2]:
+                        # Only touched: remember the new mtime, store nothing
+                        files[entry.rel] = [entry.size, entry.mtime, digest]
+                        continue
+
+                method = policy.choose(entry.path, entry.rel, entry.size) if policy is not None else "deflate"
+                start = time.perf_counter()
+                digest = _write_and_hash(zf, entry.path, entry.rel, method)
+                if stats is not None:
+                    info = zf.filelist[-1]
+                    stats.record(info.filename, method, info.file_size, info.compress_size,
+                                 time.perf_counter() - start)
             except PermissionError:
+                # Locked right now: keep the last backed-up version in the chain
+                if old is not None:
+                    files[entry.rel] = old
                 continue
 
-    return zip_path
+            files[entry.rel] = [entry.size, entry.mtime, digest]
+            stored += 1
+
+    header = {
+        "kind": "full" if is_full else "incremental",
+        "parent": None if is_full else parent_zip.name,
+        "root": zip_path.name if is_full else parent_header["root"],
+        "depth": 0 if is_full else parent_header["depth"] + 1,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "file_count": len(files),
+        "stored_count": stored,
+        "deleted": sorted(set(previous) - set(files)),
+    }
+    _write_manifest(zip_path, header, files)
+    return header
+
+
+def backup_chain(zip_path: Path) -> List[Path]:
+    """
+    [zip_path, its parent, ..., the full backup] (just [zip_path] for plain zips).
+    Raises FileNotFoundError if a parent is missing, ValueError if the chain loops.
+    """
+    chain = [zip_path]
+    header = read_manifest_header(zip_path)
+    while header is not None and header.get("parent"):
+        parent = zip_path.parent / header["parent"]
+        if not parent.exists():
+            raise FileNotFoundError(f"Backup chain is broken: {parent} is missing")
+        if parent in chain:
+            raise ValueError(f"Backup chain loops: {parent.name} is its own ancestor")
+        chain.append(parent)
+        header = read_manifest_header(parent)
+    return chain
+
+
+def restore_backup(zip_path: Path, out_dir: Path) -> int:
+    """
+    Rebuilds the folder exactly as it was when zip_path was made.
+
+    Walks the chain from zip_path back to its full backup and extracts each
+    file from the NEWEST archive that has it (every file is written once).
+    Deleted files are simply not in the final state, so they never come back.
+
+    Returns: number of files restored
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if read_manifest_header(zip_path) is None:
+        # Plain full zip: everything in it is the state
+        with zipfile.ZipFile(zip_path) as zf:
+            zf.extractall(out_dir)
+            return len(zf.namelist())
+
+    wanted = {rel: mtime for rel, _, mtime, _ in iter_manifest_files(zip_path)}
+    restored = 0
+
+    for archive in backup_chain(zip_path):
+        if not wanted:
+            break
+        with zipfile.ZipFile(archive) as zf:
+            for member in zf.namelist():
+                mtime = wanted.pop(member, None)
+                if mtime is None:
+                    continue   # deleted later, or a newer version was already restored
+                target = zf.extract(member, out_dir)
+                os.utime(target, (mtime, mtime))
+                restored += 1
+
+    if wanted:
+        raise FileNotFoundError(f"{len(wanted)} file(s) missing from the backup chain of {zip_path.name}")
+
+    return restored
 
 
 def cleanup_old_backups(backup_dir: Path, keep_last: int) -> List[Path]:
+    """
+    Keeps the newest keep_last backups and deletes the rest.
+
+    Incremental backups need their whole chain (parents up to the full backup),
+    so any older backup a kept one depends on is kept too.
+    """
     backups = sorted(
         backup_dir.glob("backup_*.zip"),
         key=lambda p: p.stat().st_mtime,
         reverse=True
     )
-    to_delete = backups[keep_last:]
+
+    needed = set()
+    for p in backups[:keep_last]:
+        try:
+            needed.update(b.name for b in backup_chain(p))
+        except (FileNotFoundError, ValueError):
+            # Broken chain: keep what is left of it, nothing else to protect
+            needed.add(p.name)
+
+    to_delete = [p for p in backups if p.name not in needed]
     for p in to_delete:
         p.unlink(missing_ok=True)
+        manifest_path(p).unlink(missing_ok=True)
     return to_delete
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+"""
+catalog.py
+----------
+SQLite index of every file inside every backup zip
+
+What this module does:
+- After each backup, records every member of every new backup_*.zip
+  (path, size, mtime, CRC, archive, and where its data starts in the zip)
+- Forgets archives that retention deleted
+- Finds files by exact name, exact path or glob in milliseconds (indexed)
+- Extracts selected files in parallel: each worker opens an archive once and
+  reads members straight from the offsets stored in the catalog
+
+The catalog is filled from finished archives (sync()), not while a zip is
+written: a zip only has its central directory once it is closed. A backup
+that crashes before its sync() is indexed by the next sync(), and the
+search / extract commands sync first.
+
+The catalog lives next to the backups (_backups/catalog.sqlite).
+Snapshots of the "chunked" store have their own manifests and are not listed here.
+"""
+
+import os
+import sqlite3
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional
+
+
+CATALOG_NAME = "catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    archive_id INTEGER NOT NULL REFERENCES archives(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime TEXT NOT NULL,
+    crc INTEGER NOT NULL,
+    compress_type INTEGER NOT NULL,
+    compress_size INTEGER NOT NULL,
+    flag_bits INTEGER NOT NULL,
+    header_offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_path ON members(path);
+CREATE INDEX IF NOT EXISTS members_name ON members(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS members_archive ON members(archive_id);
+"""
+
+GLOB_CHARS = set("*?[")
+
+
+def _safe_target(out_dir: Path, member_path: str) -> Path:
+    """out_dir / member_path, with absolute parts and '..' removed (like zipfile.extract)."""
+    parts = [p for p in PurePosixPath(member_path.replace("\\", "/")).parts
+             if p not in ("", ".", "..", "/")]
+    return out_dir.joinpath(*parts)
+
+
+def _member_info(row: Dict[str, Any]) -> zipfile.ZipInfo:
+    """The ZipInfo of one catalog row (ZipFile.open() seeks to header_offset and checks the CRC)."""
+    info = zipfile.ZipInfo(row["path"])
+    info.compress_type = row["compress_type"]
+    info.compress_size = row["compress_size"]
+    info.file_size = row["size"]
+    info.CRC = row["crc"]
+    info.flag_bits = row["flag_bits"]
+    info.header_offset = row["header_offset"]
+    return info
+
+
+class BackupCatalog:
+    """
+    Usage:
+        catalog = BackupCatalog(backup_dir)
+        catalog.sync()                       # after each backup / cleanup
+        rows = catalog.search("*.pdf")
+        catalog.extract(rows, Path("restored"))
+    """
+
+    def __init__(self, backup_dir: Path, db_path: Optional[Path] = None) -> None:
+        self.backup_dir = Path(backup_dir)
+        self.db_path = Path(db_path) if db_path else self.backup_dir / CATALOG_NAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "BackupCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # indexing
+
+    def add_archive(self, zip_path: Path) -> int:
+        """Indexes one zip (replaces its old entries). Returns: member count."""
+        st = zip_path.stat()
+        with zipfile.ZipFile(zip_path) as zf:
+            infos = [i for i in zf.infolist() if not i.is_dir()]
+
+        with self._db:
+            self._db.execute("DELETE FROM archives WHERE name = ?", (zip_path.name,))
+            cur = self._db.execute(
+                "INSERT INTO archives (name, size, mtime, indexed_at) VALUES (?, ?, ?, ?)",
+                (zip_path.name, st.st_size, st.st_mtime, datetime.now().isoformat(timespec="seconds")),
+            )
+            archive_id = cur.lastrowid
+            self._db.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        archive_id, i.filename, PurePosixPath(i.filename).name, i.file_size,
+                        "%04d-%02d-%02d %02d:%02d:%02d" % i.date_time, i.CRC,
+                        i.compress_type, i.compress_size, i.flag_bits, i.header_offset,
+                    )
+                    for i in infos
+                ),
+            )
+        return len(infos)
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Brings the catalog in line with the backup folder:
+        new or rewritten zips are indexed, deleted zips are dropped.
+        """
+        on_disk = {p.name: p for p in self.backup_dir.glob("backup_*.zip")}
+        known = {r["name"]: (r["size"], r["mtime"])
+                 for r in self._db.execute("SELECT name, size, mtime FROM archives")}
+
+        added = members = 0
+        for name, path in sorted(on_disk.items()):
+            st = path.stat()
+            if known.get(name) == (st.st_size, st.st_mtime):
+                continue
+            try:
+                members += self.add_archive(path)
+            except zipfile.BadZipFile:
+                continue   # still being written or damaged: picked up by a later sync
+            added += 1
+
+        gone = [name for name in known if name not in on_disk]
+        with self._db:
+            self._db.executemany("DELETE FROM archives WHERE name = ?", ((n,) for n in gone))
+
+        return {"added": added, "members": members, "removed": len(gone)}
+
+    # searching
+
+    def search(
+        self,
+        pattern: str,
+        archive: Optional[str] = None,
+        latest_only: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds members.
+
+        pattern:
+            with * ? [ -> glob on the full path ("Docs/*.pdf", "*invoice*")
+            with a /   -> exact path
+            otherwise  -> exact file name, any folder (case-insensitive)
+        archive: only this zip
+        latest_only: one row per path, from the newest archive that has it
+
+        Rows are newest archive first.
+        """
+        if GLOB_CHARS & set(pattern):
+            where, args = "m.path GLOB ?", [pattern]
+        elif "/" in pattern:
+            where, args = "m.path = ?", [pattern]
+        else:
+            where, args = "m.name = ? COLLATE NOCASE", [pattern]
+
+        if archive is not None:
+            where += " AND a.name = ?"
+            args.append(archive)
+
+        sql = (
+            "SELECT a.name AS archive, m.path, m.size, m.mtime, m.crc, m.compress_type, "
+            "m.compress_size, m.flag_bits, m.header_offset "
+            "FROM members m JOIN archives a ON a.id = m.archive_id "
+            f"WHERE {where} ORDER BY a.name DESC, m.path"
+        )
+        rows = [dict(r) for r in self._db.execute(sql, args)]
+
+        if latest_only:
+            seen = set()
+            rows = [r for r in rows if not (r["path"] in seen or seen.add(r["path"]))]
+        if limit is not None:
+            rows = rows[:limit]
+        return rows
+
+    # extracting
+
+    def _extract_one(self, zf: zipfile.ZipFile, row: Dict[str, Any], out_dir: Path) -> Path:
+        target = _safe_target(out_dir, row["path"])
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        with zf.open(_member_info(row)) as src, open(target, "wb") as dst:
+            for block in iter(lambda: src.read(1024 * 1024), b""):
+                dst.write(block)
+
+        mtime = datetime.strptime(row["mtime"], "%Y-%m-%d %H:%M:%S").timestamp()
+        os.utime(target, (mtime, mtime))
+        return target
+
+    def extract(self, rows: List[Dict[str, Any]], out_dir: Path, workers: int = 4) -> List[Path]:
+        """
+        Extracts the given search rows into out_dir (in parallel). Returns: written paths.
+        If a path appears in several rows, only the first one (newest archive) is written.
+        """
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        seen = set()
+        rows = [r for r in rows if not (r["path"] in seen or seen.add(r["path"]))]
+
+        # One open ZipFile per archive and worker thread (a ZipFile is not shared
+        # between threads); all closed at the end
+        local = threading.local()
+        opened: List[zipfile.ZipFile] = []
+        lock = threading.Lock()
+
+        def extract_row(row: Dict[str, Any]) -> Path:
+            archives = getattr(local, "archives", None)
+            if archives is None:
+                archives = local.archives = {}
+            zf = archives.get(row["archive"])
+            if zf is None:
+                zf = archives[row["archive"]] = zipfile.ZipFile(self.backup_dir / row["archive"])
+                with lock:
+                    opened.append(zf)
+            return self._extract_one(zf, row, out_dir)
+
+        try:
+            if workers <= 1 or len(rows) <= 1:
+                return [extract_row(r) for r in rows]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(extract_row, rows))
+        finally:
+            for zf in opened:
+                zf.close()
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+"""
+chunkstore.py
+-------------
+Content-addressed backup store: every unique piece of data is kept once
+
+Layout (inside the backup folder):
+    store/chunks/ab/abcdef...      one compressed chunk, named by its hash
+    store/snapshots/snap_<stamp>.jsonl
+        line 1: header (created_at, counts)
+        then one line per file: [path, size, mtime, [chunk ids]]
+        (<stamp> = YYYY-MM-DD_HH-MM-SS_micro; "_001", "_002"... if that name is taken)
+
+What this module does:
+- Splits files into content-defined chunks (a cut depends only on the bytes
+  around it, so an insert early in a file does not shift every later chunk)
+- Stores each chunk once (zlib), so unchanged data costs nothing to back up again
+- Skips reading files whose size and mtime match the previous snapshot
+- Retention = drop old snapshot manifests, then delete chunks nobody references
+
+Do not run prune() while a backup into the same store is running.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.walker import walk_files
+
+
+# Chunk sizes: cuts happen on average every ~1 MB, never below MIN or above MAX
+MIN_CHUNK = 256 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+CUT_MASK = np.uint32(0xFFFFF000)      # 20 high bits -> 1 cut per ~1 MB of candidates
+
+READ_BLOCK = 8 * 1024 * 1024
+
+SNAPSHOT_SUFFIX = ".jsonl"
+
+# Fixed random table for the gear hash (fixed seed: cut points must never change)
+_GEAR = np.random.default_rng(0x5EED).integers(0, 2 ** 32, size=256, dtype=np.uint32)
+
+
+def _cut_candidates(buf: bytes) -> np.ndarray:
+    """
+    Positions i where the gear hash of bytes [i-31, i] matches CUT_MASK.
+
+    Gear hash: h_i = sum(G[b_(i-k)] << k for k in 0..31) (32-bit).
+    Built by doubling the window 5 times instead of a per-byte loop.
+    """
+    h = _GEAR[np.frombuffer(buf, dtype=np.uint8)]
+    shifted = np.empty_like(h)
+    n = len(h)
+    for shift in (1, 2, 4, 8, 16):
+        if shift >= n:
+            break
+        np.left_shift(h[:n - shift], shift, out=shifted[:n - shift], dtype=np.uint32)
+        np.add(h[shift:], shifted[:n - shift], out=h[shift:])
+    return np.flatnonzero((h & CUT_MASK) == 0)
+
+
+def _cut_points(buf: bytes, final: bool) -> List[int]:
+    """Chunk ends inside buf (the tail after the last one is left for the next read)."""
+    candidates = _cut_candidates(buf)
+    cuts: List[int] = []
+    start = 0
+
+    while True:
+        lo, hi = start + MIN_CHUNK, start + MAX_CHUNK
+        i = int(np.searchsorted(candidates, lo - 1))
+        if i < len(candidates) and candidates[i] < hi:
+            end = int(candidates[i]) + 1
+        elif hi <= len(buf):
+            end = hi
+        else:
+            break
+        cuts.append(end)
+        start = end
+
+    if final and start < len(buf):
+        cuts.append(len(buf))
+    return cuts
+
+
+def iter_chunks(f: BinaryIO) -> Iterator[bytes]:
+    """Content-defined chunks of an open binary file."""
+    pending = b""
+    while True:
+        block = f.read(READ_BLOCK)
+        final = not block
+        buf = pending + block
+
+        start = 0
+        for end in _cut_points(buf, final):
+            yield buf[start:end]
+            start = end
+        pending = buf[start:]
+
+        if final:
+            return
+
+
+def chunk_id(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+class ChunkStore:
+    """
+    A backup repository of deduplicated chunks + snapshot manifests.
+
+    Parameters:
+        root: store folder (created if missing)
+        workers: threads compressing/writing new chunks (zlib releases the GIL)
+        level: zlib compression level
+    """
+
+    def __init__(self, root: Path, workers: int = 4, level: int = 6) -> None:
+        self.root = Path(root)
+        self.chunks_dir = self.root / "chunks"
+        self.snapshots_dir = self.root / "snapshots"
+        self.workers = max(1, workers)
+        self.level = level
+
+    # chunks
+
+    def _chunk_path(self, cid: str) -> Path:
+        return self.chunks_dir / cid[:2] / cid
+
+    def _write_chunk(self, path: Path, data: bytes) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        packed = zlib.compress(data, self.level)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(packed)
+        os.replace(tmp, path)   # readers never see half a chunk
+        return len(packed)
+
+    def read_chunk(self, cid: str) -> bytes:
+        data = zlib.decompress(self._chunk_path(cid).read_bytes())
+        if chunk_id(data) != cid:
+            raise ValueError(f"Chunk {cid} is corrupted")
+        return data
+
+    # snapshots
+
+    def snapshots(self) -> List[Path]:
+        """Snapshot manifests, oldest first (names sort by time)."""
+        if not self.snapshots_dir.exists():
+            return []
+        return sorted(self.snapshots_dir.glob("snap_*" + SNAPSHOT_SUFFIX))
+
+    def resolve(self, name: str) -> Path:
+        """Snapshot path from a name ("snap_<stamp>", with or without suffix) or "latest"."""
+        if name == "latest":
+            snaps = self.snapshots()
+            if not snaps:
+                raise FileNotFoundError(f"No snapshots in {self.root}")
+            return snaps[-1]
+        if not name.endswith(SNAPSHOT_SUFFIX):
+            name += SNAPSHOT_SUFFIX
+        path = self.snapshots_dir / name
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot not found: {path}")
+        return path
+
+    @staticmethod
+    def read_header(snapshot: Path) -> Dict[str, Any]:
+        with open(snapshot, "r", encoding="utf-8") as f:
+            return json.loads(f.readline())
+
+    @staticmethod
+    def iter_files(snapshot: Path) -> Iterator[Tuple[str, int, float, List[str]]]:
+        """(path, size, mtime, chunk ids) for every file in a snapshot."""
+        with open(snapshot, "r", encoding="utf-8") as f:
+            f.readline()  # header
+            for line in f:
+                if line.strip():
+                    rel, size, mtime, chunks = json.loads(line)
+                    yield rel, size, mtime, chunks
+
+    # backup / restore
+
+    def backup(
+        self,
+        source_folder: Path,
+        stamp: Optional[str] = None,
+        skip_dir_names: Optional[List[str]] = None,
+        max_file_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Adds a snapshot of source_folder named snap_<stamp> (default: now, to the microsecond).
+        The name is never reused: a taken one gets a "_001", "_002"... suffix.
+
+        Returns:
+            the snapshot header (file count, new chunks, new bytes on disk...)
+            + "snapshot": path of the new manifest
+        """
+        stamp = stamp or datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        skip_dir_names = skip_dir_names or ["_backups"]
+        max_bytes = max_file_mb * 1024 * 1024 if max_file_mb is not None else None
+
+        # Files unchanged since the last snapshot reuse its chunk list without a read
+        previous: Dict[str, Tuple[int, float, List[str]]] = {}
+        snaps = self.snapshots()
+        if snaps:
+            previous = {rel: (size, mtime, chunks) for rel, size, mtime, chunks in self.iter_files(snaps[-1])}
+
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        # Own temp file: two backups at once never write into each other's
+        fd, tmp_name = tempfile.mkstemp(prefix=f".snap_{stamp}_", suffix=".tmp", dir=self.snapshots_dir)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+
+        counts = {"file_count": 0, "bytes_total": 0, "new_chunks": 0, "bytes_stored": 0, "files_read": 0}
+        seen_this_run = set()
+        in_flight: List[Future] = []
+
+        def drain(limit: int) -> None:
+            while len(in_flight) > limit:
+                counts["bytes_stored"] += in_flight.pop(0).result()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                out.write("\n")   # header placeholder, rewritten below
+
+                for entry in walk_files(source_folder, skip_dir_names=skip_dir_names, max_depth=None):
+                    if max_bytes is not None and entry.size > max_bytes:
+                        continue
+
+                    old = previous.get(entry.rel)
+                    if old is not None and old[0] == entry.size and old[1] == entry.mtime:
+                        chunks = old[2]
+                    else:
+                        chunks = []
+                        try:
+                            with open(entry.path, "rb") as f:
+                                for data in iter_chunks(f):
+                                    cid = chunk_id(data)
+                                    chunks.append(cid)
+                                    if cid in seen_this_run:
+                                        continue
+                                    seen_this_run.add(cid)
+
+                                    path = self._chunk_path(cid)
+                                    if path.exists():
+                                        continue
+                                    counts["new_chunks"] += 1
+                                    in_flight.append(pool.submit(self._write_chunk, path, data))
+                                    drain(self.workers * 2)   # bounds memory held by queued chunks
+                        except PermissionError:
+                            # Locked right now: keep the last snapshot's version if there is one
+                            if old is None:
+                                continue
+                            chunks = old[2]
+                        else:
+                            counts["files_read"] += 1
+
+                    out.write(json.dumps([entry.rel, entry.size, entry.mtime, chunks], ensure_ascii=False) + "\n")
+                    counts["file_count"] += 1
+                    counts["bytes_total"] += entry.size
+
+            drain(0)
+        finally:
+            pool.shutdown()
+
+        header = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "source": str(source_folder),
+            **counts,
+        }
+
+        # Write header + body to the final name; the manifest only appears once
+        # every chunk it references is on disk
+        with open(tmp_path, "r", encoding="utf-8") as src:
+            snap_path, dst = self._create_snapshot_file(stamp)
+            with dst:
+                src.readline()
+                dst.write(json.dumps(header) + "\n")
+                for line in src:
+                    dst.write(line)
+        tmp_path.unlink()
+
+        return {**header, "snapshot": str(snap_path)}
+
+    def _create_snapshot_file(self, stamp: str) -> Tuple[Path, Any]:
+        """Opens snap_<stamp>.jsonl with exclusive create ("_001", "_002"... if it exists)."""
+        n = 0
+        while True:
+            name = f"snap_{stamp}{f'_{n:03d}' if n else ''}{SNAPSHOT_SUFFIX}"
+            try:
+                return self.snapshots_dir / name, open(self.snapshots_dir / name, "x", encoding="utf-8")
+            except FileExistsError:
+                n += 1
+
+    def restore(self, snapshot: Path, out_dir: Path) -> int:
+        """Rebuilds the folder of one snapshot into out_dir. Returns: files restored."""
+        out_dir.mkdir(parents=True, exist_ok=True)
+        restored = 0
+        for rel, _, mtime, chunks in self.iter_files(snapshot):
+            target = out_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as f:
+                for cid in chunks:
+                    f.write(self.read_chunk(cid))
+            os.utime(target, (mtime, mtime))
+            restored += 1
+        return restored
+
+    # retention
+
+    def prune(self, keep_last: int) -> Dict[str, Any]:
+        """
+        Keeps the newest keep_last snapshots, then deletes unreferenced chunks.
+
+        Returns:
+            deleted snapshot paths, deleted chunk count and freed bytes
+        """
+        snaps = self.snapshots()
+        dropped = snaps[:-keep_last] if keep_last > 0 else snaps
+        for p in dropped:
+            p.unlink(missing_ok=True)
+
+        live = set()
+        for snap in self.snapshots():
+            for _, _, _, chunks in self.iter_files(snap):
+                live.update(chunks)
+
+        deleted_chunks = 0
+        freed = 0
+        if self.chunks_dir.exists():
+            for entry in walk_files(self.chunks_dir, max_depth=None):
+                cid = entry.name
+                # Leftover .tmp files come from interrupted writes
+                if cid in live and not cid.endswith(".tmp"):
+                    continue
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                deleted_chunks += 1
+                freed += entry.size
+
+        return {"deleted_snapshots": dropped, "deleted_chunks": deleted_chunks, "freed_bytes": freed}
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+"""
+compression.py
+--------------
+Pick how each file is compressed in a backup zip
+
+Why:
+- .jpg/.mp4/.zip/... are already compressed: deflating them again saves ~0 bytes
+  and costs most of the backup's CPU time -> store them as they are
+- Text-like files (docs, code, csv) shrink a lot more with bzip2/lzma
+- Everything else gets fast deflate
+
+How a method is chosen (first match wins):
+1. Known compressed extension               -> "store"
+2. Category (top folder in Organized)       -> "store" / high method, if listed in config
+3. Entropy of a sampled block (bits/byte)   -> high entropy "store" (if a fast deflate
+                                               of the sample agrees), low entropy high method,
+                                               in between "fast"
+
+Every compressed member is counted per category and method
+(bytes in/out, seconds), so the thresholds can be tuned from real numbers.
+"""
+
+import json
+import math
+import os
+import threading
+import zipfile
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# method name -> (zip compress_type, compresslevel)
+METHODS: Dict[str, Tuple[int, Optional[int]]] = {
+    "store": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "deflate": (zipfile.ZIP_DEFLATED, 6),
+    "bzip2": (zipfile.ZIP_BZIP2, 9),
+    "lzma": (zipfile.ZIP_LZMA, None),
+}
+
+# Formats that are compressed internally (zip containers included: docx, xlsx, ...)
+COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".mp4", ".mkv", ".mov", ".avi", ".wmv", ".webm", ".m4v",
+    ".mp3", ".m4a", ".aac", ".ogg", ".flac",
+    ".zip", ".rar", ".7z", ".gz", ".tgz", ".bz2", ".xz",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar", ".apk",
+    ".pdf",
+}
+
+# Files this small are deflated without sampling (an extra open costs more than it saves)
+SMALL_FILE_BYTES = 16 * 1024
+
+
+def read_sample(path: str, size: int, sample_bytes: int = 64 * 1024) -> Optional[bytes]:
+    """
+    One block from the middle of the file (None if unreadable).
+    The middle skips headers, which are rarely typical of the data.
+    """
+    try:
+        with open(path, "rb") as f:
+            if size > sample_bytes:
+                f.seek((size - sample_bytes) // 2)
+            return f.read(sample_bytes)
+    except OSError:
+        return None
+
+
+def byte_entropy(data: bytes) -> float:
+    """Shannon entropy of the byte values, 0..8 bits per byte."""
+    if not data:
+        return 0.0
+    n = len(data)
+    return -sum(c / n * math.log2(c / n) for c in Counter(data).values()) or 0.0
+
+
+class CompressionPolicy:
+    """
+    Chooses a method ("store", "fast", "deflate", "bzip2", "lzma") per file.
+
+    Parameters:
+        store_categories: categories stored as-is (when the extension does not say otherwise)
+        high_categories: categories compressed with high_method
+        high_method: "bzip2" (opens everywhere unzip does) or "lzma" (smaller, fewer tools)
+        entropy_store: sampled entropy at/above this -> "store"
+        entropy_high: sampled entropy at/below this -> high_method
+        sample_bytes: size of the sampled block
+        high_max_mb: bigger files never use high_method (it is single-threaded per file)
+    """
+
+    def __init__(
+        self,
+        store_categories=(),
+        high_categories=(),
+        high_method: str = "bzip2",
+        entropy_store: float = 7.5,
+        entropy_high: float = 5.0,
+        sample_bytes: int = 64 * 1024,
+        high_max_mb: int = 64
+    ) -> None:
+        if high_method not in ("bzip2", "lzma"):
+            raise ValueError(f"high_method must be 'bzip2' or 'lzma', got {high_method!r}")
+        self.store_categories = set(store_categories)
+        self.high_categories = set(high_categories)
+        self.high_method = high_method
+        self.entropy_store = entropy_store
+        self.entropy_high = entropy_high
+        self.sample_bytes = sample_bytes
+        self.high_max_bytes = high_max_mb * 1024 * 1024
+
+    @classmethod
+    def from_config(cls, comp_cfg: dict) -> Optional["CompressionPolicy"]:
+        """Builds a policy from the "compression" section of rules.json (None if disabled)."""
+        if not comp_cfg.get("enabled", False):
+            return None
+        return cls(
+            store_categories=comp_cfg.get("store_categories", []),
+            high_categories=comp_cfg.get("high_categories", []),
+            high_method=comp_cfg.get("high_method", "bzip2"),
+            entropy_store=float(comp_cfg.get("entropy_store", 7.5)),
+            entropy_high=float(comp_cfg.get("entropy_high", 5.0)),
+            sample_bytes=int(comp_cfg.get("sample_bytes", 64 * 1024)),
+            high_max_mb=int(comp_cfg.get("high_max_mb", 64)),
+        )
+
+    def _high(self, size: int) -> str:
+        return self.high_method if size <= self.high_max_bytes else "deflate"
+
+    def choose(self, path: str, rel: str, size: int) -> str:
+        category = category_of(rel)
+        ext = os.path.splitext(rel)[1].lower()
+
+        if ext in COMPRESSED_EXTENSIONS:
+            return "store"
+        if category in self.store_categories:
+            return "store"
+        if category in self.high_categories:
+            return self._high(size)
+
+        if size <= SMALL_FILE_BYTES:
+            return "deflate"
+
+        sample = read_sample(path, size, self.sample_bytes)
+        if sample is None:
+            return "deflate"
+
+        entropy = byte_entropy(sample)
+        if entropy >= self.entropy_store:
+            # Byte counts miss repeating patterns (e.g. 0..255 over and over):
+            # confirm with a level-1 deflate of the same sample before storing
+            if len(zlib.compress(sample, 1)) >= len(sample) * 0.95:
+                return "store"
+            return "fast"
+        if entropy <= self.entropy_high:
+            return self._high(size)
+        return "fast"
+
+
+def category_of(rel: str) -> Optional[str]:
+    """Category of a path inside Organized (its top folder), None for top-level files."""
+    parts = rel.replace("\\", "/").split("/", 1)
+    return parts[0] if len(parts) > 1 else None
+
+
+class CompressionStats:
+    """
+    Per category + method totals: files, bytes_in, bytes_out, seconds.
+
+    Thread-safe (compression workers record directly). save() adds this run's
+    numbers to the totals already in the stats file.
+
+    on_member: optional callback(rel, method, bytes_in, bytes_out, seconds) per member
+               (e.g. one verbose log line per backed-up file)
+    """
+
+    def __init__(self, on_member: Optional[Callable[[str, str, int, int, float], None]] = None) -> None:
+        self._lock = threading.Lock()
+        self.totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.on_member = on_member
+
+    def record(self, rel: str, method: str, bytes_in: int, bytes_out: int, seconds: float) -> None:
+        category = category_of(rel) or "(top level)"
+        with self._lock:
+            t = self.totals.setdefault(category, {}).setdefault(
+                method, {"files": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0})
+            t["files"] += 1
+            t["bytes_in"] += bytes_in
+            t["bytes_out"] += bytes_out
+            t["seconds"] += seconds
+        if self.on_member is not None:
+            self.on_member(rel, method, bytes_in, bytes_out, seconds)
+
+    def overall(self) -> Dict[str, float]:
+        """files, bytes_in, bytes_out, seconds over every category and method."""
+        total = {"files": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+        with self._lock:
+            for methods in self.totals.values():
+                for t in methods.values():
+                    for key in total:
+                        total[key] += t[key]
+        return total
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Totals plus ratio (out/in) and throughput (MB/s of input)."""
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for category, methods in self.totals.items():
+            for method, t in methods.items():
+                row = dict(t)
+                row["ratio"] = round(t["bytes_out"] / t["bytes_in"], 4) if t["bytes_in"] else 1.0
+                row["mb_per_s"] = round(t["bytes_in"] / 1e6 / t["seconds"], 1) if t["seconds"] else None
+                out.setdefault(category, {})[method] = row
+        return out
+
+    def save(self, stats_file: Path) -> None:
+        """Merges this run into stats_file (atomic write)."""
+        stats_file = Path(stats_file)
+        merged: Dict[str, Dict[str, Dict[str, float]]] = {}
+        if stats_file.exists():
+            try:
+                merged = json.loads(stats_file.read_text(encoding="utf-8")).get("totals", {})
+            except (OSError, json.JSONDecodeError):
+                merged = {}
+
+        for category, methods in self.totals.items():
+            for method, t in methods.items():
+                m = merged.setdefault(category, {}).setdefault(
+                    method, {"files": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0})
+                for k in ("files", "bytes_in", "bytes_out", "seconds"):
+                    m[k] += t[k]
+
+        view = CompressionStats()
+        view.totals = merged
+
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = stats_file.with_suffix(stats_file.suffix + ".tmp")
+        tmp.write_text(json.dumps({"totals": merged, "summary": view.summary()}, indent=2), encoding="utf-8")
+        os.replace(tmp, stats_file)
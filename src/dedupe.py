@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+"""
+dedupe.py
+---------
+Find byte-identical files without reading most of them
+
+Stages (each one only looks at what the previous stage could not rule out):
+1. Size buckets   - files with a unique size cannot have a copy (no reading at all)
+2. Partial hash   - hash of the first + last block (2 x 64 KB read per file)
+3. Full hash      - only for files that still look identical after stage 2
+
+Hashing runs in a thread pool (hashlib releases the GIL on big buffers).
+OrganizedIndex keeps the sizes of already organized files between watch
+batches, so the Organized tree is walked once, not once per batch.
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.walker import FileEntry, walk_files
+
+
+BLOCK_SIZE = 64 * 1024
+READ_CHUNK = 1024 * 1024
+
+ACTIONS = ("skip", "hardlink", "move")
+
+
+def _partial_hash(path: str, size: int) -> Optional[bytes]:
+    """Hash of the first and last block (the whole file if it is small)."""
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            h.update(f.read(BLOCK_SIZE))
+            if size > BLOCK_SIZE:
+                f.seek(max(BLOCK_SIZE, size - BLOCK_SIZE))
+                h.update(f.read(BLOCK_SIZE))
+    except OSError:
+        return None
+    return h.digest()
+
+
+def _full_hash(path: str) -> Optional[bytes]:
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(READ_CHUNK), b""):
+                h.update(block)
+    except OSError:
+        return None
+    return h.digest()
+
+
+def _group_by(pool: ThreadPoolExecutor, groups: Iterable[List[FileEntry]], hash_fn) -> List[List[FileEntry]]:
+    """Splits each group by hash_fn(entry); keeps only sub-groups with 2+ files."""
+    groups = list(groups)
+    flat = [e for g in groups for e in g]
+    digests = dict(zip((e.path for e in flat), pool.map(hash_fn, flat)))
+
+    result: List[List[FileEntry]] = []
+    for group in groups:
+        by_digest: Dict[bytes, List[FileEntry]] = {}
+        for e in group:
+            digest = digests[e.path]
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(e)
+        result.extend(g for g in by_digest.values() if len(g) > 1)
+    return result
+
+
+class OrganizedIndex:
+    """
+    Organized files by size, listed on first use and then kept up to date
+    with add() as files are organized (watch mode reuses one per session).
+
+    Files removed or changed behind our back are harmless: a missing file
+    fails to hash and drops out, a changed one is hashed as it is now.
+    Files that reach the Organized folder some other way are not seen
+    until a new index is built.
+    """
+
+    def __init__(self, root: Path, skip_dir_names: Optional[Iterable[str]] = None):
+        self.root = Path(root)
+        self.skip_dir_names = list(skip_dir_names or [])
+        self._by_size: Optional[Dict[int, Dict[str, FileEntry]]] = None
+        self.walks = 0
+
+    def _load(self) -> Dict[int, Dict[str, FileEntry]]:
+        if self._by_size is None:
+            self._by_size = {}
+            if self.root.exists():
+                self.walks += 1
+                for e in walk_files(self.root, skip_dir_names=self.skip_dir_names, max_depth=None):
+                    self._by_size.setdefault(e.size, {})[e.path] = e
+        return self._by_size
+
+    def with_sizes(self, sizes: Set[int]) -> List[FileEntry]:
+        """Organized files whose size is in sizes (the only ones that can match)."""
+        by_size = self._load()
+        return [e for size in sizes for e in by_size.get(size, {}).values()]
+
+    def add(self, path: str, size: int) -> None:
+        """A file just organized to path (inode unknown: it is not stat'ed again)."""
+        if self._by_size is not None:
+            self._by_size.setdefault(size, {})[path] = FileEntry(path, "", 0, size, 0.0)
+
+
+def find_duplicates(
+    batch: List[FileEntry],
+    existing: Iterable[FileEntry] = (),
+    workers: int = 4,
+    min_size: int = 1
+) -> Dict[str, str]:
+    """
+    Finds files in batch that are byte-identical to another file.
+
+    Parameters:
+        batch: files about to be organized (scan order matters)
+        existing: files already organized (they are always the copy we keep)
+        workers: hashing threads
+        min_size: smaller files are ignored (default skips empty files)
+
+    Returns:
+        {duplicate path: path of the copy to keep}
+        The kept copy is an existing file if there is one, else the first
+        file of the batch (in scan order). Only batch files are ever duplicates.
+    """
+    # Stage 1: size buckets (metadata only)
+    batch_sizes = {e.size for e in batch if e.size >= min_size}
+    if not batch_sizes:
+        return {}
+
+    # (is_batch, order, entry): existing files sort first, then batch in scan order
+    by_size: Dict[int, List[Tuple[int, int, FileEntry]]] = {}
+    for order, e in enumerate(existing):
+        if e.size in batch_sizes:
+            by_size.setdefault(e.size, []).append((0, order, e))
+    for order, e in enumerate(batch):
+        if e.size in batch_sizes:
+            by_size.setdefault(e.size, []).append((1, order, e))
+
+    groups = [[e for _, _, e in sorted(group, key=lambda t: t[:2])]
+              for group in by_size.values()
+              if len(group) > 1 and any(is_batch for is_batch, _, _ in group)]
+    if not groups:
+        return {}
+
+    batch_paths = {e.path for e in batch}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Stage 2: first + last block
+        groups = _group_by(pool, groups, lambda e: _partial_hash(e.path, e.size))
+
+        # Stage 3: full hash, only where the partial hash did not read everything
+        small = [g for g in groups if g[0].size <= 2 * BLOCK_SIZE]
+        large = [g for g in groups if g[0].size > 2 * BLOCK_SIZE]
+        groups = small + _group_by(pool, large, lambda e: _full_hash(e.path))
+
+    duplicates: Dict[str, str] = {}
+    for group in groups:
+        # Groups keep the order from stage 1: existing files first, then scan order
+        keep = group[0]
+        for e in group[1:]:
+            if e.ino and (e.dev, e.ino) == (keep.dev, keep.ino):
+                continue   # already a hard link to the same data
+            if e.path in batch_paths:
+                duplicates[e.path] = keep.path
+
+    return duplicates
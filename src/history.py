@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+"""
+history.py
+----------
+Every run's records, kept forever in a small date-partitioned store
+
+Layout (runs/history/):
+    raw/date=2026-01-31/run_<id>.csv.gz    moved records of one run on one day
+    rollup.json                            daily rollup [date, category, files, bytes]
+                                           + run ids already added (never counted twice),
+                                           saved together in one atomic write
+    rollup.lock                            held while a run is added (the watch daemon
+                                           and cron runs may add at the same time)
+
+What this module does:
+- Adds finished runs from the run journals (runs/index.jsonl) to the store
+- Keeps the daily rollup up to date as each run is added (no re-scan of raw rows)
+- Answers "files / bytes per category per day, week or month" from the rollup only
+
+Only files that really moved are counted (dry runs and skipped duplicates are not).
+
+The ledger of added run ids stays small: ids of runs started more than
+LEDGER_DAYS before the newest added run are folded into one mark
+("ingested_before"). The mark alone does not prove a run was added (an old
+journal from before history existed is older than any mark): a run below it
+counts as added only if it has raw partitions. sync() then still backfills
+old journals; old runs with nothing to count (dry runs) are read again by
+each sync() and add nothing.
+"""
+
+import csv
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.journal import RUNS_DIR, iter_records, list_runs, run_path
+
+
+HISTORY_DIR = RUNS_DIR / "history"
+
+RAW_COLUMNS = ["run_id", "moved_at", "category", "size_bytes", "action", "src", "dst"]
+
+PERIODS = ("day", "week", "month")
+
+# Run ids (they start with the run's start time) are kept one by one for this long
+LEDGER_DAYS = 7
+
+
+def _period_key(day: str, period: str) -> str:
+    if period == "day":
+        return day
+    d = date.fromisoformat(day)
+    if period == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day[:7]
+
+
+def iso_day(value: str) -> str:
+    """"2026-01-31" (or "20260131") -> "2026-01-31"; ValueError if it is not a date."""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"not a YYYY-MM-DD date: {value!r}") from None
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Exclusive lock on path, across processes (released if the process dies)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue   # LK_LOCK gives up after ~10 s: keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class _Ledger:
+    """Run ids already added: recent ones one by one, older ones folded below one mark."""
+
+    def __init__(self, ids: Iterable[str] = (), before: Optional[str] = None) -> None:
+        self.ids = set(ids)
+        self.before = before
+
+    def folded(self, run_id: str) -> bool:
+        """True if run_id is below the mark (added or not: check its raw partitions)."""
+        return run_id not in self.ids and self.before is not None and run_id < self.before
+
+    def add(self, run_id: str) -> None:
+        self.ids.add(run_id)
+        try:
+            newest = date.fromisoformat(max(self.ids)[:10])
+        except ValueError:
+            return   # custom run ids (not date-stamped): keep them all
+        cutoff = (newest - timedelta(days=LEDGER_DAYS)).isoformat()
+        if self.before is None or cutoff > self.before:
+            self.before = cutoff
+        self.ids = {i for i in self.ids if i >= self.before}
+
+
+class HistoryStore:
+    """
+    Usage:
+        history = HistoryStore()
+        history.sync()                          # after each organize run
+        rows = history.trends("2026-01-01", "2026-03-31", period="week")
+    """
+
+    def __init__(self, root: Path = HISTORY_DIR) -> None:
+        self.root = Path(root)
+        self.raw_dir = self.root / "raw"
+        self.rollup_path = self.root / "rollup.json"
+        self.lock_path = self.root / "rollup.lock"
+
+    # ingesting
+
+    def _load(self) -> Tuple[_Ledger, Dict[Tuple[str, str], List[int]]]:
+        """(ingested run ids, {(date, category): [files, bytes]})"""
+        if not self.rollup_path.exists():
+            return _Ledger(), {}
+        state = json.loads(self.rollup_path.read_text(encoding="utf-8"))
+        daily = {(day, category): [files, size] for day, category, files, size in state["daily"]}
+        return _Ledger(state["ingested"], state.get("ingested_before")), daily
+
+    def _raw_run_ids(self, run_id: str = "*") -> Set[str]:
+        """Run ids with at least one raw partition (all of them, or just run_id)."""
+        if not self.raw_dir.exists():
+            return set()
+        return {p.name[len("run_"):-len(".csv.gz")] for p in self.raw_dir.glob(f"date=*/run_{run_id}.csv.gz")}
+
+    def _save(self, ingested: _Ledger, daily: Dict[Tuple[str, str], List[int]]) -> None:
+        state = {
+            "ingested": sorted(ingested.ids),
+            "ingested_before": ingested.before,
+            "daily": [[day, category, files, size] for (day, category), (files, size) in sorted(daily.items())],
+        }
+        tmp = self.rollup_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.rollup_path)
+
+    def add_run(self, run_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds one run: raw rows into date partitions, counts into the daily rollup.
+        Returns: records added (0 if the run was already in the store).
+        """
+        with _locked(self.lock_path):
+            return self._add_run(run_id, records)
+
+    def _add_run(self, run_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        ledger = self._load()[0]
+        if run_id in ledger.ids or (ledger.folded(run_id) and self._raw_run_ids(run_id)):
+            return 0
+
+        deltas: Dict[Tuple[str, str], List[int]] = {}
+        open_parts: Dict[str, Tuple[Any, Any]] = {}
+        added = 0
+
+        try:
+            for rec in records:
+                if rec.get("dry_run") or rec.get("action") == "skipped":
+                    continue
+
+                day = (rec.get("moved_at") or "")[:10] or datetime.now().date().isoformat()
+                part = open_parts.get(day)
+                if part is None:
+                    part_dir = self.raw_dir / f"date={day}"
+                    part_dir.mkdir(parents=True, exist_ok=True)
+                    f = gzip.open(part_dir / f"run_{run_id}.csv.gz", "wt", encoding="utf-8", newline="")
+                    w = csv.writer(f)
+                    w.writerow(RAW_COLUMNS)
+                    part = open_parts[day] = (f, w)
+
+                size = int(rec.get("size_bytes") or 0)
+                part[1].writerow([run_id, rec.get("moved_at"), rec.get("category"), size,
+                                  rec.get("action", "moved"), rec.get("src"), rec.get("dst")])
+
+                d = deltas.setdefault((day, rec.get("category") or ""), [0, 0])
+                d[0] += 1
+                d[1] += size
+                added += 1
+        finally:
+            for f, _ in open_parts.values():
+                f.close()
+
+        # Rollup + ledger in one atomic write: a crash before it re-adds the
+        # run next time (its partitions are simply rewritten), never twice
+        ingested, daily = self._load()
+        for key, (files, size) in deltas.items():
+            total = daily.setdefault(key, [0, 0])
+            total[0] += files
+            total[1] += size
+        ingested.add(run_id)
+        self._save(ingested, daily)
+
+        return added
+
+    def sync(self, runs_dir: Path = RUNS_DIR) -> Dict[str, int]:
+        """Adds every finished run from the journals that is not in the store yet."""
+        done = self._load()[0]
+        raw_ids: Optional[Set[str]] = None   # listed once, only if some run is below the mark
+        runs = added = 0
+        for run in list_runs(runs_dir):
+            run_id = run["run_id"]
+            if run.get("status") == "running" or run_id in done.ids:
+                continue
+            if done.folded(run_id):
+                if run.get("summary", {}).get("moved_count") == 0:
+                    continue   # nothing to count
+                if raw_ids is None:
+                    raw_ids = self._raw_run_ids()
+                if run_id in raw_ids:
+                    continue
+            path = run_path(run, runs_dir)
+            if not path.exists():
+                continue
+            added += self.add_run(run["run_id"], iter_records(path))
+            runs += 1
+        return {"runs": runs, "records": added}
+
+    # reading
+
+    def trends(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        period: str = "week"
+    ) -> List[Dict[str, Any]]:
+        """
+        Files and bytes per period and category, from the daily rollup only.
+
+        since / until: "YYYY-MM-DD", inclusive (None = no limit); ValueError if not a date
+        period: "day", "week" (ISO, "2026-W05") or "month" ("2026-01")
+        """
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {PERIODS}, got {period!r}")
+        since = iso_day(since) if since is not None else None
+        until = iso_day(until) if until is not None else None
+
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        for (day, category), (files, size) in self._load()[1].items():
+            if since is not None and day < since:
+                continue
+            if until is not None and day > until:
+                continue
+            t = totals.setdefault((_period_key(day, period), category), [0, 0])
+            t[0] += files
+            t[1] += size
+
+        return [
+            {"period": key, "category": category, "files": files, "bytes": size}
+            for (key, category), (files, size) in sorted(totals.items())
+        ]
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+"""
+journal.py
+----------
+Run journal: one JSON Lines file per organize run
+
+What this module does:
+- Appends one line per moved file WHILE the run is happening
+  (runs/run_<id>.jsonl), flushing + fsyncing in small batches
+- Writes a header line first and a summary line last
+- Keeps runs/index.jsonl: one line when a run starts, one when it ends
+- Reads journals back as a stream (one record at a time)
+
+Why:
+- A crash halfway through keeps every record written so far
+- Memory stays flat no matter how many files a run moves
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+RUNS_DIR = Path("runs")
+INDEX_NAME = "index.jsonl"
+
+# Old single-file format (still readable)
+LEGACY_RUN_FILE = RUNS_DIR / "last_run.json"
+
+
+class RunJournal:
+    """
+    Append-only journal for one run.
+
+    Usage:
+        with RunJournal() as journal:
+            organize_folder(..., on_record=journal.append, collect=False)
+            journal.close(summary)
+
+    If the block fails, the journal is closed with status "failed"
+    (every record appended so far is kept).
+    """
+
+    def __init__(
+        self,
+        runs_dir: Path = RUNS_DIR,
+        run_id: Optional[str] = None,
+        flush_every: int = 200,
+        flush_seconds: float = 1.0
+    ) -> None:
+        self.runs_dir = Path(runs_dir)
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+
+        self.run_id = run_id or datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        self.path = self.runs_dir / f"run_{self.run_id}.jsonl"
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.count = 0
+
+        self._flush_every = flush_every
+        self._flush_seconds = flush_seconds
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._closed = False
+
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._write({"_meta": "header", "run_id": self.run_id, "started_at": self.started_at})
+        self._sync()
+
+        _append_index(self.runs_dir, {
+            "run_id": self.run_id,
+            "path": self.path.name,
+            "status": "running",
+            "started_at": self.started_at,
+        })
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def _sync(self) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Adds one record. Data hits the disk every flush_every records / flush_seconds."""
+        self._write(record)
+        self.count += 1
+        self._unflushed += 1
+
+        if (self._unflushed >= self._flush_every
+                or time.monotonic() - self._last_flush >= self._flush_seconds):
+            self._sync()
+
+    def close(self, summary: Optional[Dict[str, Any]] = None, status: str = "complete") -> Path:
+        """Writes the summary line, syncs, and marks the run finished in the index."""
+        if self._closed:
+            return self.path
+        self._closed = True
+
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        summary = dict(summary or {})
+        summary.setdefault("moved_count", self.count)
+
+        self._write({"_meta": "summary", "status": status, "saved_at": saved_at, "summary": summary})
+        self._sync()
+        self._f.close()
+
+        _append_index(self.runs_dir, {
+            "run_id": self.run_id,
+            "path": self.path.name,
+            "status": status,
+            "started_at": self.started_at,
+            "saved_at": saved_at,
+            # Aggregates stay in the journal only: the index is read whole by list_runs()
+            "summary": {k: v for k, v in summary.items() if k != "aggregates"},
+        })
+        return self.path
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.close(status="failed")
+        else:
+            self.close()
+
+
+def _append_index(runs_dir: Path, entry: Dict[str, Any]) -> None:
+    with open(runs_dir / INDEX_NAME, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def list_runs(runs_dir: Path = RUNS_DIR) -> List[Dict[str, Any]]:
+    """
+    All runs from runs/index.jsonl, oldest first.
+    A run that never finished shows status "running" (it crashed or is still going).
+    """
+    index_path = Path(runs_dir) / INDEX_NAME
+    if not index_path.exists():
+        return []
+
+    runs: Dict[str, Dict[str, Any]] = {}
+    for entry in _iter_json_lines(index_path):
+        run_id = entry.get("run_id")
+        if run_id:
+            # Later lines (end of run) replace earlier ones (start of run)
+            runs[run_id] = entry
+
+    return list(runs.values())
+
+
+def latest_run(runs_dir: Path = RUNS_DIR) -> Dict[str, Any]:
+    """Index entry of the newest run. Raises FileNotFoundError if there is none."""
+    runs = list_runs(runs_dir)
+    if runs:
+        return runs[-1]
+
+    legacy = Path(runs_dir) / LEGACY_RUN_FILE.name
+    if legacy.exists():
+        return {"run_id": "last_run", "path": legacy.name, "status": "complete"}
+
+    raise FileNotFoundError(f"No run journal found in {runs_dir}. Run --organize first.")
+
+
+def find_run(run_id: str, runs_dir: Path = RUNS_DIR) -> Dict[str, Any]:
+    """Index entry for one run id. Raises FileNotFoundError if unknown."""
+    for run in list_runs(runs_dir):
+        if run["run_id"] == run_id:
+            return run
+    raise FileNotFoundError(f"Run not found in {Path(runs_dir) / INDEX_NAME}: {run_id}")
+
+
+def run_path(run: Dict[str, Any], runs_dir: Path = RUNS_DIR) -> Path:
+    return Path(runs_dir) / run["path"]
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Streams the moved-file records of one journal, one dict at a time.
+    Also accepts the old runs/last_run.json format.
+    """
+    path = Path(path)
+
+    if path.suffix == ".json":
+        yield from json.loads(path.read_text(encoding="utf-8")).get("moved_files", [])
+        return
+
+    for obj in _iter_json_lines(path):
+        if "_meta" not in obj:
+            yield obj
+
+
+def read_summary(path: Path) -> Dict[str, Any]:
+    """
+    Summary of one journal.
+
+    Reads only the last line (seek from the end) when the run finished.
+    For a crashed run it counts the records instead.
+    """
+    path = Path(path)
+
+    if path.suffix == ".json":
+        return json.loads(path.read_text(encoding="utf-8")).get("summary", {})
+
+    last = _read_last_line(path)
+    if last is not None:
+        try:
+            obj = json.loads(last)
+            if obj.get("_meta") == "summary":
+                return obj.get("summary", {})
+        except json.JSONDecodeError:
+            pass
+
+    return {"moved_count": sum(1 for rec in iter_records(path) if rec.get("action") != "skipped"),
+            "status": "incomplete"}
+
+
+def _read_last_line(path: Path, block_size: int = 64 * 1024) -> Optional[str]:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        data = b""
+        pos = end
+
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            stripped = data.rstrip(b"\n")
+            if b"\n" in stripped:
+                return stripped.rsplit(b"\n", 1)[1].decode("utf-8")
+
+        stripped = data.rstrip(b"\n")
+        return stripped.decode("utf-8") if stripped else None
+
+
+def _iter_json_lines(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Half-written last line after a crash: skip it
+                continue
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+"""
+light_report.py
+---------------
+Report without pandas / openpyxl (standard library only, starts instantly)
+
+- CSV:  every moved record (one row each) - opens in Excel
+- JSON: summary per category + top 10 largest (+ trends if given)
+
+Both stream the records once; memory does not grow with the run.
+With the run's saved aggregates, the JSON report does not read the records at all.
+"""
+
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.aggregates import RunAggregates
+
+
+# Same columns as the Excel "Moved Files" sheet
+COLUMNS = ["src", "dst", "category", "size_bytes", "moved_at", "dry_run", "action", "duplicate_of"]
+
+MB = 1024 * 1024
+
+
+def generate_csv_report(moved_files: Iterable[Dict[str, Any]], report_path: Path) -> Path:
+    """One CSV row per record (unknown keys are ignored)."""
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8-sig", newline="") as f:   # BOM: Excel reads UTF-8
+        w = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        w.writeheader()
+        for rec in moved_files:
+            w.writerow(rec)
+    return report_path
+
+
+def generate_json_report(
+    moved_files: Iterable[Dict[str, Any]],
+    report_path: Path,
+    trends: Optional[List[Dict[str, Any]]] = None,
+    aggregates: Optional[Dict[str, Any]] = None
+) -> Path:
+    """
+    Summary per category, top 10 largest files and optional trends as JSON.
+
+    aggregates: the run summary's "aggregates" (organize_folder); if given,
+                moved_files is not read
+    """
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if aggregates is not None:
+        agg = RunAggregates.from_dict(aggregates)
+    else:
+        agg = RunAggregates(top_k=10)
+        for rec in moved_files:
+            if rec.get("action") != "skipped":   # duplicates left in place
+                agg.add(rec)
+
+    summary = agg.summary()
+    for row in summary:
+        row["total_mb"] = round(row["total_bytes"] / MB, 2)
+
+    data = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "moved_count": agg.count,
+        "summary": summary,
+        "top_largest": agg.top(),
+    }
+    if trends is not None:
+        data["trends"] = trends
+
+    report_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    return report_path
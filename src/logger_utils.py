@@ -1,43 +1,246 @@
-from __future__ import annotations
-
 """
 logger_utils.py
 ---------------
 TASK 4: Logging setup
 
 What it does:
-- Writes logs to logs/app.log
+- Writes logs to logs/app.log (watch mode: logs/watch.log, see below)
 - Prints logs in terminal too
 - Helps debugging and interview quality
+
+Options (the "logging" section of rules.json, all optional):
+- async:    file + terminal writes happen in a background thread
+            (QueueHandler -> QueueListener); a log call only puts the record on a queue.
+            "auto": only with more than one CPU (on one CPU the thread just competes
+            with the work it is meant to get out of the way of)
+- rotate:   "size" (max_mb) or "time" (when: "midnight", "h", ...), keeping `backups` old files
+- compress: rotated files are gzipped (app.log.1.gz), in the background thread
+- format:   "text" or "json" (one JSON object per line)
+
+Extra fields (logger.info("moved", extra={"category": "Images", "bytes": 123}))
+become JSON keys, or " | category=Images bytes=123" in text format.
+
+One writer per log file:
+    Rotation renames (and gzips) the file. A second process still writing to it
+    keeps writing to the renamed file, and its lines are lost once that file is
+    gzipped. So the long-running watch daemon writes its own file (watch.log),
+    and one-shot runs share app.log. If one-shot runs can overlap (a manual run
+    during a scheduled one), set "rotate": null and rotate app.log from outside
+    (logrotate with copytruncate), or give each its own log_file.
 """
 
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+LOG_FILE = Path("logs") / "app.log"
+WATCH_LOG_FILE = Path("logs") / "watch.log"
+
+DEFAULTS: Dict[str, Any] = {
+    "async": "auto",
+    "format": "text",
+    "rotate": "size",       # "size", "time" or null (never rotate)
+    "max_mb": 10,
+    "when": "midnight",
+    "backups": 7,
+    "compress": True,
+}
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+# Attributes every LogRecord has: anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# Running listener (async mode), so it can be flushed / stopped
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text line, plus extra fields as key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, msg, extra fields (+ exc)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        data.update(_extra_fields(record))
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the record on the queue as it is: formatting happens in the listener thread.
+    (The stock QueueHandler formats and copies every record in the calling thread.)
+    Safe here because records never leave the process.
+    """
 
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _SizeRotatingHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that counts the bytes it writes.
+    (The stock one stats the file twice, seeks, and formats the record twice per line.)
+
+    defer_flush: leave flushing to the caller (the listener flushes once its queue is empty)
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._size = self.stream.tell() if self.stream is not None else 0
+        self.defer_flush = False
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            # Bytes on disk, not characters (non-ASCII text is longer once encoded)
+            size = len(msg) if msg.isascii() else len(msg.encode(self.encoding or "utf-8", "replace"))
+            if self.stream is None:
+                self.stream = self._open()
+                self._size = self.stream.tell()
+            if self.maxBytes > 0 and self._size + size >= self.maxBytes and self._size > 0:
+                self.doRollover()
+                self._size = 0
+            self.stream.write(msg)
+            self._size += size
+            if not self.defer_flush:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener that flushes the handlers once per burst of records, not per record."""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _file_handler(settings: Dict[str, Any], log_file: Path) -> logging.Handler:
+    rotate = settings["rotate"]
+    if rotate == "size":
+        fh = _SizeRotatingHandler(
+            log_file, maxBytes=int(settings["max_mb"] * 1024 * 1024),
+            backupCount=settings["backups"], encoding="utf-8")
+    elif rotate == "time":
+        fh = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=settings["when"], backupCount=settings["backups"], encoding="utf-8")
+    elif not rotate:
+        return logging.FileHandler(log_file, encoding="utf-8")
+    else:
+        raise ValueError(f"logging.rotate must be 'size', 'time' or null, got {rotate!r}")
+
+    if settings["compress"]:
+        fh.namer = lambda name: name + ".gz"
+        fh.rotator = _gzip_rotator
+    return fh
+
+
+def setup_logger(
+    name: str = "autodesk",
+    settings: Optional[Dict[str, Any]] = None,
+    verbose: bool = False,
+    log_file: Path = LOG_FILE
+) -> logging.Logger:
+    """
+    settings: the "logging" section of rules.json (see DEFAULTS)
+    verbose: also write DEBUG lines (one per moved / backed-up file) to the log file
+    log_file: where to write (one file per long-running process, see the module notes)
+    """
+    global _listener
 
-def setup_logger(name: str = "autodesk") -> logging.Logger:
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
     # Avoid duplicate handlers if called multiple times
     if logger.handlers:
         return logger
 
-    Path("logs").mkdir(exist_ok=True)
+    settings = {**DEFAULTS, **(settings or {})}
 
-    fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+    log_file = Path(log_file)
+    log_file.parent.mkdir(exist_ok=True)
+
+    fmt = JsonFormatter() if settings["format"] == "json" else TextFormatter(TEXT_FORMAT)
 
     # File logging
-    fh = logging.FileHandler("logs/app.log", encoding="utf-8")
+    fh = _file_handler(settings, log_file)
     fh.setFormatter(fmt)
-    fh.setLevel(logging.INFO)
+    fh.setLevel(logging.DEBUG if verbose else logging.INFO)
 
-    # Terminal logging
+    # Terminal logging (per-file DEBUG lines stay out of the terminal)
     sh = logging.StreamHandler()
-    sh.setFormatter(fmt)
+    sh.setFormatter(TextFormatter(TEXT_FORMAT))
     sh.setLevel(logging.INFO)
 
-    logger.addHandler(fh)
-    logger.addHandler(sh)
+    use_async = settings["async"]
+    if use_async == "auto":
+        use_async = (os.cpu_count() or 1) > 1
+
+    if not use_async:
+        logger.addHandler(fh)
+        logger.addHandler(sh)
+        return logger
+
+    # The calling thread only enqueues; the listener thread formats and writes
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.addHandler(_EnqueueHandler(q))
+    if isinstance(fh, _SizeRotatingHandler):
+        fh.defer_flush = True
+    _listener = _Listener(q, fh, sh, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
 
     return logger
+
+
+def flush_logs() -> None:
+    """Waits until every queued record is written (e.g. before reading app.log back)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """Writes the remaining records and stops the background thread."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
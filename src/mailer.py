@@ -2,15 +2,243 @@
 mailer.py
 ---------
 TASK 5.1: Send email with attachment using SMTP
+
+- iter_message(): the email itself (body + optional attachment), streamed in blocks
+- SmtpConnection: one SMTP login reused for many messages (reconnects when needed)
+- send_email_with_attachment(): one email (or its parts), right now (no queue)
+
+Attachment size limits, zipping and splitting: see src/attachments.py.
+
+For queued / background delivery with retries see src/mailqueue.py.
 """
 
+import os
 import smtplib
+import tempfile
+import time
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
-from email import encoders
+from email.policy import SMTP
+
+from src.attachments import discard_plan, iter_base64, plan_attachment
+
+
+def parse_recipients(mail_to: str) -> List[str]:
+    """"a@x.com, b@y.com" -> ["a@x.com", "b@y.com"]"""
+    return [addr.strip() for addr in mail_to.replace(";", ",").split(",") if addr.strip()]
+
+
+def smtp_settings_from_env() -> Optional[Dict[str, Any]]:
+    """
+    SmtpConnection arguments + "mail_to" from the environment (.env), or None if incomplete.
+
+    SMTP_STARTTLS=false and an empty SMTP_USER / SMTP_PASS are allowed for a
+    local test server (e.g. `python -m aiosmtpd -n -l localhost:8025`).
+    """
+    settings = {
+        "host": os.getenv("SMTP_HOST", ""),
+        "port": int(os.getenv("SMTP_PORT", "587")),
+        "user": os.getenv("SMTP_USER", ""),
+        "password": os.getenv("SMTP_PASS", ""),
+        "starttls": os.getenv("SMTP_STARTTLS", "true").strip().lower() not in ("0", "false", "no"),
+        "from_addr": os.getenv("MAIL_FROM", "") or os.getenv("SMTP_USER", ""),
+        "mail_to": os.getenv("MAIL_TO", ""),
+    }
+    if not (settings["host"] and settings["from_addr"] and settings["mail_to"]):
+        return None
+    if settings["starttls"] and not (settings["user"] and settings["password"]):
+        return None
+    return settings
+
+
+def iter_message(
+    from_addr: str,
+    mail_to: str,
+    subject: str,
+    body: str,
+    part: Optional[Dict[str, Any]] = None
+) -> Iterator[bytes]:
+    """
+    The whole email as CRLF bytes, in blocks (ready for SMTP DATA).
+
+    part: one attachment part from attachments.plan_attachment(); its base64 is
+          produced block by block while sending, never held in memory at once.
+    """
+    msg = MIMEMultipart()
+    msg["From"] = from_addr
+    msg["To"] = mail_to
+    msg["Subject"] = subject
+
+    # Email body
+    msg.attach(MIMEText(body, "plain", "utf-8"))
+
+    if part is None:
+        yield msg.as_bytes(policy=SMTP)
+        return
+
+    # Attachment (Excel report): a marker is replaced by the streamed base64
+    marker = f"@@attachment-{uuid.uuid4().hex}@@"
+    attachment = MIMEBase("application", "octet-stream")
+    attachment["Content-Transfer-Encoding"] = "base64"
+    attachment.add_header("Content-Disposition", "attachment", filename=part["filename"])
+    attachment.set_payload(marker)
+    msg.attach(attachment)
+
+    head, tail = msg.as_bytes(policy=SMTP).split(marker.encode("ascii"), 1)
+    yield head
+    yield from iter_base64(part)
+    yield tail
+
+
+class SmtpConnection:
+    """
+    One SMTP session for many messages (connect + starttls + login once).
+
+    Usage:
+        with SmtpConnection(host, port, user, password) as conn:
+            conn.send(lambda: iter_message(...), "me@x.com", ["a@x.com", "b@y.com"])   # one transaction
+            conn.send(lambda: iter_message(...), "me@x.com", ["a@x.com"])
+
+    A session idle for more than idle_seconds is checked with NOOP before use;
+    a dropped session is reopened once per send.
+
+    stats: connects, connect_seconds, messages, send_seconds, send_seconds_max, bytes_sent
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str = "",
+        password: str = "",
+        starttls: bool = True,
+        timeout: float = 30.0,
+        idle_seconds: float = 60.0,
+        **_: Any
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.stats: Dict[str, float] = {"connects": 0, "connect_seconds": 0.0, "messages": 0,
+                                        "send_seconds": 0.0, "send_seconds_max": 0.0, "bytes_sent": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        start = time.perf_counter()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.stats["connects"] += 1
+        self.stats["connect_seconds"] += time.perf_counter() - start
+        return server
+
+    def _session(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            try:
+                self._server.noop()
+            except smtplib.SMTPException:
+                self._drop()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+            self._server = None
+
+    def _transaction(self, make_message: Callable[[], Iterable[bytes]], from_addr: str, recipients: List[str]) -> None:
+        """MAIL / RCPT / DATA with the message written to the socket block by block."""
+        server = self._session()
+        # smtplib only greets inside send_message() / sendmail(); MAIL needs it first
+        server.ehlo_or_helo_if_needed()
+
+        code, resp = server.mail(from_addr)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+        refused = {}
+        for rcpt in recipients:
+            code, resp = server.rcpt(rcpt)
+            if code not in (250, 251):
+                refused[rcpt] = (code, resp)
+        if len(refused) == len(recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = server.docmd("data")
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        last = b""
+        sent = 0
+        for block in make_message():
+            # Lines starting with "." are doubled (base64 blocks never contain one)
+            block = block.replace(b"\r\n.", b"\r\n..")
+            if block.startswith(b".") and last.endswith(b"\r\n"):
+                block = b"." + block
+            server.send(block)
+            sent += len(block)
+            last = block or last
+        server.send(b".\r\n" if last.endswith(b"\r\n") else b"\r\n.\r\n")
+
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        self.stats["bytes_sent"] += sent
+
+    def send(self, make_message: Callable[[], Iterable[bytes]], from_addr: str, recipients: List[str]) -> None:
+        """
+        Sends one message to all recipients in one transaction.
+        make_message: returns the message blocks (called again if the session must be reopened)
+        """
+        start = time.perf_counter()
+        try:
+            self._transaction(make_message, from_addr, recipients)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed an idle session between NOOP and send: reconnect once
+            self._drop()
+            self._transaction(make_message, from_addr, recipients)
+        self._last_used = time.monotonic()
+
+        seconds = time.perf_counter() - start
+        self.stats["messages"] += 1
+        self.stats["send_seconds"] += seconds
+        self.stats["send_seconds_max"] = max(self.stats["send_seconds_max"], seconds)
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._drop()
+
+    def __enter__(self) -> "SmtpConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
 
 def send_email_with_attachment(
@@ -21,33 +249,35 @@ def send_email_with_attachment(
     mail_to: str,
     subject: str,
     body: str,
-    attachment_path: Optional[Path] = None
+    attachment_path: Optional[Path] = None,
+    attachment_settings: Optional[Dict[str, Any]] = None
 ) -> None:
     """
     Sends an email with optional attachment.
+    mail_to can list several addresses ("a@x.com, b@y.com").
+
+    A big attachment is zipped / split / replaced by its path as
+    attachment_settings say (see attachments.DEFAULTS); a split one goes out
+    as one email per part.
     """
+    recipients = parse_recipients(mail_to)
 
-    msg = MIMEMultipart()
-    msg["From"] = smtp_user
-    msg["To"] = mail_to
-    msg["Subject"] = subject
+    with tempfile.TemporaryDirectory() as work_dir, \
+            SmtpConnection(smtp_host, smtp_port, smtp_user, smtp_pass) as conn:
+        plan = {"parts": [None], "note": None}
+        if attachment_path and attachment_path.exists():
+            plan = plan_attachment(attachment_path, Path(work_dir), attachment_settings)
 
-    # Email body
-    msg.attach(MIMEText(body, "plain"))
-
-    # Attachment (Excel report)
-    if attachment_path and attachment_path.exists():
-        part = MIMEBase("application", "octet-stream")
-        part.set_payload(attachment_path.read_bytes())
-        encoders.encode_base64(part)
-        part.add_header(
-            "Content-Disposition",
-            f'attachment; filename="{attachment_path.name}"'
-        )
-        msg.attach(part)
-
-    # SMTP connection
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
+        for subject_i, body_i, part in message_parts(subject, body, plan):
+            conn.send(lambda: iter_message(smtp_user, mail_to, subject_i, body_i, part), smtp_user, recipients)
+        discard_plan(plan)
+
+
+def message_parts(subject: str, body: str, plan: Dict[str, Any]) -> List[tuple]:
+    """(subject, body, part) for each email of one attachment plan ("(2/3)" added when split)."""
+    parts = plan["parts"] or [None]
+    if plan.get("note"):
+        body = f"{body}\n\n{plan['note']}"
+    if len(parts) == 1:
+        return [(subject, body, parts[0])]
+    return [(f"{subject} ({i}/{len(parts)})", body, part) for i, part in enumerate(parts, 1)]
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+"""
+mailqueue.py
+------------
+Background email delivery that survives restarts
+
+Layout (runs/mail_queue/):
+    <time>_<id>.json        one queued message (recipients, subject, body, attachment path,
+                            attempts, next try); removed once the server accepts it
+    dead/<time>_<id>.json   messages that failed for good (5xx, or too many attempts)
+    work/<id>/              files owned by one queued message: its zipped attachment, or a
+                            copy of an attachment the caller may delete (deleted once sent)
+
+What this module does:
+- enqueue() writes the message to disk (atomic) and returns at once
+- A worker thread sends every due message over ONE reused SMTP session
+  (all recipients of a message in one transaction)
+- A failed send is retried later with exponential backoff (+ jitter)
+- Messages left over when the process stops are sent by the next run
+- A message that cannot be sent for any other reason (bad attachment, broken
+  queue file, a bug) is logged with its traceback and moved to dead/ at once
+
+The attachment is read when the message is sent, not when it is queued
+(enqueue(..., copy_attachment=True) copies it into work/<id>/ first, for files
+that may be deleted before then, like pruned alert excerpts).
+A big one is zipped / split / replaced by its path first (src/attachments.py);
+a split message counts its sent parts, so a retry goes on from the first unsent one.
+"""
+
+import json
+import logging
+import os
+import random
+import shutil
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.journal import RUNS_DIR
+from src.attachments import plan_attachment
+from src.mailer import SmtpConnection, iter_message, message_parts, parse_recipients
+
+
+QUEUE_DIR = RUNS_DIR / "mail_queue"
+
+
+def pending_count(queue_dir: Path = QUEUE_DIR) -> int:
+    """Messages waiting in the queue (without starting anything)."""
+    queue_dir = Path(queue_dir)
+    return sum(1 for _ in queue_dir.glob("*.json")) if queue_dir.exists() else 0
+
+
+def _is_permanent(error: Exception) -> bool:
+    """
+    Errors a retry will not fix: every recipient refused, a 5xx reply (except login),
+    or anything that is not an SMTP / network error.
+    """
+    if not isinstance(error, (smtplib.SMTPException, OSError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False   # usually a wrong .env: keep the mail until it is fixed
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class MailQueue:
+    """
+    Usage:
+        outbox = MailQueue(smtp_settings_from_env())
+        outbox.start()
+        outbox.enqueue("a@x.com, b@y.com", "Report", "Hi", Path("reports/report.xlsx"))
+        ...                                   # pipeline continues while it sends
+        outbox.close(timeout=60)              # wait for due messages, then stop
+
+    smtp: SmtpConnection arguments (+ "from_addr"), e.g. from smtp_settings_from_env()
+    attachments: size limit / zip / split settings (see attachments.DEFAULTS)
+    Without start(), deliver_due() sends in the calling thread (scripts, tests).
+    """
+
+    def __init__(
+        self,
+        smtp: Dict[str, Any],
+        queue_dir: Path = QUEUE_DIR,
+        max_attempts: int = 8,
+        base_delay: float = 30.0,
+        max_delay: float = 3600.0,
+        attachments: Optional[Dict[str, Any]] = None,
+        logger: Optional[logging.Logger] = None
+    ) -> None:
+        self.smtp = smtp
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue_dir = Path(queue_dir)
+        self.dead_dir = self.queue_dir / "dead"
+        self.work_dir = self.queue_dir / "work"
+        self.attachments = attachments
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+
+        self._conn = SmtpConnection(**smtp)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # queue files
+
+    def _write(self, path: Path, item: Dict[str, Any]) -> None:
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _due(self) -> List[Tuple[Path, Dict[str, Any]]]:
+        """Queued messages whose next try is now or earlier, oldest first."""
+        now = time.time()
+        due = []
+        for path in sorted(self.queue_dir.glob("*.json")):
+            try:
+                item = json.loads(path.read_text(encoding="utf-8"))
+            except OSError:
+                continue
+            except json.JSONDecodeError as e:
+                self._bury(path, f"unreadable queue file: {e}")
+                continue
+            if not isinstance(item, dict):
+                self._bury(path, "unreadable queue file: not a JSON object")
+                continue
+            if item.get("next_try", 0) <= now:
+                due.append((path, item))
+        return due
+
+    def _next_try(self) -> Optional[float]:
+        times = []
+        for path in self.queue_dir.glob("*.json"):
+            try:
+                item = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+            if isinstance(item, dict):
+                times.append(item.get("next_try", 0))
+        return min(times) if times else None
+
+    def enqueue(
+        self,
+        mail_to: str,
+        subject: str,
+        body: str,
+        attachment_path: Optional[Path] = None,
+        copy_attachment: bool = False
+    ) -> str:
+        """
+        Saves the message to the queue and wakes the worker. Returns the message id.
+        copy_attachment: send a copy taken now (kept in work/<id>/ until the message is done)
+        """
+        msg_id = uuid.uuid4().hex[:12]
+        if attachment_path and copy_attachment:
+            own_dir = self.work_dir / msg_id
+            own_dir.mkdir(parents=True, exist_ok=True)
+            attachment_path = Path(shutil.copy2(attachment_path, own_dir / Path(attachment_path).name))
+        item = {
+            "id": msg_id,
+            "to": parse_recipients(mail_to),
+            "subject": subject,
+            "body": body,
+            "attachment": str(attachment_path) if attachment_path else None,
+            "plan": None,
+            "sent_parts": 0,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "attempts": 0,
+            "next_try": 0,
+            "last_error": None,
+        }
+        path = self.queue_dir / f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{msg_id}.json"
+        self._write(path, item)
+        self._wake.set()
+        return msg_id
+
+    # sending
+
+    def _bury(self, path: Path, reason: str) -> None:
+        """Moves a queue file that cannot even be read to dead/ as it is."""
+        self.logger.error(f"Mail queue: {path.name} moved to dead/ ({reason})")
+        self.dead_dir.mkdir(exist_ok=True)
+        try:
+            os.replace(path, self.dead_dir / path.name)
+        except FileNotFoundError:
+            pass
+
+    def _failed(self, path: Path, item: Dict[str, Any], error: Exception) -> None:
+        item["attempts"] = item.get("attempts", 0) + 1
+        item["last_error"] = f"{type(error).__name__}: {error}"
+
+        if _is_permanent(error) or item["attempts"] >= self.max_attempts:
+            self.logger.error(f"Mail queue: {path.name} failed for good, moved to dead/ "
+                              f"({item['last_error']})")
+            self.dead_dir.mkdir(exist_ok=True)
+            self._write(path, item)
+            os.replace(path, self.dead_dir / path.name)
+            if item.get("id"):
+                shutil.rmtree(self.work_dir / item["id"], ignore_errors=True)
+            return
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (item["attempts"] - 1))
+        item["next_try"] = time.time() + delay * random.uniform(0.8, 1.2)
+        self.logger.warning(f"Mail queue: {path.name} not sent (attempt {item['attempts']}), "
+                            f"retry in {delay:.0f} s ({item['last_error']})")
+        self._write(path, item)
+
+    def deliver_due(self) -> Dict[str, int]:
+        """
+        Sends every due message over the shared session.
+        Returns: {"sent", "retry", "dead"} for this pass.
+        """
+        counts = {"sent": 0, "retry": 0, "dead": 0}
+
+        from_addr = self.smtp.get("from_addr") or self.smtp.get("user", "")
+
+        for path, item in self._due():
+            try:
+                self._send_item(path, item, from_addr)
+            except (smtplib.SMTPException, OSError) as e:
+                self._failed(path, item, e)
+                counts["dead" if not path.exists() else "retry"] += 1
+                if not isinstance(e, smtplib.SMTPResponseException):
+                    # No connection: the rest of this pass would fail the same way
+                    self._conn.close()
+                    break
+                continue
+            except Exception as e:
+                # Not a delivery problem (bad attachment, malformed item, a bug):
+                # a retry would fail the same way, so it goes to dead/ now
+                self.logger.error(f"Mail queue: cannot send {path.name}: {e}", exc_info=e)
+                self._failed(path, item, e)
+                counts["dead"] += 1
+                continue
+
+            path.unlink()
+            shutil.rmtree(self.work_dir / item["id"], ignore_errors=True)
+            counts["sent"] += 1
+
+        return counts
+
+    def _send_item(self, path: Path, item: Dict[str, Any], from_addr: str) -> None:
+        """Sends the unsent emails of one queued message (one per attachment part)."""
+        if item.get("plan") is None:
+            attachment = Path(item["attachment"]) if item.get("attachment") else None
+            if attachment is not None and attachment.exists():
+                item["plan"] = plan_attachment(attachment, self.work_dir / item["id"], self.attachments)
+            else:
+                item["plan"] = {"parts": [None], "note": None, "work_file": None}
+            self._write(path, item)
+
+        mail_to = ", ".join(item["to"])
+        emails = message_parts(item["subject"], item["body"], item["plan"])
+        for i in range(item.get("sent_parts", 0), len(emails)):
+            subject, body, part = emails[i]
+            self._conn.send(lambda: iter_message(from_addr, mail_to, subject, body, part), from_addr, item["to"])
+            item["sent_parts"] = i + 1
+            if i + 1 < len(emails):
+                self._write(path, item)
+
+    @property
+    def smtp_stats(self) -> Dict[str, float]:
+        """SMTP connects / sends / latency of this queue's session (see SmtpConnection)."""
+        return dict(self._conn.stats)
+
+    # worker thread
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.deliver_due()
+            except Exception as e:
+                # Never let the worker die; failures of single messages are handled
+                # in deliver_due(), so this is the queue itself (disk, permissions)
+                self.logger.error(f"Mail queue pass failed: {e}", exc_info=e)
+
+            next_try = self._next_try()
+            # At least 1 s between passes, even if a message keeps failing in an odd way
+            wait = None if next_try is None else max(1.0, next_try - time.time())
+            self._wake.wait(wait)
+            self._wake.clear()
+
+        self._conn.close()
+
+    def start(self) -> "MailQueue":
+        """Starts the worker (also sends messages left over from earlier runs)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 60.0) -> int:
+        """
+        Waits up to timeout seconds for the queue to empty, then stops the worker.
+        Messages whose next retry falls after the timeout are not waited for.
+        Returns: messages still queued (sent by a later run).
+        """
+        if self._thread is not None:
+            deadline = time.time() + timeout
+            self._wake.set()
+            while time.time() < deadline:
+                next_try = self._next_try()
+                if next_try is None or next_try > deadline:
+                    break
+                time.sleep(0.1)
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=self._conn.timeout)
+            self._thread = None
+        else:
+            self._conn.close()
+        return pending_count(self.queue_dir)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+"""
+metrics.py
+----------
+Numbers for every pipeline run (where does the time go?)
+
+Per stage (organize, report, backup, email):
+- wall time, status ("ok" / "failed")
+- whatever the stage counts: files, bytes, moves, collisions, stat calls,
+  bytes in / out, SMTP connect / send times, ...
+- files/s and bytes/s, worked out from "files" / "bytes" and the wall time
+
+Written per run to runs/metrics_<stamp>.json, and optionally to a
+Prometheus textfile-collector file (node_exporter --collector.textfile.directory).
+Both writes are atomic (tmp file + rename), so a scraper never reads half a file.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from src.journal import RUNS_DIR
+
+
+PROM_PREFIX = "autodesktop"
+
+
+class StageMetrics:
+    """Counters of one stage. count() adds, set() replaces."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, Any] = {}
+
+    def count(self, key: str, n: float = 1) -> None:
+        self.values[key] = self.values.get(key, 0) + n
+
+    def set(self, key: str, value: Any) -> None:
+        self.values[key] = value
+
+    def update(self, values: Dict[str, Any]) -> None:
+        self.values.update(values)
+
+
+class RunMetrics:
+    """
+    Usage:
+        metrics = RunMetrics()
+        with metrics.stage("organize") as m:
+            ...
+            m.set("files", moved); m.set("bytes", total)
+        metrics.save()                       # runs/metrics_<stamp>.json
+        metrics.write_prometheus(path)       # optional
+    """
+
+    def __init__(self, stamp: Optional[str] = None) -> None:
+        self.stamp = stamp or datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._start = time.perf_counter()
+        self.status = "ok"
+        # Stages may finish at the same time (see src/scheduler.py)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        m = StageMetrics()
+        status = "failed"
+        start = time.perf_counter()
+        try:
+            yield m
+            status = "ok"
+        finally:
+            self.record(name, m, time.perf_counter() - start, status)
+
+    def record(self, name: str, m: StageMetrics, seconds: float, status: str = "ok") -> None:
+        row: Dict[str, Any] = {"wall_seconds": round(seconds, 4), "status": status}
+        row.update(m.values)
+        if seconds > 0:
+            if isinstance(m.values.get("files"), (int, float)):
+                row["files_per_s"] = round(m.values["files"] / seconds, 1)
+            if isinstance(m.values.get("bytes"), (int, float)):
+                row["bytes_per_s"] = round(m.values["bytes"] / seconds, 1)
+        with self._lock:
+            if status != "ok":
+                self.status = "failed"
+
+            # A stage run twice (e.g. email in a failing run) keeps both: "email", "email_2"
+            key, n = name, 2
+            while key in self.stages:
+                key, n = f"{name}_{n}", n + 1
+            self.stages[key] = row
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stamp": self.stamp,
+            "started_at": self.started_at,
+            "status": self.status,
+            "wall_seconds": round(time.perf_counter() - self._start, 4),
+            "stages": self.stages,
+        }
+
+    def save(self, runs_dir: Path = RUNS_DIR) -> Path:
+        runs_dir = Path(runs_dir)
+        runs_dir.mkdir(parents=True, exist_ok=True)
+        path = runs_dir / f"metrics_{self.stamp}.json"
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2, ensure_ascii=False))
+        return path
+
+    def write_prometheus(self, path: Path) -> Path:
+        """
+        Prometheus text format, one gauge per numeric value:
+            autodesktop_stage_<key>{stage="<stage>"} <value>
+        plus autodesktop_last_run_timestamp_seconds / _success / _duration_seconds.
+        """
+        data = self.to_dict()
+        lines = [
+            f"# TYPE {PROM_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROM_PREFIX}_last_run_timestamp_seconds {time.time():.0f}",
+            f"# TYPE {PROM_PREFIX}_last_run_success gauge",
+            f"{PROM_PREFIX}_last_run_success {1 if data['status'] == 'ok' else 0}",
+            f"# TYPE {PROM_PREFIX}_last_run_duration_seconds gauge",
+            f"{PROM_PREFIX}_last_run_duration_seconds {data['wall_seconds']}",
+        ]
+
+        # Group by metric name (all stages), as the format wants one TYPE line per name
+        series: Dict[str, list] = {}
+        for stage, row in data["stages"].items():
+            for key, value in row.items():
+                if key == "status":
+                    value, key = (1 if value == "ok" else 0), "ok"
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{PROM_PREFIX}_stage_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                series.setdefault(name, []).append(f'{name}{{stage="{stage}"}} {value}')
+
+        for name, samples in sorted(series.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, "\n".join(lines) + "\n")
+        return path
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
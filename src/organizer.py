@@ -13,10 +13,25 @@ What this module does:
 - Avoids overwriting if a file with the same name already exists
 """
 
+import errno
+import os
 import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Set, Optional, Iterable, Callable
+
+from src.aggregates import RunAggregates
+from src.dedupe import ACTIONS, OrganizedIndex, find_duplicates
+from src.rules import RuleMatcher, compile_rules
+from src.sniffer import ContentSniffer, is_compatible
+from src.walker import FileEntry, walk_files
+
+
+# How many moves are planned before they are executed (bounds memory per run)
+MOVE_CHUNK_SIZE = 1000
 
 
 def build_extension_map(categories: Dict[str, List[str]]) -> Dict[str, str]:
@@ -42,7 +57,173 @@ def build_extension_map(categories: Dict[str, List[str]]) -> Dict[str, str]:
     return ext_map
 
 
-def safe_move(src: Path, dst: Path) -> Path:
+class DestinationIndex:
+    """
+    Remembers which file names are taken in each destination folder.
+
+    Problem:
+        Finding a free name by calling exists() on "file (1).pdf",
+        "file (2).pdf", ... costs n stat calls for the n-th copy,
+        so n same-named files cost O(n^2) stat calls.
+
+    Solution:
+        - Each folder is listed ONCE (first time we need it)
+        - Taken names live in a set (no disk access to check)
+        - For every (folder, stem, suffix) we remember the next suffix number
+          to try, so a batch of n copies is handed out in linear time
+
+    One index is meant to live for a whole run. It is thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._taken: Dict[Path, Set[str]] = {}
+        self._next_suffix: Dict[Tuple[Path, str, str], int] = {}
+        self._lock = threading.Lock()
+
+        # For run metrics: folders listed, names that were already taken
+        self.folders_listed = 0
+        self.collisions = 0
+
+    def _names_in(self, folder: Path) -> Set[str]:
+        names = self._taken.get(folder)
+        if names is None:
+            try:
+                with os.scandir(folder) as it:
+                    names = {entry.name for entry in it}
+            except FileNotFoundError:
+                names = set()
+            self._taken[folder] = names
+            self.folders_listed += 1
+        return names
+
+    def reserve(self, dst: Path) -> Path:
+        """
+        Returns dst, or "stem (i)suffix" with the first free i,
+        and marks the returned name as taken.
+        """
+        with self._lock:
+            parent = dst.parent
+            taken = self._names_in(parent)
+
+            if dst.name not in taken:
+                taken.add(dst.name)
+                return dst
+
+            self.collisions += 1
+            stem = dst.stem       # filename without extension
+            suffix = dst.suffix   # extension (example: .pdf)
+            key = (parent, stem, suffix)
+
+            i = self._next_suffix.get(key, 1)
+            while f"{stem} ({i}){suffix}" in taken:
+                i += 1
+
+            name = f"{stem} ({i}){suffix}"
+            taken.add(name)
+            self._next_suffix[key] = i + 1
+            return parent / name
+
+
+# renameat2() flags / special fd (Linux, <linux/fs.h>, <fcntl.h>)
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+# libc renameat2, looked up on first use (None = not available)
+_renameat2: Any = False
+
+
+def _load_renameat2() -> Any:
+    global _renameat2
+    if _renameat2 is False:
+        _renameat2 = None
+        if sys.platform.startswith("linux"):
+            import ctypes
+            try:
+                fn = ctypes.CDLL(None, use_errno=True).renameat2
+            except (OSError, AttributeError):
+                fn = None   # glibc < 2.28 / other libc
+            if fn is not None:
+                fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                _renameat2 = (fn, ctypes)
+    return _renameat2
+
+
+def _rename_noreplace(src: Path, dst: Path) -> bool:
+    """
+    Linux: rename that fails if dst exists (renameat2 RENAME_NOREPLACE).
+    Returns False if this system / filesystem cannot do it (caller falls back).
+    """
+    loaded = _load_renameat2()
+    if loaded is None:
+        return False
+    fn, ctypes = loaded
+    if fn(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        # Filesystem without RENAME_NOREPLACE (some network / FUSE mounts)
+        return False
+    raise OSError(err, os.strerror(err), str(src), None, str(dst))
+
+
+def place_no_clobber(src: Path, dst: Path) -> None:
+    """
+    Moves src to dst, but FAILS with FileExistsError if dst already exists.
+
+    There is no "check, then move" gap, so nothing can ever be overwritten,
+    and on the same drive it is a rename (no data is copied):
+
+    - Linux: renameat2(RENAME_NOREPLACE), one atomic no-clobber rename
+    - Windows: os.rename, which already refuses an existing dst
+    - Elsewhere (or a filesystem without RENAME_NOREPLACE): claim dst with an
+      exclusive-create (O_EXCL) empty placeholder, then os.replace onto it
+    - Other drive (EXDEV) only: copy into an exclusively created dst, then remove src
+
+    A symlink is moved as a link (never replaced by a copy of its target).
+    """
+    try:
+        if os.name == "nt":
+            os.rename(src, dst)
+            return
+        if _rename_noreplace(src, dst):
+            return
+
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        os.close(fd)
+        try:
+            os.replace(src, dst)
+            return
+        except BaseException:
+            # Placeholder is ours: remove it (the copy below creates dst again)
+            os.unlink(dst)
+            raise
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    _copy_no_clobber(src, dst)
+    os.unlink(src)
+
+
+def _copy_no_clobber(src: Path, dst: Path) -> None:
+    if os.path.islink(src):
+        # os.symlink fails with FileExistsError if dst exists
+        os.symlink(os.readlink(src), dst)
+        return
+
+    with open(src, "rb") as fsrc:
+        # "xb" raises FileExistsError instead of replacing an existing file
+        with open(dst, "xb") as fdst:
+            try:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+            except BaseException:
+                fdst.close()
+                os.unlink(dst)
+                raise
+    shutil.copystat(src, dst, follow_symlinks=False)
+
+
+def safe_move(src: Path, dst: Path, index: Optional[DestinationIndex] = None) -> Path:
     """
     Moves a file from src -> dst safely without overwriting.
 
@@ -55,29 +236,48 @@ def safe_move(src: Path, dst: Path) -> Path:
             file (1).pdf
             file (2).pdf
 
+    Pass the same DestinationIndex for a whole batch so each folder is only
+    listed once and free names are found without probing the disk.
+
     Returns:
         The final destination path used.
     """
-    # If destination does not exist, normal move is fine
-    if not dst.exists():
-        shutil.move(str(src), str(dst))
-        return dst
-
-    # If destination exists, we generate a new filename
-    stem = dst.stem       # filename without extension
-    suffix = dst.suffix   # extension (example: .pdf)
-    parent = dst.parent   # folder path
+    index = index or DestinationIndex()
 
-    i = 1
     while True:
-        # Create candidate path: "file (1).pdf"
-        candidate = parent / f"{stem} ({i}){suffix}"
-
-        if not candidate.exists():
-            shutil.move(str(src), str(candidate))
+        candidate = index.reserve(dst)
+        try:
+            place_no_clobber(src, candidate)
             return candidate
+        except FileExistsError:
+            # Someone created that name after we listed the folder.
+            # It is now marked taken, so the next reserve() moves on.
+            continue
 
-        i += 1
+
+def _move_planned(move: Tuple[Path, Path], index: DestinationIndex) -> Path:
+    src, dst = move
+    try:
+        place_no_clobber(src, dst)
+        return dst
+    except FileExistsError:
+        # Appeared on disk after planning: pick the next free name
+        return safe_move(src, dst.parent / src.name, index)
+
+
+def _link_planned(src: Path, dst: Path, target: Path, index: DestinationIndex) -> Path:
+    """
+    Duplicate handling for dedupe action "hardlink":
+    dst becomes a hard link to target (same bytes as src), then src is removed.
+    """
+    while True:
+        try:
+            os.link(target, dst)
+            break
+        except FileExistsError:
+            dst = index.reserve(dst.parent / src.name)
+    os.unlink(src)
+    return dst
 
 
 def organize_folder(
@@ -86,7 +286,17 @@ def organize_folder(
     categories: Dict[str, List[str]],
     unknown_category: str,
     ignore_folders: List[str],
-    dry_run: bool = False
+    dry_run: bool = False,
+    workers: int = 1,
+    recursive: bool = False,
+    max_depth: Optional[int] = None,
+    entries: Optional[Iterable[FileEntry]] = None,
+    on_record: Optional[Callable[[Dict[str, Any]], None]] = None,
+    collect: bool = True,
+    sniffer: Optional[ContentSniffer] = None,
+    matcher: Optional[RuleMatcher] = None,
+    dedupe: Optional[Dict[str, Any]] = None,
+    organized: Optional[OrganizedIndex] = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Organizes files inside base_folder into category folders.
@@ -98,76 +308,273 @@ def organize_folder(
         unknown_category: where unknown file extensions go
         ignore_folders: folders inside base_folder that we must NOT touch
         dry_run: if True, DO NOT move files, only show what would happen
+        workers: how many files to move at the same time (1 = one by one)
+        recursive: if True, also pick up files from sub-folders
+        max_depth: with recursive, how many folders down to go (None = no limit)
+        entries: organize only these files instead of scanning base_folder
+                 (used by watch mode for each batch of new files)
+        on_record: called with each record right after its file is moved
+                   (used to append to the run journal as we go)
+        collect: if False, records are not kept in moved_files
+                 (memory stays flat; use on_record to receive them)
+        sniffer: if given, a file's first bytes can override its extension
+                 (no extension / wrong extension); verdicts are cached on disk
+        matcher: compiled rules from rules.json (see src/rules.py);
+                 if None, one is built from categories
+        dedupe: the "dedupe" section of rules.json, or None to keep every copy.
+                Byte-identical copies get dedupe["action"]:
+                  "skip"     - leave the copy where it is
+                  "hardlink" - organize it as a hard link to the kept copy (no extra disk)
+                  "move"     - move it to the dedupe["category"] folder ("Duplicates")
+                Dedupe needs all sizes up front, so the listing is held in memory.
+        organized: with dedupe, an OrganizedIndex to check against instead of
+                   walking the Organized folder; files this run organizes are
+                   added to it (watch mode keeps one across batches)
 
     Returns:
         moved_files: list of dictionaries, each describing a moved file
-        summary: dictionary with summary info (moved_count, paths)
+                     (empty when collect=False)
+        summary: dictionary with summary info (moved_count, paths),
+                 "duplicates_skipped": duplicates left in place (dedupe "skip"; not in
+                 moved_count or aggregates, but still passed to on_record / moved_files),
+                 "aggregates": files / bytes per category + the 10 largest records,
+                 counted as files move (RunAggregates.to_dict(); works with collect=False)
+                 and "ops": filesystem work done (stat calls, folders listed,
+                 name collisions, mkdirs, moves / links / skips)
     """
-    # Create extension -> category map
-    ext_map = build_extension_map(categories)
+    # Compile rules once (see src/rules.py); categories-only if no matcher given
+    if matcher is None:
+        matcher = compile_rules(None, categories)
 
     # This is the "Organized" folder path
     target_root_path = base_folder / target_root_folder
 
     moved_files: List[Dict[str, Any]] = []
-
-    # Loop through items in the base folder (top level only)
-    for item in base_folder.iterdir():
-
-        # Skip folders
-        if item.is_dir():
-            # If folder is in ignore list, skip
-            if item.name in ignore_folders:
-                continue
-            # We skip all folders anyway (this tool only organizes files)
-            continue
-
-        # Skip anything that's not a file
-        if not item.is_file():
-            continue
-
-        # Identify file extension (example: ".pdf")
-        ext = item.suffix.lower()
-
-        # Decide category based on extension (if not found -> unknown_category)
-        category = ext_map.get(ext, unknown_category)
-
-        # Create destination folder: base/Organized/<Category>
-        dest_dir = target_root_path / category
-
-        # Destination file path
-        dest_path = dest_dir / item.name
-
-        # Record metadata for logging/reporting later
-        file_info = {
-            "src": str(item),
-            "dst": str(dest_path),
-            "category": category,
-            "size_bytes": item.stat().st_size,
-            "moved_at": datetime.now().isoformat(timespec="seconds"),
-            "dry_run": dry_run
-        }
-
-        # If dry_run, we do NOT move. Just record what WOULD happen.
-        if dry_run:
+    moved_count = 0
+    duplicates_skipped = 0
+
+    # Per-category totals + top 10 largest, kept as we go (reports read these, not every record)
+    aggregates = RunAggregates(top_k=10)
+
+    # Taken names per category folder, listed once per run
+    index = DestinationIndex()
+
+    # Category folders we already created this run (saves a mkdir per file)
+    created_dirs: Set[Path] = set()
+
+    # Top level only, unless recursive mode is on
+    depth_limit = max_depth if recursive else 0
+
+    # Filesystem operation counts (run metrics)
+    ops: Dict[str, int] = {"moves": 0, "links": 0, "skipped": 0}
+
+    # Ignored folders are pruned by the walker, so they are never listed
+    if entries is None:
+        entries = walk_files(base_folder, skip_dir_names=ignore_folders, max_depth=depth_limit, counters=ops)
+
+    # Dedupe: {duplicate path: path of the copy we keep}
+    duplicates: Dict[str, str] = {}
+    dedupe_action = None
+    if dedupe is not None:
+        dedupe_action = dedupe.get("action", "skip")
+        if dedupe_action not in ACTIONS:
+            raise ValueError(f"dedupe.action must be one of {ACTIONS}, got {dedupe_action!r}")
+
+        entries = list(entries)
+        existing: Iterable[FileEntry] = ()
+        if not dedupe.get("include_organized", True):
+            organized = None
+        elif organized is not None:
+            # Files organized in earlier runs / batches, by size (no walk)
+            existing = organized.with_sizes({e.size for e in entries})
+        elif target_root_path.exists():
+            # Files organized in earlier runs are also checked (and always kept)
+            existing = walk_files(target_root_path,
+                                  skip_dir_names=dedupe.get("skip_dir_names", ["_backups"]),
+                                  max_depth=None)
+        duplicates = find_duplicates(entries, existing, workers=int(dedupe.get("workers", 4)))
+
+    # Where each kept copy ended up (so duplicates can point at / link to it):
+    # its reserved name when planned, its final name once moved
+    keep_paths = set(duplicates.values())
+    keep_planned: Dict[str, str] = {}
+    keep_final: Dict[str, str] = {}
+
+    # Moves are planned and executed in chunks, so memory stays flat on huge folders.
+    # Names are still reserved in scan order, so results match a serial run
+    # (with workers, records arrive in the order the moves finish).
+    # Chunk items: (kind, src, dst, record) with kind "move", "link" or "skip"
+    chunk: List[Tuple[str, Path, Path, Dict[str, Any]]] = []
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+    # Workers record their own moves: counters, aggregates and on_record stay one at a time
+    record_lock = threading.Lock()
+
+    def finish(file_info: Dict[str, Any], kind: str = "move") -> None:
+        nonlocal moved_count, duplicates_skipped
+        if not dry_run:
+            ops[{"move": "moves", "link": "links", "skip": "skipped"}[kind]] += 1
+        if kind == "skip":
+            # Left where it was: not a moved file
+            duplicates_skipped += 1
+        else:
+            moved_count += 1
+            aggregates.add(file_info)
+        if on_record is not None:
+            on_record(file_info)
+        if collect:
             moved_files.append(file_info)
-            continue
-
-        # Create destination folder if it doesn't exist
-        dest_dir.mkdir(parents=True, exist_ok=True)
-
-        # Move file safely
-        final_path = safe_move(item, dest_path)
 
-        # Update the recorded destination to final path (in case it was renamed)
-        file_info["dst"] = str(final_path)
+    def record(kind: str, file_info: Dict[str, Any], final_path: Path) -> None:
+        with record_lock:
+            if "duplicate_of" in file_info:
+                keep = file_info["duplicate_of"]
+                file_info["duplicate_of"] = keep_final.get(keep) or keep_planned.get(keep, keep)
+            # A name can still change if something else grabbed it during the move
+            file_info["dst"] = str(final_path)
+            if file_info["src"] in keep_paths:
+                keep_final[file_info["src"]] = str(final_path)
+            if organized is not None and kind != "skip":
+                organized.add(str(final_path), file_info["size_bytes"])
+            finish(file_info, kind)
+
+    def move_and_record(src: Path, dst: Path, file_info: Dict[str, Any]) -> None:
+        # Recorded as soon as it is moved: a crash mid-chunk leaves no moved file
+        # without its journal record
+        record("move", file_info, _move_planned((src, dst), index))
+
+    def place(kind: str, src: Path, dst: Path, file_info: Dict[str, Any]) -> Path:
+        if kind == "move":
+            return _move_planned((src, dst), index)
+        if kind == "skip":
+            return src
+        # A kept copy always comes earlier in scan order, so it is already placed
+        keep = keep_final.get(file_info["duplicate_of"], file_info["duplicate_of"])
+        try:
+            return _link_planned(src, dst, Path(keep), index)
+        except FileExistsError:
+            raise
+        except OSError:
+            # No hard links here (other drive / filesystem): keep it as a normal copy
+            file_info["action"] = "moved"
+            return _move_planned((src, dst), index)
+
+    def run_chunk() -> None:
+        # Moves run (and are recorded) on the pool, if any; links/skips wait for
+        # every earlier move, so their kept copy is placed.
+        # Every destination name is already reserved, so workers never collide.
+        futures = [pool.submit(move_and_record, src, dst, file_info) if pool is not None and kind == "move"
+                   else None for kind, src, dst, file_info in chunk]
+
+        first_error = None
+        for (kind, src, dst, file_info), future in zip(chunk, futures):
+            try:
+                if future is not None:
+                    future.result()
+                    continue
+                final_path = place(kind, src, dst, file_info)
+            except Exception as e:
+                if pool is None:
+                    raise
+                first_error = first_error or e
+                continue
+            record(kind, file_info, final_path)
+
+        chunk.clear()
+        if first_error is not None:
+            # Files that did move are already recorded, then fail like the serial loop
+            raise first_error
+
+    try:
+        for entry in entries:
+            item = Path(entry.path)
+
+            # Identify file extension (example: ".pdf")
+            ext = item.suffix.lower()
+
+            # Decide category: first matching rule (suffix, name pattern, size, age)
+            category = matcher.classify(item.name, entry.size, entry.mtime)
+
+            # Content sniffing: trust the file's magic bytes over a missing/wrong extension.
+            # The sniffed extension is appended, so "photo.txt" is classified as "photo.txt.png".
+            if sniffer is not None:
+                sniffed_ext = sniffer.sniff(entry)
+                if sniffed_ext and not is_compatible(sniffed_ext, ext):
+                    category = matcher.classify(item.name + sniffed_ext, entry.size, entry.mtime) or category
+
+            # Not found -> unknown_category
+            if category is None:
+                category = unknown_category
+
+            keep = duplicates.get(entry.path)
+            if keep is not None and dedupe_action == "move":
+                category = dedupe.get("category", "Duplicates")
+
+            # Create destination folder: base/Organized/<Category>
+            dest_dir = target_root_path / category
+
+            # Destination file path
+            dest_path = dest_dir / item.name
+
+            # Record metadata for logging/reporting later
+            file_info = {
+                "src": str(item),
+                "dst": str(dest_path),
+                "category": category,
+                "size_bytes": entry.size,
+                "moved_at": datetime.now().isoformat(timespec="seconds"),
+                "dry_run": dry_run
+            }
+
+            kind = "move"
+            if keep is not None:
+                kind = {"skip": "skip", "hardlink": "link", "move": "move"}[dedupe_action]
+                file_info["duplicate_of"] = keep
+                file_info["action"] = {"skip": "skipped", "link": "hardlinked", "move": "moved_to_duplicates"}[kind]
+                if kind == "skip":
+                    file_info["dst"] = str(item)
+
+            # If dry_run, we do NOT move. Just record what WOULD happen.
+            if dry_run:
+                finish(file_info, kind)
+                continue
 
-        moved_files.append(file_info)
+            if kind == "skip":
+                # Stays where it is: nothing to reserve
+                final_path = item
+            else:
+                # Create destination folder if it doesn't exist
+                if dest_dir not in created_dirs:
+                    dest_dir.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(dest_dir)
+
+                # Pick a free name now (in scan order), move with the rest of the chunk
+                final_path = index.reserve(dest_path)
+                if file_info["src"] in keep_paths:
+                    keep_planned[file_info["src"]] = str(final_path)
+
+                # Update the recorded destination to final path (in case it was renamed)
+                file_info["dst"] = str(final_path)
+
+            chunk.append((kind, item, final_path, file_info))
+            if len(chunk) >= MOVE_CHUNK_SIZE:
+                run_chunk()
+
+        if chunk:
+            run_chunk()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if sniffer is not None:
+            sniffer.save()
 
     summary = {
         "base_folder": str(base_folder),
         "target_root": str(target_root_path),
-        "moved_count": len(moved_files)
+        "moved_count": moved_count,
+        "duplicates_skipped": duplicates_skipped,
+        "aggregates": aggregates.to_dict(),
+        "ops": {**ops, "folders_indexed": index.folders_listed, "collisions": index.collisions,
+                "mkdirs": len(created_dirs)}
     }
 
     return moved_files, summary
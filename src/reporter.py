@@ -3,58 +3,131 @@ from __future__ import annotations
 """
 Excel report generator
 
+Single pass, constant memory:
+- openpyxl write-only mode: rows go straight to disk, nothing is kept per row
+- records come from an iterator (e.g. streamed from a run journal)
+- Summary (per category) and Top 10 Largest come from the aggregates saved
+  with the run (O(categories + K)), or are built while the rows stream by
+  (aggregates.RunAggregates)
+- the chart is added before the one and only save
 """
 
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterable, Dict, Any, List, Optional
 
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.chart import BarChart, Reference
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, LineChart, Reference
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 
+from src.aggregates import RunAggregates
 
-def generate_excel_report(moved_files: List[Dict[str, Any]], report_path: Path) -> Path:
+
+# Columns that only some records have (dedupe); always present so every row lines up
+OPTIONAL_COLUMNS = ["action", "duplicate_of"]
+
+TOP_N = 10
+
+MB = 1024 * 1024
+
+
+def _header(ws, columns: List[str]) -> List[WriteOnlyCell]:
+    cells = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def _write_trends(wb: Workbook, trends: List[Dict[str, Any]]) -> None:
+    """"Trends" sheet: MB organized per period (rows) and category (columns) + line chart."""
+    ws = wb.create_sheet("Trends")
+
+    periods = sorted({t["period"] for t in trends})
+    categories = sorted({t["category"] for t in trends})
+    mb = {(t["period"], t["category"]): round(t["bytes"] / MB, 2) for t in trends}
+    files = {}
+    for t in trends:
+        files[t["period"]] = files.get(t["period"], 0) + t["files"]
+
+    ws.append(_header(ws, ["period"] + categories + ["files (all)"]))
+    for period in periods:
+        ws.append([period] + [mb.get((period, c), 0) for c in categories] + [files[period]])
+
+    if not periods:
+        ws.append(["No history in this date range"])
+        return
+
+    chart = LineChart()
+    chart.title = "MB organized per category"
+    chart.y_axis.title = "MB"
+    chart.x_axis.title = "Period"
+
+    last_row = len(periods) + 1
+    data = Reference(ws, min_col=2, max_col=len(categories) + 1, min_row=1, max_row=last_row)
+    cats = Reference(ws, min_col=1, min_row=2, max_row=last_row)
+    chart.add_data(data, titles_from_data=True)
+    chart.set_categories(cats)
+
+    ws.add_chart(chart, f"{get_column_letter(len(categories) + 4)}2")
+
+
+def generate_excel_report(
+    moved_files: Iterable[Dict[str, Any]],
+    report_path: Path,
+    trends: Optional[List[Dict[str, Any]]] = None,
+    aggregates: Optional[Dict[str, Any]] = None
+) -> Path:
     """
-    Create Excel report from moved_files list.
+    Create Excel report from moved_files (a list, or records streamed from a run journal).
+
+    Columns come from the first record (plus action / duplicate_of);
+    keys that only appear in later records are not written.
+
+    trends: optional rows from HistoryStore.trends() -> extra "Trends" sheet
+    aggregates: the run summary's "aggregates" (organize_folder); if given, Summary and
+                Top 10 use it instead of counting the rows again
     """
     report_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Convert moved_files (list of dicts) into a table (DataFrame)
-    df = pd.DataFrame(moved_files)
+    wb = Workbook(write_only=True)
+    ws_moved = wb.create_sheet("Moved Files")
+    ws_summary = wb.create_sheet("Summary")
+    ws_top = wb.create_sheet("Top 10 Largest")
 
-    # If no files moved, keep report valid
-    if df.empty:
-        df = pd.DataFrame([{
-            "src": "",
-            "dst": "",
-            "category": "No files moved",
-            "size_bytes": 0,
-            "moved_at": "",
-            "dry_run": True
-        }])
-
-    # Summary: file count + total bytes per category
-    summary = (
-        df.groupby("category")
-          .agg(files=("category", "count"), total_bytes=("size_bytes", "sum"))
-          .reset_index()
-          .sort_values("files", ascending=False)
-    )
-    summary["total_mb"] = (summary["total_bytes"] / (1024 * 1024)).round(2)
+    columns: List[str] = []
+    counted = aggregates is not None
+    agg = RunAggregates.from_dict(aggregates) if counted else RunAggregates(top_k=TOP_N)
 
-    # Top 10 largest files
-    top10 = df.sort_values("size_bytes", ascending=False).head(10).copy()
-    top10["size_mb"] = (top10["size_bytes"] / (1024 * 1024)).round(2)
+    for rec in moved_files:
+        if not columns:
+            columns = list(rec) + [c for c in OPTIONAL_COLUMNS if c not in rec]
+            ws_moved.append(_header(ws_moved, columns))
+
+        ws_moved.append([rec.get(c) for c in columns])
+        if not counted and rec.get("action") != "skipped":   # duplicates left in place
+            agg.add(rec)
 
-    # Write sheets using pandas
-    with pd.ExcelWriter(report_path, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Moved Files")
-        summary.to_excel(writer, index=False, sheet_name="Summary")
-        top10.to_excel(writer, index=False, sheet_name="Top 10 Largest")
+    # If no files moved, keep report valid
+    if not columns:
+        columns = ["src", "dst", "category", "size_bytes", "moved_at", "dry_run"]
+        placeholder = dict(zip(columns, ["", "", "No files moved", 0, "", True]))
+        ws_moved.append(_header(ws_moved, columns))
+        ws_moved.append(list(placeholder.values()))
+        agg.add(placeholder)
+
+    # Summary: file count + total bytes per category (most files first)
+    ws_summary.append(_header(ws_summary, ["category", "files", "total_bytes", "total_mb"]))
+    summary = agg.summary()
+    for row in summary:
+        ws_summary.append([row["category"], row["files"], row["total_bytes"], round(row["total_bytes"] / MB, 2)])
 
-    # Add chart using openpyxl 
-    wb = load_workbook(report_path)
-    ws = wb["Summary"]
+    # Top 10 largest files
+    ws_top.append(_header(ws_top, columns + ["size_mb"]))
+    for rec in agg.top():
+        ws_top.append([rec.get(c) for c in columns] + [round((rec.get("size_bytes") or 0) / MB, 2)])
 
     # Create a bar chart: Category vs Files
     chart = BarChart()
@@ -63,14 +136,18 @@ def generate_excel_report(moved_files: List[Dict[str, Any]], report_path: Path)
     chart.x_axis.title = "Category"
 
     # Data: "files" column is 2nd column in Summary sheet
-    data = Reference(ws, min_col=2, min_row=1, max_row=ws.max_row)
-    cats = Reference(ws, min_col=1, min_row=2, max_row=ws.max_row)
+    last_row = len(summary) + 1
+    data = Reference(ws_summary, min_col=2, min_row=1, max_row=last_row)
+    cats = Reference(ws_summary, min_col=1, min_row=2, max_row=last_row)
 
     chart.add_data(data, titles_from_data=True)
     chart.set_categories(cats)
 
     # Place chart at cell E2
-    ws.add_chart(chart, "E2")
+    ws_summary.add_chart(chart, "E2")
+
+    if trends is not None:
+        _write_trends(wb, trends)
 
     wb.save(report_path)
     return report_path
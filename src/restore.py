@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+"""
+restore.py
+----------
+Undo one organize run using its run journal
+
+What this module does:
+- Reads the recorded src -> dst pairs of ONE run (no folder rescans)
+- Optionally restores only some categories
+- Moves each file from dst back to its exact original src path
+- Runs the moves with a bounded pool of workers
+- Never overwrites: if something new now sits at src, the file comes
+  back as "name (1).ext" next to it
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.organizer import DestinationIndex, place_no_clobber, safe_move
+
+
+# How many records are planned before their moves run (bounds memory)
+RESTORE_CHUNK_SIZE = 1000
+
+
+def _move_back(move: Tuple[Path, Path, Path], index: DestinationIndex) -> Path:
+    src, dst, original = move
+    try:
+        place_no_clobber(src, dst)
+        return dst
+    except FileExistsError:
+        # Reserved name got taken after planning: pick the next free name,
+        # numbered from the journal's original name (dst may be "x (1).pdf" already)
+        return safe_move(src, original, index)
+
+
+def restore_run(
+    records: Iterable[Dict[str, Any]],
+    categories: Optional[Iterable[str]] = None,
+    workers: int = 4,
+    dry_run: bool = False,
+    on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Moves the files of one run back to where they came from.
+
+    Parameters:
+        records: moved-file records of the run (e.g. journal.iter_records(path))
+        categories: only restore these categories (None = all)
+        workers: how many files to move back at the same time
+        dry_run: if True, only report what would be restored
+        on_record: called with one result dict per record
+                   (status: "restored", "would_restore", "missing")
+
+    Returns:
+        summary: restored / missing / skipped counts
+    """
+    wanted: Optional[Set[str]] = set(categories) if categories else None
+
+    counts = {"restored": 0, "missing": 0, "skipped": 0}
+    index = DestinationIndex()
+    created_dirs: Set[Path] = set()
+
+    chunk: List[Tuple[Path, Path, Path, Dict[str, Any]]] = []
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+
+    def finish(result: Dict[str, Any]) -> None:
+        if on_record is not None:
+            on_record(result)
+
+    def run_chunk() -> None:
+        if pool is None:
+            final_paths = (_move_back((src, dst, original), index) for src, dst, original, _ in chunk)
+        else:
+            futures = [pool.submit(_move_back, (src, dst, original), index) for src, dst, original, _ in chunk]
+            final_paths = (f.result() for f in futures)
+
+        for (_, _, _, result), final_path in zip(chunk, final_paths):
+            result["restored_to"] = str(final_path)
+            counts["restored"] += 1
+            finish(result)
+        chunk.clear()
+
+    try:
+        for rec in records:
+            # Dry-run records and skipped duplicates never moved anything
+            if rec.get("dry_run") or rec.get("action") == "skipped":
+                counts["skipped"] += 1
+                continue
+            if wanted is not None and rec.get("category") not in wanted:
+                counts["skipped"] += 1
+                continue
+
+            current = Path(rec["dst"])
+            original = Path(rec["src"])
+
+            result = {
+                "from": str(current),
+                "restored_to": str(original),
+                "category": rec.get("category"),
+                "restored_at": datetime.now().isoformat(timespec="seconds"),
+                "status": "would_restore" if dry_run else "restored",
+            }
+
+            if not os.path.lexists(current):
+                # Deleted or moved away since that run
+                result["status"] = "missing"
+                counts["missing"] += 1
+                finish(result)
+                continue
+
+            if dry_run:
+                counts["restored"] += 1
+                finish(result)
+                continue
+
+            # Recursive runs can come from sub-folders that no longer exist
+            parent = original.parent
+            if parent not in created_dirs:
+                parent.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(parent)
+
+            # Reserve in journal order, so results match a one-by-one restore
+            chunk.append((current, index.reserve(original), original, result))
+            if len(chunk) >= RESTORE_CHUNK_SIZE:
+                run_chunk()
+
+        if chunk:
+            run_chunk()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return counts
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+"""
+rules.py
+--------
+Rule engine for rules.json
+
+What this module does:
+- Reads an ORDERED "rules" list from rules.json (first matching rule wins)
+- Each rule can check: suffixes (".tar.gz" too), a glob or regex on the name,
+  a size range and a file age range
+- Compiles the list ONCE into a fast matcher:
+    * suffix trie  -> all suffix rules are checked with a few dict lookups
+    * globs indexed by a 3-letter piece they must contain -> only a few are tried
+    * one combined regex -> all plain regex rules are checked in one re call
+      (rules with capture groups, backreferences or inline flags cannot be
+      joined with others and are tried on their own)
+    * thresholds in bytes / seconds, computed up front
+- The old "categories" map is added after the rules as plain suffix rules,
+  so existing configs keep working unchanged
+- "glob" must match the whole name; "regex" is matched from the start of
+  the name (like re.match); both ignore case
+
+Example rule list:
+    "rules": [
+      {"category": "Installers", "glob": "*setup*", "suffixes": [".exe", ".msi"]},
+      {"category": "Scans", "regex": "^scan[_-]?\\\\d+", "suffixes": [".pdf"]},
+      {"category": "Large Videos", "suffixes": [".mp4", ".mkv"], "min_size_mb": 500},
+      {"category": "Old Downloads", "older_than_days": 365}
+    ]
+"""
+
+import fnmatch
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.walker import FileEntry
+
+
+RULE_KEYS = {
+    "category", "suffixes", "glob", "regex",
+    "min_size_mb", "max_size_mb", "older_than_days", "newer_than_days",
+}
+
+MB = 1024 * 1024
+DAY = 24 * 60 * 60
+
+
+class _Rule:
+    """One compiled rule (plain attributes, no per-file parsing)."""
+
+    __slots__ = ("index", "category", "has_suffixes", "glob", "pattern", "is_glob",
+                 "min_size", "max_size", "older_than", "newer_than")
+
+    def __init__(self, index: int, spec: Dict[str, Any]) -> None:
+        self.index = index
+        self.category = spec["category"]
+        self.has_suffixes = bool(spec.get("suffixes"))
+
+        self.pattern: Optional[str] = None
+        self.glob = (spec.get("glob") or "").lower()
+        self.is_glob = bool(self.glob)
+        if self.is_glob:
+            # fnmatch.translate gives "(?s:...)\\Z" - a full-name match
+            self.pattern = fnmatch.translate(self.glob)
+        elif spec.get("regex"):
+            self.pattern = spec["regex"]
+
+        self.min_size = _mb_to_bytes(spec.get("min_size_mb"))
+        self.max_size = _mb_to_bytes(spec.get("max_size_mb"))
+        self.older_than = _days_to_seconds(spec.get("older_than_days"))
+        self.newer_than = _days_to_seconds(spec.get("newer_than_days"))
+
+    def checks_file(self, size: int, mtime: float, now: float) -> bool:
+        """Size / age part of the rule (the name part is checked by the matcher)."""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.older_than is not None and mtime > now - self.older_than:
+            return False
+        if self.newer_than is not None and mtime < now - self.newer_than:
+            return False
+        return True
+
+
+def _mb_to_bytes(value: Any) -> Optional[int]:
+    return None if value is None else int(float(value) * MB)
+
+
+def _days_to_seconds(value: Any) -> Optional[float]:
+    return None if value is None else float(value) * DAY
+
+
+def _glob_literals(glob: str) -> List[str]:
+    """Literal text runs of a glob: "*setup_v?.exe" -> ["setup_v", ".exe"]."""
+    runs: List[str] = []
+    current = ""
+    i = 0
+    while i < len(glob):
+        ch = glob[i]
+        if ch in "*?":
+            runs.append(current)
+            current = ""
+        elif ch == "[":
+            close = glob.find("]", i + 2)
+            if close == -1:
+                current += ch          # fnmatch treats a lone "[" as text
+            else:
+                runs.append(current)
+                current = ""
+                i = close
+        else:
+            current += ch
+        i += 1
+    runs.append(current)
+    return [r for r in runs if r]
+
+
+# Inline global flags like "(?i)" are only valid at the start of a whole pattern
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+def _combinable(pattern: re.Pattern) -> bool:
+    """
+    True if the regex still means the same inside "(?P<rN>...)|...":
+    no capture groups (so no backreferences or clashing group names either)
+    and no inline global flags.
+    """
+    return pattern.groups == 0 and not _INLINE_FLAGS.search(pattern.pattern)
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class RuleMatcher:
+    """
+    Compiled form of a rule list. Build it with compile_rules().
+
+    classify(name, size, mtime) -> category or None
+    classify_many(entries)      -> list of categories (None = no rule matched)
+
+    How a name is checked without looping over every rule:
+    - suffix rules: walk the suffix trie (a few dict lookups)
+    - globs: each glob is indexed by one 3-letter piece it MUST contain,
+      so only globs sharing a piece with the name are tried
+    - regexes: one combined regex finds the first matching regex rule
+      (plus the few that cannot be combined, tried one by one)
+    """
+
+    def __init__(self, rules: List[_Rule]) -> None:
+        self.rules = rules
+
+        # Suffix trie keyed by name parts from the END:
+        # ".tar.gz" is stored as  root -> "gz" -> "tar"
+        # Each node keeps the rule ids whose suffix ends there.
+        self._trie: Dict[str, Any] = {}
+
+        # Rules with no name condition at all (only size/age, or nothing)
+        self._always: List[int] = []
+
+        # Globs: trigram -> rule ids, plus globs too short to index (always tried)
+        self._glob_index: Dict[str, List[int]] = {}
+        self._glob_always: List[int] = []
+
+        # Regexes: one combined regex, one named group per rule;
+        # the ones that cannot be combined are matched one by one
+        self._regex_rules: List[int] = []
+        self._combined: Optional[re.Pattern] = None
+        self._group_to_rule: Dict[str, int] = {}
+        self._separate_regex: List[int] = []
+
+        self._single_patterns: Dict[int, re.Pattern] = {}
+
+    def _add_rule(self, rule: _Rule, suffixes: List[str]) -> None:
+        for suffix in suffixes:
+            parts = suffix.lower().lstrip(".").split(".")
+            node = self._trie
+            for part in reversed(parts):
+                node = node.setdefault(part, {})
+            node.setdefault(None, []).append(rule.index)
+
+        if rule.pattern is None:
+            if not rule.has_suffixes:
+                self._always.append(rule.index)
+            return
+
+        self._single_patterns[rule.index] = re.compile(rule.pattern, re.IGNORECASE)
+
+        if not rule.is_glob:
+            if _combinable(self._single_patterns[rule.index]):
+                self._regex_rules.append(rule.index)
+            else:
+                self._separate_regex.append(rule.index)
+            return
+
+        literals = [lit for lit in _glob_literals(rule.glob) if len(lit) >= 3]
+        if not literals:
+            self._glob_always.append(rule.index)
+            return
+
+        # Any trigram of the longest literal is required; index the first one
+        key = max(literals, key=len)[:3]
+        self._glob_index.setdefault(key, []).append(rule.index)
+
+    def _finish(self) -> None:
+        if not self._regex_rules:
+            return
+
+        groups = []
+        for rule_id in self._regex_rules:
+            group = f"r{rule_id}"
+            self._group_to_rule[group] = rule_id
+            groups.append(f"(?P<{group}>{self.rules[rule_id].pattern})")
+
+        # Alternatives are tried left to right, so the group that matches
+        # is the FIRST regex rule (in config order) that fits the name.
+        self._combined = re.compile("|".join(groups), re.IGNORECASE)
+
+    def _suffix_hits(self, lower_name: str) -> List[int]:
+        hits: List[int] = []
+        parts = lower_name.split(".")
+        if parts[0] == "":
+            # ".bashrc" is a hidden file with no extension (same as Path.suffix)
+            parts = parts[1:]
+        # parts[0] is the stem, never an extension
+        node = self._trie
+        for part in reversed(parts[1:]):
+            node = node.get(part)
+            if node is None:
+                break
+            hits.extend(node.get(None, ()))
+        return hits
+
+    def _glob_candidates(self, lower_name: str) -> List[int]:
+        if not self._glob_index:
+            return self._glob_always
+        found = list(self._glob_always)
+        index = self._glob_index
+        for gram in _trigrams(lower_name):
+            ids = index.get(gram)
+            if ids:
+                found.extend(ids)
+        return found
+
+    def _first_regex_rule(self, lower_name: str) -> Optional[int]:
+        first: Optional[int] = None
+        if self._combined is not None:
+            m = self._combined.match(lower_name)
+            if m is not None:
+                first = self._group_to_rule[m.lastgroup]
+
+        # Regexes kept out of the combined one: only those before its hit matter
+        for rule_id in self._separate_regex:
+            if first is not None and rule_id > first:
+                break
+            if self._single_patterns[rule_id].match(lower_name):
+                return rule_id
+        return first
+
+    def classify(self, name: str, size: int = 0, mtime: float = 0.0,
+                 now: Optional[float] = None) -> Optional[str]:
+        """Category of the first rule that matches this file, or None."""
+        now = time.time() if now is None else now
+        lower = name.lower()
+
+        hit_set = set(self._suffix_hits(lower))
+        first_regex = self._first_regex_rule(lower)
+
+        candidates: Set[int] = set(hit_set)
+        candidates.update(self._always)
+        candidates.update(self._glob_candidates(lower))
+        if first_regex is not None:
+            candidates.add(first_regex)
+
+        for rule_id in sorted(candidates):
+            rule = self.rules[rule_id]
+
+            if rule_id == first_regex:
+                if (not rule.has_suffixes or rule_id in hit_set) and rule.checks_file(size, mtime, now):
+                    return rule.category
+                # The first regex match failed on suffix/size/age: later regex rules
+                # were not candidates yet, so check the rest one by one (rare)
+                return self._classify_slow(lower, hit_set, size, mtime, now, rule_id + 1)
+
+            if rule.has_suffixes and rule_id not in hit_set:
+                continue
+
+            if rule.pattern is not None:
+                if not rule.is_glob and (first_regex is None or rule_id < first_regex):
+                    continue   # combined regex proved no earlier regex matches
+                if not self._single_patterns[rule_id].match(lower):
+                    continue
+
+            if rule.checks_file(size, mtime, now):
+                return rule.category
+
+        return None
+
+    def _classify_slow(self, lower: str, hit_set: Set[int], size: int, mtime: float,
+                       now: float, start: int) -> Optional[str]:
+        for rule in self.rules[start:]:
+            if rule.has_suffixes and rule.index not in hit_set:
+                continue
+            if rule.pattern is not None and not self._single_patterns[rule.index].match(lower):
+                continue
+            if rule.checks_file(size, mtime, now):
+                return rule.category
+        return None
+
+    def classify_many(self, entries: Iterable[FileEntry]) -> List[Optional[str]]:
+        """Classifies a whole listing (the clock is read once for the batch)."""
+        now = time.time()
+        classify = self.classify
+        return [classify(e.name, e.size, e.mtime, now) for e in entries]
+
+
+def compile_rules(rules: Optional[List[Dict[str, Any]]] = None,
+                  categories: Optional[Dict[str, List[str]]] = None) -> RuleMatcher:
+    """
+    Compiles an ordered rule list (+ the old categories map) into a RuleMatcher.
+    Raises ValueError for a malformed rule.
+    """
+    specs: List[Dict[str, Any]] = []
+
+    for i, spec in enumerate(rules or []):
+        if not isinstance(spec, dict) or "category" not in spec:
+            raise ValueError(f"rules[{i}] must be an object with a \"category\"")
+        unknown = set(spec) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"rules[{i}] has unknown keys: {sorted(unknown)}")
+        if spec.get("glob") and spec.get("regex"):
+            raise ValueError(f"rules[{i}] can have \"glob\" or \"regex\", not both")
+        specs.append(spec)
+
+    # Old-style categories come last, as suffix rules.
+    # Same as build_extension_map(): lowercase, and a later category wins a shared extension.
+    ext_map: Dict[str, str] = {}
+    for category_name, ext_list in (categories or {}).items():
+        for ext in ext_list:
+            ext_map[ext.lower()] = category_name
+
+    # Longest extensions first, so ".tar.gz" beats ".gz"
+    by_length: Dict[int, Dict[str, List[str]]] = {}
+    for ext, category_name in ext_map.items():
+        parts = ext.count(".")
+        by_length.setdefault(parts, {}).setdefault(category_name, []).append(ext)
+
+    for parts in sorted(by_length, reverse=True):
+        for category_name, ext_list in by_length[parts].items():
+            specs.append({"category": category_name, "suffixes": ext_list})
+
+    matcher = RuleMatcher([_Rule(i, spec) for i, spec in enumerate(specs)])
+
+    try:
+        for rule, spec in zip(matcher.rules, specs):
+            matcher._add_rule(rule, spec.get("suffixes") or [])
+        matcher._finish()
+    except re.error as e:
+        raise ValueError(f"Invalid regex in rules: {e}") from e
+
+    return matcher
+
+
+# config path -> (mtime_ns, matcher)
+_COMPILED_CACHE: Dict[str, Tuple[int, RuleMatcher]] = {}
+
+
+def load_rule_matcher(config_path: Path) -> RuleMatcher:
+    """
+    Compiled matcher for a rules.json file.
+
+    The result is cached by the file's mtime: as long as the file is not
+    edited, later calls (e.g. every watch-mode batch) reuse it for free.
+    """
+    path = Path(config_path)
+    mtime_ns = path.stat().st_mtime_ns
+
+    cached = _COMPILED_CACHE.get(str(path))
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    cfg = json.loads(path.read_text(encoding="utf-8"))
+    matcher = compile_rules(cfg.get("rules"), cfg.get("categories"))
+    _COMPILED_CACHE[str(path)] = (mtime_ns, matcher)
+    return matcher
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+"""
+scheduler.py
+------------
+Runs pipeline stages as soon as the stages they need are done
+
+What this module does:
+- Each stage names the stages it needs (organize -> report -> email, organize -> backup)
+- Stages whose needs are met run at the same time, in a thread pool
+  (report is Python / openpyxl work, backup mostly zlib and disk I/O, which
+  release the GIL, so they overlap well in threads)
+- The run takes about as long as its longest chain, not the sum of all stages
+- max_workers=1 runs the stages one by one, in the order they were added
+
+Errors:
+- A failed stage starts nothing new; stages already running finish
+- run() then raises the first failure (the original exception and traceback),
+  so callers handle it like any other error; later failures are logged
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+
+class StageScheduler:
+    """
+    Usage:
+        scheduler = StageScheduler(logger, max_workers=4)
+        scheduler.add("organize", do_organize)
+        scheduler.add("report", do_report, needs=["organize"])
+        scheduler.add("backup", do_backup, needs=["organize"])
+        scheduler.add("email", do_email, needs=["report"])
+        results = scheduler.run()     # {stage: return value}
+    """
+
+    def __init__(self, logger, max_workers: int = 4) -> None:
+        self.logger = logger
+        self.max_workers = max(1, max_workers)
+        self._stages: Dict[str, Tuple[Callable[[], Any], List[str]]] = {}
+
+    def add(self, name: str, func: Callable[[], Any], needs: Iterable[str] = ()) -> None:
+        """needs: stages added before this one (a need that is not added is ignored)."""
+        if name in self._stages:
+            raise ValueError(f"Stage added twice: {name}")
+        self._stages[name] = (func, [n for n in needs if n in self._stages])
+
+    def run(self) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        errors: List[Tuple[str, BaseException]] = []
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            while running or (pending and not errors):
+                # Start stages whose needs are all done (in the order added), only as
+                # many as there are free workers: a queued stage could not be held
+                # back any more if the running one fails
+                if not errors:
+                    for name, (func, needs) in list(pending.items()):
+                        if len(running) >= self.max_workers:
+                            break
+                        if all(n in results for n in needs):
+                            del pending[name]
+                            running[pool.submit(func)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors.append((name, e))
+
+        if errors:
+            if pending:
+                self.logger.warning(f"Not started after the failure: {', '.join(pending)}")
+            for name, e in errors[1:]:
+                self.logger.error(f"Stage {name} also failed: {e}", exc_info=e)
+            raise errors[0][1]
+        return results
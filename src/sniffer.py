@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+"""
+sniffer.py
+----------
+Content sniffing: find a file's real type from its first bytes
+
+What this module does:
+- Reads a small, bounded header (default 512 bytes) from a file
+- Matches it against known "magic bytes" (PDF, PNG, ZIP, ...)
+- Returns an extension (".pdf", ".png", ...) that build_extension_map() understands
+- Remembers each verdict on disk, keyed by (device, inode, size, mtime),
+  so a file's header is read at most once, even across runs
+  (a move inside the same drive keeps the inode, so organized files stay cached)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.walker import FileEntry
+
+
+# (offset, magic bytes, extension) - longer / more specific signatures first
+SIGNATURES: Tuple[Tuple[int, bytes, str], ...] = (
+    (0, b"%PDF-", ".pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", ".png"),
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"GIF87a", ".gif"),
+    (0, b"GIF89a", ".gif"),
+    (0, b"7z\xbc\xaf\x27\x1c", ".7z"),
+    (0, b"Rar!\x1a\x07", ".rar"),
+    (0, b"PK\x03\x04", ".zip"),
+    (0, b"PK\x05\x06", ".zip"),          # empty zip
+    (0, b"\x1f\x8b", ".gz"),
+    (257, b"ustar", ".tar"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc"),   # old Office (doc/xls/ppt/msi)
+    (0, b"{\\rtf", ".rtf"),
+    (0, b"\x1a\x45\xdf\xa3", ".mkv"),
+    (4, b"ftyp", ".mp4"),
+    (0, b"ID3", ".mp3"),
+    (0, b"\xff\xfb", ".mp3"),
+    (0, b"MZ", ".exe"),
+)
+
+# RIFF containers: the real type is at offset 8
+RIFF_TYPES = {b"WEBP": ".webp", b"WAVE": ".wav", b"AVI ": ".avi"}
+
+# File extensions that legitimately use the same container as a sniffed type.
+# Example: .docx IS a zip, so a .docx file that sniffs as ".zip" keeps its name-based category.
+COMPATIBLE_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    ".zip": (".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".jar", ".apk", ".epub"),
+    ".doc": (".xls", ".ppt", ".msi"),
+    ".gz": (".tgz",),
+    ".jpg": (".jpeg",),
+    ".mp4": (".mov", ".m4a", ".m4v", ".3gp"),
+    ".mkv": (".webm",),
+    ".exe": (".dll", ".msi"),
+}
+
+# Stored in the cache for "header read, nothing recognised"
+NO_MATCH = ""
+
+
+def sniff_header(header: bytes) -> Optional[str]:
+    """Returns the extension matching the header bytes, or None."""
+    if header[:4] == b"RIFF":
+        return RIFF_TYPES.get(header[8:12])
+
+    for offset, magic, ext in SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return ext
+
+    return None
+
+
+def is_compatible(sniffed_ext: str, name_ext: str) -> bool:
+    """True if a file named *name_ext that sniffs as sniffed_ext is not mislabeled."""
+    return name_ext == sniffed_ext or name_ext in COMPATIBLE_EXTENSIONS.get(sniffed_ext, ())
+
+
+class ContentSniffer:
+    """
+    Sniffs file types with an on-disk verdict cache.
+
+    The cache is a JSON file: "dev:ino:size:mtime" -> extension ("" = no match).
+    Call save() once at the end of a run.
+    """
+
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        header_bytes: int = 512,
+        max_entries: int = 200_000
+    ) -> None:
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.header_bytes = max(header_bytes, 262)   # tar magic sits at offset 257
+        self.max_entries = max_entries
+        self._cache: Dict[str, str] = {}
+        self._dirty = False
+
+        if self.cache_file and self.cache_file.exists():
+            try:
+                self._cache = json.loads(self.cache_file.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                # Broken cache is not fatal: it is only a speed-up
+                self._cache = {}
+
+    @classmethod
+    def from_config(cls, sniff_cfg: dict) -> Optional["ContentSniffer"]:
+        """Builds a sniffer from the "sniff" section of rules.json (None if disabled)."""
+        if not sniff_cfg.get("enabled", False):
+            return None
+        return cls(
+            cache_file=sniff_cfg.get("cache_file", "runs/signature_cache.json"),
+            header_bytes=int(sniff_cfg.get("header_bytes", 512)),
+        )
+
+    @staticmethod
+    def _key(entry: FileEntry) -> Optional[str]:
+        # No inode (some Windows drives): cannot identify the file safely, don't cache
+        if not entry.ino:
+            return None
+        return f"{entry.dev}:{entry.ino}:{entry.size}:{entry.mtime!r}"
+
+    def sniff(self, entry: FileEntry) -> Optional[str]:
+        """Extension found from the file's content, or None if not recognised / unreadable."""
+        key = self._key(entry)
+        if key is not None and key in self._cache:
+            return self._cache[key] or None
+
+        try:
+            with open(entry.path, "rb") as f:
+                header = f.read(self.header_bytes)
+        except OSError:
+            return None
+
+        ext = sniff_header(header)
+
+        if key is not None:
+            self._cache[key] = ext or NO_MATCH
+            self._dirty = True
+
+        return ext
+
+    def save(self) -> None:
+        """Writes the cache (atomically) if anything changed."""
+        if not self._dirty or self.cache_file is None:
+            return
+
+        # Keep the newest entries only (dicts keep insertion order)
+        if len(self._cache) > self.max_entries:
+            keys = list(self._cache)[-self.max_entries:]
+            self._cache = {k: self._cache[k] for k in keys}
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_suffix(self.cache_file.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._cache), encoding="utf-8")
+        os.replace(tmp, self.cache_file)
+        self._dirty = False
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+"""
+walker.py
+---------
+Shared folder walker (used by organizer, backup and restore)
+
+What this module does:
+- Lists files with os.scandir (one directory read gives names + types)
+- Skips ignored folders BEFORE going into them (no wasted listing)
+- Takes size/mtime from the DirEntry stat (no extra Path.stat() calls)
+- Yields small FileEntry tuples one by one, so huge trees never sit in memory
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+
+class FileEntry(NamedTuple):
+    """One file found by walk_files()."""
+    path: str      # full path (as a string, cheaper than Path)
+    rel: str       # path relative to the walk root, with "/" separators
+    depth: int     # 0 = directly inside root, 1 = one folder down, ...
+    size: int      # bytes
+    mtime: float   # modification time (seconds)
+    dev: int = 0   # device id (0 = unknown)
+    ino: int = 0   # inode number (0 = unknown)
+
+    @property
+    def name(self) -> str:
+        return self.rel.rsplit("/", 1)[-1]
+
+
+def walk_files(
+    root: Path,
+    skip_dir_names: Optional[Iterable[str]] = None,
+    max_depth: Optional[int] = 0,
+    counters: Optional[Dict[str, int]] = None
+) -> Iterator[FileEntry]:
+    """
+    Yields every file under root.
+
+    Parameters:
+        root: folder to walk
+        skip_dir_names: folder names that are never entered (at any depth)
+        max_depth: 0 = only files directly in root (default),
+                   N = go N folders down, None = no limit
+        counters: if given, "dirs_listed" and "stat_calls" are added to it
+
+    Notes:
+    - Symlinked folders are not followed (avoids loops)
+    - Sub-folders we cannot read are skipped; an unreadable root raises
+    """
+    skip = set(skip_dir_names or [])
+
+    # Stack of (folder path, relative prefix, depth) still to read
+    stack = [(str(root), "", 0)]
+
+    dirs_listed = stat_calls = 0
+
+    try:
+        while stack:
+            folder, prefix, depth = stack.pop()
+
+            try:
+                it = os.scandir(folder)
+            except (PermissionError, FileNotFoundError):
+                if depth == 0:
+                    raise
+                continue
+            dirs_listed += 1
+
+            with it:
+                for entry in it:
+                    rel = prefix + entry.name
+
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Prune here: skipped folders are never listed
+                            if entry.name in skip:
+                                continue
+                            if max_depth is None or depth < max_depth:
+                                stack.append((entry.path, rel + "/", depth + 1))
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        stat_calls += 1
+                        st = entry.stat()
+                    except OSError:
+                        # File vanished or is unreadable while we were looking
+                        continue
+
+                    yield FileEntry(entry.path, rel, depth, st.st_size, st.st_mtime, st.st_dev, st.st_ino)
+    finally:
+        # Also runs when the caller stops early
+        if counters is not None:
+            counters["dirs_listed"] = counters.get("dirs_listed", 0) + dirs_listed
+            counters["stat_calls"] = counters.get("stat_calls", 0) + stat_calls
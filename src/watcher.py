@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+"""
+watcher.py
+----------
+Watch mode: organize new files as soon as they land (Linux only)
+
+What this module does:
+- Subscribes to inotify events on base_folder (stdlib ctypes, no extra service)
+- Waits until a new file stops changing (size + mtime stable) before touching it
+- Groups ready files into small batches and hands them to a callback
+- Sleeps inside the kernel while nothing happens (no rescans when idle)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.walker import FileEntry, walk_files
+
+
+# inotify event flags (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+
+# struct inotify_event { int wd; uint32 mask; uint32 cookie; uint32 len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Tiny ctypes wrapper around one inotify watch on one folder."""
+
+    def __init__(self, folder: Path, mask: int = WATCH_MASK) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("Watch mode needs Linux inotify")
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {folder}: {os.strerror(err)}")
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, str]]:
+        """
+        Blocks up to timeout seconds (None = forever).
+        Returns a list of (mask, file name) events.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            events.append((mask, os.fsdecode(raw_name)))
+
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def watch_folder(
+    base_folder: Path,
+    on_batch: Callable[[List[FileEntry]], None],
+    settle_seconds: float = 2.0,
+    batch_window_seconds: float = 1.0,
+    max_batch: int = 500,
+    partial_suffixes: Optional[Iterable[str]] = None,
+    stop_event: Optional[threading.Event] = None,
+    catch_up: bool = True
+) -> None:
+    """
+    Calls on_batch(entries) with files that appeared in base_folder
+    and have stopped changing.
+
+    Parameters:
+        base_folder: folder to watch (top level only, like organize_folder)
+        on_batch: callback that organizes a list of FileEntry
+        settle_seconds: a file must keep the same size/mtime this long
+        batch_window_seconds: wait this long for more ready files before sending
+        max_batch: send a batch early when it reaches this many files
+        partial_suffixes: in-progress download names (".part", ".crdownload"...) to ignore
+        stop_event: set it from another thread to stop watching
+        catch_up: also pick up files already in base_folder (listed once the
+                  watch is in place, so nothing created in between is missed;
+                  they go through the same partial / settle checks as new files)
+
+    Returns when stop_event is set or base_folder is deleted/moved.
+    """
+    partial = tuple(s.lower() for s in (partial_suffixes or []))
+    stop_event = stop_event or threading.Event()
+
+    # name -> (size, mtime, time it was last seen changing)
+    pending: Dict[str, Tuple[int, float, float]] = {}
+    ready: List[FileEntry] = []
+    first_ready_at = 0.0
+
+    def remember(name: str) -> None:
+        if name.lower().endswith(partial):
+            return
+        path = os.path.join(base_folder, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            pending.pop(name, None)
+            return
+        if not os.path.isfile(path):
+            return
+        pending[name] = (st.st_size, st.st_mtime, time.monotonic())
+
+    inotify = Inotify(base_folder)
+    try:
+        if catch_up:
+            # Files that arrived while we were not watching
+            for entry in walk_files(base_folder):
+                remember(entry.name)
+
+        while not stop_event.is_set():
+            now = time.monotonic()
+
+            # Sleep until the next pending file could settle / the batch window ends.
+            # Nothing pending -> block in the kernel (but wake up to notice stop_event).
+            deadlines = [seen + settle_seconds for _, _, seen in pending.values()]
+            if ready:
+                deadlines.append(first_ready_at + batch_window_seconds)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else 1.0
+
+            for mask, name in inotify.read(timeout):
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    # base_folder itself is gone: nothing left to watch
+                    stop_event.set()
+                    break
+                if mask & IN_Q_OVERFLOW:
+                    # Kernel dropped events: fall back to one listing
+                    for entry in walk_files(base_folder):
+                        remember(entry.name)
+                    continue
+                if mask & IN_ISDIR or not name:
+                    continue
+                remember(name)
+
+            # Debounce: re-check files whose quiet period is over
+            now = time.monotonic()
+            for name, (size, mtime, seen) in list(pending.items()):
+                if now - seen < settle_seconds:
+                    continue
+
+                path = os.path.join(base_folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del pending[name]
+                    continue
+
+                if (st.st_size, st.st_mtime) != (size, mtime):
+                    # Still being written: start the quiet period again
+                    pending[name] = (st.st_size, st.st_mtime, now)
+                    continue
+
+                del pending[name]
+                if not ready:
+                    first_ready_at = now
+                ready.append(FileEntry(path, name, 0, st.st_size, st.st_mtime, st.st_dev, st.st_ino))
+
+            # Micro-batch: send when the window is over or the batch is full
+            if ready and (len(ready) >= max_batch or now - first_ready_at >= batch_window_seconds):
+                batch, ready = ready, []
+                on_batch(batch)
+
+        # Stopped from outside: do not drop files that were already ready
+        if ready and base_folder.exists():
+            on_batch(ready)
+    finally:
+        inotify.close()
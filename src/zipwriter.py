@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+"""
+zipwriter.py
+------------
+Write a standard ZIP64 archive using every CPU core for compression
+
+What this module does:
+- Splits each file into fixed-size blocks and deflates the blocks in a thread pool
+  (zlib releases the GIL, so threads really run in parallel)
+- Every block is a raw deflate stream ending with a sync flush (the last one with
+  a final flush), so the blocks of one file join into ONE valid deflate stream
+  (same trick as pigz)
+- Writes the compressed blocks in a fixed order: members in the order they were
+  added, blocks in file order -> same input, same archive
+- Headers and the central directory are written by the stdlib zipfile module,
+  so the output opens with zipfile / unzip / Explorer like any other zip
+
+The compressed bytes go straight into the ZipFile's file object and member
+list (fp, filelist, NameToInfo, start_dir: not public API). If a Python
+version does not have them, every file is added with plain ZipFile.write()
+instead (one core, same archive format).
+"""
+
+import bz2
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, Optional, Tuple
+
+from src.compression import METHODS, CompressionStats
+
+
+BLOCK_SIZE = 1024 * 1024
+
+# ZipFile internals the parallel path writes through
+_ZIPFILE_INTERNALS = ("fp", "_didModify", "start_dir", "filelist", "NameToInfo")
+
+
+def _has_internals(zf: zipfile.ZipFile) -> bool:
+    """True if zf has the internals this module writes through (checked, never assumed)."""
+    return (all(hasattr(zf, name) for name in _ZIPFILE_INTERNALS)
+            and isinstance(zf.filelist, list) and isinstance(zf.NameToInfo, dict)
+            and callable(getattr(zipfile.ZipInfo, "FileHeader", None))
+            and zf.fp is not None and zf.fp.seekable())
+
+
+def _deflate_block(data: bytes, level: int, last: bool) -> Tuple[bytes, float]:
+    start = time.perf_counter()
+    c = zlib.compressobj(level, zlib.DEFLATED, -15)   # raw deflate, no zlib header
+    packed = c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return packed, time.perf_counter() - start
+
+
+def _compress_whole(path: str, compress_type: int) -> Tuple[int, int, bytes, float]:
+    """bzip2 / lzma cannot be split into joinable blocks: one job per file."""
+    start = time.perf_counter()
+    c = bz2.BZ2Compressor(9) if compress_type == zipfile.ZIP_BZIP2 else zipfile.LZMACompressor()
+    crc = usize = 0
+    parts = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            crc = zlib.crc32(block, crc)
+            usize += len(block)
+            parts.append(c.compress(block))
+    parts.append(c.flush())
+    return crc, usize, b"".join(parts), time.perf_counter() - start
+
+
+class ParallelZipWriter:
+    """
+    Adds files to a new zip, compressing them on a pool of threads.
+
+    Usage:
+        with ParallelZipWriter(zip_path, workers=8) as zw:
+            zw.add(path, "Docs/a.txt")
+
+    Parameters:
+        zip_path: archive to create (overwritten)
+        workers: compression threads
+        level: deflate level (1 fast .. 9 small) for method "deflate"
+        block_size: uncompressed bytes per compression job
+        stats: if given, every member is recorded (method, bytes in/out, seconds)
+    """
+
+    def __init__(
+        self,
+        zip_path: Path,
+        workers: int = 4,
+        level: int = 6,
+        block_size: int = BLOCK_SIZE,
+        stats: Optional[CompressionStats] = None
+    ) -> None:
+        self.level = level
+        self.block_size = block_size
+        self.workers = max(1, workers)
+        self.stats = stats
+
+        self._zf = zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True,
+                                   strict_timestamps=False)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        # No usable internals (other Python version): plain ZipFile.write() per file
+        self.parallel = _has_internals(self._zf)
+
+        # Work in submission order: ("begin", zinfo) / ("block", raw, future or None)
+        # / ("whole", future) / ("end", zinfo, method)
+        self._pending: Deque[Tuple] = deque()
+        # Blocks held in memory at most (raw + compressed): bounds RAM use
+        self._max_pending = self.workers * 4
+
+        # State of the member currently being written
+        self._zip64 = False
+        self._crc = 0
+        self._csize = 0
+        self._usize = 0
+        self._seconds = 0.0
+
+    def __enter__(self) -> "ParallelZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    def add(self, path: str, arcname: str, method: str = "deflate") -> None:
+        """
+        Queues one file, compressed with method (see compression.METHODS).
+        Raises OSError (e.g. PermissionError) before anything is queued if the
+        file cannot be opened, so callers can skip it.
+        """
+        compress_type, level = METHODS[method]
+        if method == "deflate":
+            level = self.level
+
+        if not self.parallel:
+            start = time.perf_counter()
+            self._zf.write(path, arcname, compress_type=compress_type, compresslevel=level)
+            if self.stats is not None:
+                info = self._zf.infolist()[-1]
+                self.stats.record(info.filename, method, info.file_size, info.compress_size,
+                                  time.perf_counter() - start)
+            return
+
+        zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        zinfo.compress_type = compress_type
+
+        with open(path, "rb") as f:
+            self._push(("begin", zinfo))
+
+            if compress_type in (zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA):
+                self._push(("whole", self._pool.submit(_compress_whole, path, compress_type)))
+            else:
+                block = f.read(self.block_size)
+                while True:
+                    nxt = f.read(self.block_size) if len(block) == self.block_size else b""
+                    last = not nxt
+                    if compress_type == zipfile.ZIP_STORED:
+                        future = None
+                    else:
+                        future = self._pool.submit(_deflate_block, block, level, last)
+                    self._push(("block", block, future))
+                    if last:
+                        break
+                    block = nxt
+
+            self._push(("end", zinfo, method))
+
+    def close(self) -> None:
+        try:
+            self._drain(0)
+        finally:
+            self._pool.shutdown()
+            self._zf.close()   # writes the central directory (ZIP64 records if needed)
+
+    def _abort(self) -> None:
+        for item in self._pending:
+            if item[0] in ("block", "whole") and item[-1] is not None:
+                item[-1].cancel()
+        self._pending.clear()
+        self._pool.shutdown()
+        self._zf.close()
+
+    # writing (always in submission order)
+
+    def _push(self, item: Tuple) -> None:
+        self._pending.append(item)
+        self._drain(self._max_pending)
+
+    def _drain(self, limit: int) -> None:
+        while len(self._pending) > limit:
+            item = self._pending.popleft()
+            if item[0] == "begin":
+                self._begin(item[1])
+            elif item[0] == "block":
+                raw, future = item[1], item[2]
+                packed, seconds = future.result() if future is not None else (raw, 0.0)
+                self._write_block(raw, packed, seconds)
+            elif item[0] == "whole":
+                crc, usize, packed, seconds = item[1].result()
+                self._crc, self._usize = crc, usize
+                self._csize += len(packed)
+                self._seconds += seconds
+                self._zf.fp.write(packed)
+            else:
+                self._end(item[1], item[2])
+
+    def _begin(self, zinfo: zipfile.ZipInfo) -> None:
+        fp = self._zf.fp
+        # Same rule as zipfile: leave room for ZIP64 sizes if the file is near 4 GB
+        self._zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        self._crc = self._csize = self._usize = 0
+        self._seconds = 0.0
+
+        zinfo.CRC = 0
+        zinfo.compress_size = 0
+        zinfo.header_offset = fp.tell()
+        # Placeholder header (real sizes/CRC are written by _end, same length)
+        fp.write(zinfo.FileHeader(self._zip64))
+        self._zf._didModify = True
+
+    def _write_block(self, raw: bytes, packed: bytes, seconds: float) -> None:
+        self._crc = zlib.crc32(raw, self._crc)
+        self._usize += len(raw)
+        self._csize += len(packed)
+        self._seconds += seconds
+        self._zf.fp.write(packed)
+
+    def _end(self, zinfo: zipfile.ZipInfo, method: str) -> None:
+        zinfo.CRC = self._crc
+        zinfo.file_size = self._usize
+        zinfo.compress_size = self._csize
+
+        if not self._zip64 and max(self._usize, self._csize) > zipfile.ZIP64_LIMIT:
+            # The file grew past 4 GB while it was being read
+            raise RuntimeError(f"File size too large (changed while zipping): {zinfo.filename}")
+
+        # Rewrite the local header with the real values (what zipfile does on close)
+        fp = self._zf.fp
+        end = fp.tell()
+        fp.seek(zinfo.header_offset)
+        fp.write(zinfo.FileHeader(self._zip64))
+        fp.seek(end)
+
+        self._zf.start_dir = end
+        self._zf.filelist.append(zinfo)
+        self._zf.NameToInfo[zinfo.filename] = zinfo
+
+        if self.stats is not None:
+            self.stats.record(zinfo.filename, method, self._usize, self._csize, self._seconds)
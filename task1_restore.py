@@ -1,7 +1,13 @@
 """
 task1_restore.py
 
-It moves files from:
+Default: undo ONE organize run using its run journal.
+Every file goes back to its exact original path:
+    python task1_restore.py                     (latest run)
+    python task1_restore.py --run-id <id>       (a specific run)
+    python task1_restore.py --category PDFs     (only some categories)
+
+Old mode (--flatten) moves everything from:
     base_folder/Organized/<Category>/<file>
 
 Back to:
@@ -11,38 +17,60 @@ This is a SAFE undo operation.
 """
 
 from pathlib import Path
-import shutil
+from typing import Optional
+import argparse
 import json
 
+from src.organizer import DestinationIndex, safe_move
+from src.journal import latest_run, find_run, run_path, iter_records
+from src.restore import restore_run
+from src.walker import walk_files
+
 
-def safe_move_back(src: Path, dst: Path) -> Path:
+def safe_move_back(src: Path, dst: Path, index: Optional[DestinationIndex] = None) -> Path:
     """
     Move file back safely.
     If file already exists in base folder, rename it.
-    """
-    if not dst.exists():
-        shutil.move(str(src), str(dst))
-        return dst
-
-    stem = dst.stem
-    suffix = dst.suffix
-    parent = dst.parent
 
-    i = 1
-    while True:
-        candidate = parent / f"{stem} ({i}){suffix}"
-        if not candidate.exists():
-            shutil.move(str(src), str(candidate))
-            return candidate
-        i += 1
+    Uses the organizer's name index (base folder listed once per run)
+    and no-clobber placement, so nothing is ever overwritten.
+    """
+    return safe_move(src, dst, index)
 
 
 def load_rules(path: str) -> dict:
     return json.loads(Path(path).read_text(encoding="utf-8"))
 
 
+def restore_from_journal(run_id: Optional[str], categories, workers: int, dry_run: bool) -> None:
+    run = find_run(run_id) if run_id else latest_run()
+    path = run_path(run)
+    print("Restoring run:", run["run_id"], "from", path)
+
+    def show(result: dict) -> None:
+        print(result["status"], "=>", result["from"], "->", result["restored_to"])
+
+    counts = restore_run(iter_records(path), categories=categories,
+                         workers=workers, dry_run=dry_run, on_record=show)
+    print(f"Restore complete. Files moved back: {counts['restored']} "
+          f"(missing: {counts['missing']}, skipped: {counts['skipped']})")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Undo organizer runs")
+    parser.add_argument("--run-id", default=None)
+    parser.add_argument("--category", action="append", default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--flatten", action="store_true",
+                        help="old mode: move EVERYTHING in Organized back to base_folder")
+    args = parser.parse_args()
+
     cfg = load_rules("config/rules.json")
+    workers = int(cfg.get("organize", {}).get("workers", 1))
+
+    if not args.flatten:
+        restore_from_journal(args.run_id, args.category, workers, args.dry_run)
+        raise SystemExit(0)
 
     base_folder = Path(cfg["base_folder"])
     organized_folder = base_folder / cfg["target_root_folder"]
@@ -55,18 +83,19 @@ if __name__ == "__main__":
 
     moved_back = 0
 
-    # Loop through category folders
-    for category_dir in organized_folder.iterdir():
-        if not category_dir.is_dir():
-            continue
+    # One name index for the whole restore (base folder is listed once)
+    index = DestinationIndex()
+
+    # Backups are not organized files, never move them back
+    backup_folder_name = cfg.get("backup", {}).get("backup_folder_name", "_backups")
 
-        # Loop through files inside each category
-        for file in category_dir.iterdir():
-            if not file.is_file():
-                continue
+    # Files inside category folders: Organized/<Category>/<file> (depth 1)
+    for entry in walk_files(organized_folder, skip_dir_names=[backup_folder_name], max_depth=1):
+        if entry.depth != 1:
+            continue
 
-            dest_path = base_folder / file.name
-            safe_move_back(file, dest_path)
-            moved_back += 1
+        dest_path = base_folder / entry.name
+        safe_move_back(Path(entry.path), dest_path, index)
+        moved_back += 1
 
     print(f"Restore complete. Files moved back: {moved_back}")
@@ -3,11 +3,21 @@ task3_backup.py
 
 """
 
+import argparse
 import json
+import os
 from pathlib import Path
-from datetime import datetime
 
-from src.backup import zip_folder, cleanup_old_backups
+from src.backup import (
+    zip_folder,
+    incremental_backup,
+    cleanup_old_backups,
+    new_backup_path,
+    restore_backup,
+)
+from src.catalog import BackupCatalog
+from src.chunkstore import ChunkStore
+from src.compression import CompressionPolicy, CompressionStats
 from src.logger_utils import setup_logger
 
 
@@ -15,11 +25,21 @@ def load_rules(path: str) -> dict:
     return json.loads(Path(path).read_text(encoding="utf-8"))
 
 
-def now_stamp() -> str:
-    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Backup the Organized folder (or restore a backup)")
+    p.add_argument("--restore", metavar="BACKUP",
+                   help="Restore this backup (zip or snapshot name, or 'latest') instead of making a backup")
+    p.add_argument("--to", metavar="DIR", help="Folder to restore/extract into (required with --restore/--extract)")
+    p.add_argument("--find", metavar="PATTERN",
+                   help="Search the backup catalog: file name, exact path, or glob like 'Docs/*.pdf'")
+    p.add_argument("--extract", metavar="PATTERN",
+                   help="Extract matching files (newest version of each) using the backup catalog")
+    p.add_argument("--archive", metavar="BACKUP", help="Only look in this backup zip (with --find/--extract)")
+    return p.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     logger = setup_logger()
 
     try:
@@ -42,16 +62,101 @@ if __name__ == "__main__":
         backup_dir = organized_folder / backup_cfg.get("backup_folder_name", "_backups")
         keep_last = int(backup_cfg.get("keep_last", 5))
 
-        zip_path = backup_dir / f"backup_{now_stamp()}.zip"
+        if args.find or args.extract:
+            with BackupCatalog(backup_dir) as catalog:
+                catalog.sync()
+
+                if args.find:
+                    rows = catalog.search(args.find, archive=args.archive)
+                    for r in rows:
+                        print(f"{r['archive']}  {r['mtime']}  {r['size']:>12}  {r['path']}")
+                    logger.info(f"Catalog search '{args.find}': {len(rows)} match(es)")
+                    raise SystemExit(0)
+
+                if not args.to:
+                    raise SystemExit("--to DIR is required with --extract")
+                rows = catalog.search(args.extract, archive=args.archive, latest_only=True)
+                workers = int(backup_cfg.get("workers") or os.cpu_count() or 1)
+                written = catalog.extract(rows, Path(args.to), workers=workers)
+                logger.info(f"Extracted {len(written)} file(s) into {args.to}")
+                raise SystemExit(0)
+
+        if args.restore:
+            if not args.to:
+                raise SystemExit("--to DIR is required with --restore")
+
+            if backup_cfg.get("mode", "full") == "chunked":
+                store = ChunkStore(backup_dir / "store")
+                snapshot = store.resolve(args.restore)
+                logger.info(f"Restoring snapshot {snapshot.name} into {args.to}")
+                count = store.restore(snapshot, Path(args.to))
+                logger.info(f"Restore complete. Files restored: {count}")
+                raise SystemExit(0)
+
+            if args.restore == "latest":
+                backups = sorted(backup_dir.glob("backup_*.zip"))
+                if not backups:
+                    raise FileNotFoundError(f"No backups found in {backup_dir}")
+                zip_path = backups[-1]
+            else:
+                zip_path = backup_dir / args.restore
+
+            logger.info(f"Restoring {zip_path.name} into {args.to}")
+            count = restore_backup(zip_path, Path(args.to))
+            logger.info(f"Restore complete. Files restored: {count}")
+            raise SystemExit(0)
+
+        # Compression threads (null in rules.json = every core)
+        workers = int(backup_cfg.get("workers") or os.cpu_count() or 1)
 
-        logger.info(f"Creating backup zip: {zip_path}")
-        zip_folder(organized_folder,
-                   zip_path,skip_dir_names=["_backups"],
-                   max_file_mb=500 )
+        comp_cfg = cfg.get("compression", {})
+        policy = CompressionPolicy.from_config(comp_cfg)
+        comp_stats = CompressionStats() if policy is not None else None
+
+        if backup_cfg.get("mode", "full") == "chunked":
+            store = ChunkStore(backup_dir / "store", workers=workers)
+            logger.info(f"Adding snapshot to chunk store: {store.root}")
+            info = store.backup(organized_folder, skip_dir_names=["_backups"], max_file_mb=500)
+            logger.info(f"Snapshot done: {Path(info['snapshot']).name}. Files: {info['file_count']}, read: {info['files_read']}, "
+                        f"new chunks: {info['new_chunks']} ({info['bytes_stored']} bytes)")
+
+            pruned = store.prune(keep_last)
+            logger.info(f"Backup complete. Deleted old snapshots: {len(pruned['deleted_snapshots'])}, "
+                        f"freed chunks: {pruned['deleted_chunks']}")
+            logger.info("Task 3 finished successfully")
+            raise SystemExit(0)
+
+        zip_path = new_backup_path(backup_dir)
+        if backup_cfg.get("mode", "full") == "incremental":
+            logger.info(f"Creating incremental backup: {zip_path}")
+            info = incremental_backup(organized_folder,
+                                      zip_path, skip_dir_names=["_backups"],
+                                      max_file_mb=500,
+                                      full_every=int(backup_cfg.get("full_every", 7)),
+                                      policy=policy, stats=comp_stats)
+            logger.info(f"Backup kind: {info['kind']}, stored files: {info['stored_count']}, "
+                        f"deleted since last: {len(info['deleted'])}")
+        else:
+            logger.info(f"Creating backup zip: {zip_path}")
+            zip_folder(organized_folder,
+                       zip_path,skip_dir_names=["_backups"],
+                       max_file_mb=500,
+                       workers=workers,
+                       policy=policy, stats=comp_stats)
+
+        if comp_stats is not None:
+            stats_file = Path(comp_cfg.get("stats_file", "runs/compression_stats.json"))
+            comp_stats.save(stats_file)
+            logger.info(f"Compression stats saved: {stats_file}")
 
         deleted = cleanup_old_backups(backup_dir, keep_last=keep_last)
         logger.info(f"Backup complete. Deleted old backups: {len(deleted)}")
 
+        if backup_cfg.get("catalog", True):
+            with BackupCatalog(backup_dir) as catalog:
+                synced = catalog.sync()
+            logger.info(f"Catalog updated. Archives added: {synced['added']}, removed: {synced['removed']}")
+
         logger.info("Task 3 finished successfully")
 
     except Exception as e:
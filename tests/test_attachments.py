@@ -0,0 +1,52 @@
+import os
+
+from src.attachments import discard_plan, plan_attachment
+
+
+# Parts of about 128 KB (two encode blocks), no zipping
+SETTINGS = {"max_message_mb": 0.25, "compress": False, "max_parts": 10}
+
+
+def test_split_parts_read_a_copy_owned_by_the_plan(tmp_path):
+    source = tmp_path / "report.xlsx"
+    data = os.urandom(400 * 1024)
+    source.write_bytes(data)
+    work = tmp_path / "work"
+
+    plan = plan_attachment(source, work, SETTINGS)
+
+    assert len(plan["parts"]) > 1
+    assert [p["filename"] for p in plan["parts"]][:2] == ["report.xlsx.001", "report.xlsx.002"]
+    assert {p["path"] for p in plan["parts"]} == {plan["work_file"]}
+    assert os.path.dirname(plan["work_file"]) == str(work)
+
+    source.write_bytes(b"rewritten by the next run")
+    with open(plan["work_file"], "rb") as f:
+        assert f.read() == data
+
+    discard_plan(plan)
+    assert list(work.iterdir()) == []
+
+
+def test_plans_of_the_same_file_do_not_share_work_files(tmp_path):
+    source = tmp_path / "app.log"
+    source.write_text("the same line again\n" * 40_000)
+    work = tmp_path / "work"
+
+    first = plan_attachment(source, work, {**SETTINGS, "compress": True})
+    second = plan_attachment(source, work, {**SETTINGS, "compress": True})
+
+    assert first["parts"][0]["filename"] == second["parts"][0]["filename"] == "app.log.zip"
+    assert first["work_file"] != second["work_file"]
+    discard_plan(first)
+    assert os.path.exists(second["work_file"])
+
+
+def test_small_file_is_sent_from_where_it_is(tmp_path):
+    source = tmp_path / "report.xlsx"
+    source.write_bytes(b"x" * 100)
+
+    plan = plan_attachment(source, tmp_path / "work", SETTINGS)
+
+    assert plan["work_file"] is None
+    assert plan["parts"] == [{"filename": "report.xlsx", "path": str(source), "offset": 0, "length": 100}]
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from src.backup import (backup_chain, cleanup_old_backups, incremental_backup, manifest_path,
+                        new_backup_path, restore_backup, zip_folder)
+
+
+def tree_state(folder):
+    return {p.relative_to(folder).as_posix(): p.read_bytes()
+            for p in sorted(folder.rglob("*")) if p.is_file() and "_backups" not in p.parts}
+
+
+def touch(path, text, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "Organized"
+    touch(src / "Docs" / "a.txt", "alpha " * 1000, 1_700_000_000)
+    touch(src / "Docs" / "b.txt", "bravo", 1_700_000_000)
+    touch(src / "Images" / "c.bin", "charlie", 1_700_000_000)
+    return src
+
+
+def test_new_backup_paths_never_repeat(tmp_path):
+    paths = [new_backup_path(tmp_path) for _ in range(20)]
+
+    assert len(set(paths)) == 20
+    assert all(p.exists() and p.stat().st_size == 0 for p in paths)
+
+
+def test_incremental_chain_restores_each_state(tmp_path, source):
+    backups = tmp_path / "backups"
+
+    first = new_backup_path(backups)
+    assert incremental_backup(source, first)["kind"] == "full"
+    state_1 = tree_state(source)
+
+    touch(source / "Docs" / "b.txt", "bravo, edited", 1_700_000_100)
+    (source / "Images" / "c.bin").unlink()
+    touch(source / "New" / "d.txt", "delta", 1_700_000_100)
+    second = new_backup_path(backups)
+    header = incremental_backup(source, second)
+    assert header["kind"] == "incremental"
+    assert header["parent"] == first.name
+    assert header["stored_count"] == 2
+    assert header["deleted"] == ["Images/c.bin"]
+    state_2 = tree_state(source)
+
+    touch(source / "Docs" / "a.txt", "alpha " * 1000, 1_700_000_200)   # touched, same bytes
+    third = new_backup_path(backups)
+    assert incremental_backup(source, third)["stored_count"] == 0
+
+    assert backup_chain(third) == [third, second, first]
+    for zip_path, state in ((first, state_1), (second, state_2), (third, state_2)):
+        out = tmp_path / f"out_{zip_path.stem}"
+        assert restore_backup(zip_path, out) == len(state)
+        assert tree_state(out) == state
+    assert os.path.getmtime(tmp_path / f"out_{third.stem}" / "Docs" / "a.txt") == 1_700_000_200
+
+
+def test_full_every_starts_a_new_chain(tmp_path, source):
+    backups = tmp_path / "backups"
+    kinds = []
+    for i in range(4):
+        touch(source / "Docs" / "b.txt", f"version {i}", 1_700_000_000 + i)
+        kinds.append(incremental_backup(source, new_backup_path(backups), full_every=2)["kind"])
+
+    assert kinds == ["full", "incremental", "incremental", "full"]
+
+
+def test_reusing_the_latest_name_is_refused(tmp_path, source):
+    backups = tmp_path / "backups"
+    zip_path = new_backup_path(backups)
+    incremental_backup(source, zip_path)
+    before = zip_path.read_bytes()
+
+    with pytest.raises(ValueError):
+        incremental_backup(source, zip_path)
+    assert zip_path.read_bytes() == before
+
+
+def test_a_looping_chain_is_reported_not_followed(tmp_path, source):
+    backups = tmp_path / "backups"
+    zip_path = new_backup_path(backups)
+    incremental_backup(source, zip_path)
+    manifest = manifest_path(zip_path)
+    lines = manifest.read_text().splitlines()
+    header = json.loads(lines[0])
+    header["parent"] = zip_path.name
+    manifest.write_text("\n".join([json.dumps(header)] + lines[1:]) + "\n")
+
+    with pytest.raises(ValueError):
+        backup_chain(zip_path)
+    with pytest.raises(ValueError):
+        restore_backup(zip_path, tmp_path / "out")
+    assert cleanup_old_backups(backups, keep_last=1) == []
+
+
+def test_cleanup_keeps_the_chain_of_kept_backups(tmp_path, source):
+    backups = tmp_path / "backups"
+    made = []
+    for i in range(3):
+        touch(source / "Docs" / "b.txt", f"version {i}", 1_700_000_000 + i)
+        made.append(new_backup_path(backups))
+        incremental_backup(source, made[-1])
+        os.utime(made[-1], (1_700_000_000 + i, 1_700_000_000 + i))
+    plain = new_backup_path(backups)
+    zip_folder(source, plain)
+    os.utime(plain, (1_700_000_010, 1_700_000_010))
+
+    assert cleanup_old_backups(backups, keep_last=2) == []
+    assert all(p.exists() for p in made)
+
+    out = tmp_path / "out"
+    assert restore_backup(plain, out) == 3
+    assert tree_state(out) == tree_state(source)
@@ -0,0 +1,26 @@
+from benchmarks.pipeline import STAGES, check_counts, run_suite
+
+
+TREE = {"files": 10, "bytes": 1000}
+
+
+def test_matching_counts_pass():
+    assert check_counts("restore", {"files": 10, "missing": 0}, TREE) == []
+    assert check_counts("backup", {"files": 10, "bytes": 1000, "archive_bytes": 1}, TREE) == []
+
+
+def test_short_counts_fail():
+    assert check_counts("restore", {"files": 9, "missing": 1}, TREE) == [
+        "restore: files = 9, expected 10", "restore: missing = 1, expected 0"]
+    assert check_counts("backup", {"files": 10, "bytes": 999}, TREE) == ["backup: bytes = 999, expected 1000"]
+
+
+def test_suite_counts_match_a_small_tree():
+    overrides = {"files": 40, "median_kb": 1, "subfolders": 3, "collision_groups": 2,
+                 "collision_copies": 3, "large_files": 0}
+    result = run_suite("small", 1, STAGES, repeat=1, workers=2, overrides=overrides)
+
+    assert result["files"] == 46
+    assert result["stages"]["restore"]["files"] == 46
+    assert result["stages"]["restore"]["missing"] == 0
+    assert result["stages"]["backup"]["files"] == 46
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from src.backup import new_backup_path, zip_folder
+from src.catalog import BackupCatalog
+
+
+def write(path, data, mtime=1_700_000_000):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def backups(tmp_path):
+    src = tmp_path / "Organized"
+    write(src / "Docs" / "invoice_march.pdf", b"%PDF march " * 1000)
+    write(src / "Docs" / "notes.txt", b"first version")
+    write(src / "Images" / "Ünïcode photo.jpg", os.urandom(5000))
+    backup_dir = src / "_backups"
+    first = zip_folder(src, new_backup_path(backup_dir))
+
+    write(src / "Docs" / "notes.txt", b"second version", 1_700_000_100)
+    second = zip_folder(src, new_backup_path(backup_dir), workers=3)
+    return backup_dir, first, second
+
+
+def test_sync_and_search(backups):
+    backup_dir, first, second = backups
+    with BackupCatalog(backup_dir) as catalog:
+        assert catalog.sync() == {"added": 2, "members": 6, "removed": 0}
+        assert catalog.sync()["added"] == 0
+
+        by_name = catalog.search("NOTES.TXT")
+        assert [r["archive"] for r in by_name] == [second.name, first.name]
+        assert [r["path"] for r in catalog.search("Docs/notes.txt", latest_only=True)] == ["Docs/notes.txt"]
+        assert {r["path"] for r in catalog.search("*invoice*")} == {"Docs/invoice_march.pdf"}
+        assert len(catalog.search("Docs/*", archive=first.name)) == 2
+        assert catalog.search("missing.txt") == []
+
+        second.unlink()
+        assert catalog.sync() == {"added": 0, "members": 0, "removed": 1}
+        assert [r["archive"] for r in catalog.search("notes.txt")] == [first.name]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_extract_newest_versions(backups, tmp_path, workers):
+    backup_dir, first, second = backups
+    out = tmp_path / f"out_{workers}"
+    with BackupCatalog(backup_dir) as catalog:
+        catalog.sync()
+        written = catalog.extract(catalog.search("*", latest_only=True), out, workers=workers)
+
+    assert len(written) == 3
+    assert (out / "Docs" / "notes.txt").read_bytes() == b"second version"
+    assert (out / "Docs" / "invoice_march.pdf").read_bytes() == b"%PDF march " * 1000
+    assert (out / "Images" / "Ünïcode photo.jpg").stat().st_size == 5000
+    assert os.path.getmtime(out / "Docs" / "notes.txt") == 1_700_000_100
+
+
+def test_extract_from_an_older_archive(backups, tmp_path):
+    backup_dir, first, second = backups
+    with BackupCatalog(backup_dir) as catalog:
+        catalog.sync()
+        catalog.extract(catalog.search("notes.txt", archive=first.name), tmp_path / "old")
+
+    assert (tmp_path / "old" / "Docs" / "notes.txt").read_bytes() == b"first version"
+
+
+def test_unfinished_zip_is_left_for_a_later_sync(backups):
+    backup_dir, first, second = backups
+    partial = new_backup_path(backup_dir)
+    partial.write_bytes(second.read_bytes()[:100])
+
+    with BackupCatalog(backup_dir) as catalog:
+        assert catalog.sync()["added"] == 2
+        partial.write_bytes(second.read_bytes())
+        assert catalog.sync() == {"added": 1, "members": 3, "removed": 0}
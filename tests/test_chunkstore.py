@@ -0,0 +1,31 @@
+from src.chunkstore import ChunkStore
+
+
+def test_snapshot_names_are_never_reused(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.txt").write_text("hello")
+    store = ChunkStore(tmp_path / "store", workers=1)
+
+    first = store.backup(source, "2024-01-01_00-00-00")
+    second = store.backup(source, "2024-01-01_00-00-00")
+
+    assert first["snapshot"] != second["snapshot"]
+    assert [p.name for p in store.snapshots()] == ["snap_2024-01-01_00-00-00.jsonl",
+                                                   "snap_2024-01-01_00-00-00_001.jsonl"]
+    assert store.resolve("latest").name == "snap_2024-01-01_00-00-00_001.jsonl"
+    assert sorted(p.name for p in store.snapshots_dir.iterdir()) == [p.name for p in store.snapshots()]
+
+
+def test_default_stamp_has_sub_second_precision(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.txt").write_text("hello")
+    store = ChunkStore(tmp_path / "store", workers=1)
+
+    names = {store.backup(source)["snapshot"] for _ in range(3)}
+
+    assert len(names) == 3
+    out = tmp_path / "out"
+    assert store.restore(store.resolve("latest"), out) == 1
+    assert (out / "a.txt").read_text() == "hello"
@@ -0,0 +1,107 @@
+import json
+import os
+import random
+import zipfile
+
+import pytest
+
+from src.backup import incremental_backup, new_backup_path, zip_folder
+from src.compression import SMALL_FILE_BYTES, CompressionPolicy, CompressionStats, byte_entropy
+
+
+def text(n):
+    rng = random.Random(1)
+    words = ["invoice", "report", "total", "march", "draft", "final"]
+    out = " ".join(rng.choice(words) for _ in range(n // 5))
+    return out.encode()[:n]
+
+
+def test_byte_entropy():
+    assert byte_entropy(b"") == 0.0
+    assert byte_entropy(b"a" * 1000) == 0.0
+    assert byte_entropy(bytes(range(256)) * 4) == pytest.approx(8.0)
+    assert byte_entropy(b"ab" * 500) == pytest.approx(1.0)
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {
+        "Images/photo.jpg": b"\xff\xd8" + b"x" * 100,
+        "Docs/small.txt": b"tiny",
+        "Docs/notes.txt": text(64 * 1024),
+        "Other/random.bin": os.urandom(64 * 1024),
+        "Other/pattern.bin": bytes(range(256)) * 256,   # every byte value, but repeating
+        "Other/mixed.bin": text(32 * 1024) + os.urandom(32 * 1024),
+    }
+    root = tmp_path / "Organized"
+    for rel, data in paths.items():
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(data)
+    return root
+
+
+def choose(policy, root, rel):
+    path = root / rel
+    return policy.choose(str(path), rel, path.stat().st_size)
+
+
+def test_choose_by_extension_size_and_entropy(files):
+    policy = CompressionPolicy()
+    assert choose(policy, files, "Images/photo.jpg") == "store"
+    assert choose(policy, files, "Docs/small.txt") == "deflate"
+    assert (files / "Docs/notes.txt").stat().st_size > SMALL_FILE_BYTES
+    assert choose(policy, files, "Docs/notes.txt") == "bzip2"
+    assert choose(policy, files, "Other/random.bin") == "store"
+    assert choose(policy, files, "Other/pattern.bin") == "fast"
+    assert choose(policy, files, "Other/mixed.bin") == "fast"
+
+
+def test_choose_by_category(files):
+    policy = CompressionPolicy(store_categories=["Docs"], high_categories=["Other"], high_method="lzma",
+                               high_max_mb=0)
+    assert choose(policy, files, "Docs/notes.txt") == "store"
+    # Above high_max_mb the high method is not used
+    assert choose(policy, files, "Other/random.bin") == "deflate"
+    assert choose(CompressionPolicy(high_categories=["Other"], high_method="lzma"),
+                  files, "Other/random.bin") == "lzma"
+
+
+def test_policy_from_config():
+    assert CompressionPolicy.from_config({}) is None
+    policy = CompressionPolicy.from_config({"enabled": True, "high_method": "lzma", "entropy_high": 4})
+    assert policy.high_method == "lzma" and policy.entropy_high == 4.0
+    with pytest.raises(ValueError):
+        CompressionPolicy(high_method="zstd")
+
+
+def test_stats_totals_and_merge(tmp_path):
+    stats = CompressionStats()
+    stats.record("Docs/a.txt", "bzip2", 1000, 250, 0.5)
+    stats.record("Docs/b.txt", "bzip2", 1000, 250, 0.5)
+    stats.record("top.bin", "store", 10, 10, 0.0)
+
+    assert stats.overall() == {"files": 3, "bytes_in": 2010, "bytes_out": 510, "seconds": 1.0}
+    summary = stats.summary()
+    assert summary["Docs"]["bzip2"]["ratio"] == 0.25
+    assert summary["(top level)"]["store"]["mb_per_s"] is None
+
+    stats_file = tmp_path / "stats.json"
+    stats.save(stats_file)
+    stats.save(stats_file)
+    saved = json.loads(stats_file.read_text())
+    assert saved["totals"]["Docs"]["bzip2"]["files"] == 4
+    assert saved["summary"]["Docs"]["bzip2"]["ratio"] == 0.25
+
+
+def test_incremental_backup_uses_the_method_and_level(files, tmp_path):
+    policy = CompressionPolicy()
+    plain = zip_folder(files, tmp_path / "plain" / "backup.zip", policy=policy)
+    inc = new_backup_path(tmp_path / "inc")
+    incremental_backup(files, inc, policy=policy)
+
+    with zipfile.ZipFile(plain) as a, zipfile.ZipFile(inc) as b:
+        assert b.testzip() is None
+        for info in a.infolist():
+            other = b.getinfo(info.filename)
+            assert (other.compress_type, other.compress_size) == (info.compress_type, info.compress_size)
+            assert other.date_time == info.date_time
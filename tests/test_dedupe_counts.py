@@ -0,0 +1,54 @@
+import pytest
+
+from src.organizer import organize_folder
+
+
+CATEGORIES = {"Documents": [".txt"]}
+
+
+@pytest.mark.parametrize("dry_run", [False, True])
+def test_skipped_duplicates_are_not_counted_as_moved(tmp_path, dry_run):
+    (tmp_path / "a.txt").write_text("same")
+    (tmp_path / "b.txt").write_text("same")
+    (tmp_path / "c.txt").write_text("other")
+    records = []
+
+    _, summary = organize_folder(
+        tmp_path, "Organized", CATEGORIES, "Others", [], dry_run=dry_run,
+        on_record=records.append, dedupe={"action": "skip", "include_organized": False})
+
+    assert summary["moved_count"] == 2
+    assert summary["duplicates_skipped"] == 1
+    assert summary["aggregates"]["categories"]["Documents"][0] == 2
+    skipped = [r for r in records if r.get("action") == "skipped"]
+    assert len(skipped) == 1
+    if not dry_run:
+        assert summary["ops"]["skipped"] == 1
+        assert skipped[0]["dst"] == skipped[0]["src"]
+        assert len(list(tmp_path.glob("*.txt"))) == 1
+
+
+def test_organized_index_is_walked_once_across_batches(tmp_path):
+    from src.dedupe import OrganizedIndex
+    from src.walker import walk_files
+
+    old = tmp_path / "Organized" / "Documents" / "old.txt"
+    old.parent.mkdir(parents=True)
+    old.write_text("organized before")
+    organized = OrganizedIndex(tmp_path / "Organized")
+    dedupe = {"action": "skip"}
+
+    def batch(*names_and_text):
+        for name, text in names_and_text:
+            (tmp_path / name).write_text(text)
+        entries = [e for e in walk_files(tmp_path) if e.name in {n for n, _ in names_and_text}]
+        return organize_folder(tmp_path, "Organized", CATEGORIES, "Others", [],
+                               entries=entries, dedupe=dedupe, organized=organized)[1]
+
+    first = batch(("a.txt", "organized before"), ("b.txt", "new in batch one"))
+    second = batch(("c.txt", "new in batch one"), ("d.txt", "organized before"), ("e.txt", "fresh"))
+
+    assert (first["moved_count"], first["duplicates_skipped"]) == (1, 1)
+    assert (second["moved_count"], second["duplicates_skipped"]) == (1, 2)
+    assert organized.walks == 1
+    assert sorted(p.name for p in tmp_path.glob("*.txt")) == ["a.txt", "c.txt", "d.txt"]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src.history import HistoryStore
+from src.journal import RunJournal, iter_records
+
+
+def records(day, n=2):
+    return [{"moved_at": f"{day}T10:00:00", "category": "PDFs", "size_bytes": 10, "dry_run": False}
+            for _ in range(n)]
+
+
+def test_a_run_is_only_counted_once(tmp_path):
+    history = HistoryStore(tmp_path)
+    assert history.add_run("2026-01-01_10-00-00_000000", records("2026-01-01")) == 2
+    assert history.add_run("2026-01-01_10-00-00_000000", records("2026-01-01")) == 0
+
+    assert history.trends(period="day") == [{"period": "2026-01-01", "category": "PDFs", "files": 2, "bytes": 20}]
+
+
+def test_old_run_ids_fold_into_one_mark(tmp_path):
+    history = HistoryStore(tmp_path)
+    for day in range(1, 31):
+        history.add_run(f"2026-01-{day:02d}_10-00-00_000000", records(f"2026-01-{day:02d}", 1))
+
+    state = json.loads((tmp_path / "rollup.json").read_text())
+    assert state["ingested_before"] == "2026-01-23"
+    assert len(state["ingested"]) == 8
+    # Folded runs still count as added
+    assert history.add_run("2026-01-02_10-00-00_000000", records("2026-01-02")) == 0
+    assert sum(r["files"] for r in history.trends(period="month")) == 30
+
+
+def test_since_until_must_be_dates(tmp_path):
+    history = HistoryStore(tmp_path)
+    history.add_run("2026-01-05_10-00-00_000000", records("2026-01-05"))
+
+    assert history.trends("20260101", "2026-01-05", period="day")[0]["files"] == 2
+    with pytest.raises(ValueError):
+        history.trends("2026-1-5")
+    with pytest.raises(ValueError):
+        history.trends(until="yesterday")
+
+
+def journal(runs_dir, run_id, day, n=2):
+    with RunJournal(runs_dir=runs_dir, run_id=run_id) as j:
+        for rec in records(day, n):
+            j.append(rec)
+    return j
+
+
+def test_sync_backfills_runs_older_than_the_first_added_one(tmp_path):
+    runs_dir = tmp_path / "runs"
+    runs_dir.mkdir()
+    journal(runs_dir, "2026-09-01_10-00-00_000000", "2026-09-01", 3)
+    current = journal(runs_dir, "2026-10-15_10-00-00_000000", "2026-10-15", 2)
+
+    # organize adds its own run first, report syncs afterwards
+    history = HistoryStore(tmp_path / "history")
+    assert history.add_run(current.run_id, iter_records(current.path)) == 2
+    assert history.sync(runs_dir) == {"runs": 1, "records": 3}
+    assert history.sync(runs_dir) == {"runs": 0, "records": 0}
+
+    assert history.trends(period="month") == [
+        {"period": "2026-09", "category": "PDFs", "files": 3, "bytes": 30},
+        {"period": "2026-10", "category": "PDFs", "files": 2, "bytes": 20},
+    ]
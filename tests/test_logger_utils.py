@@ -0,0 +1,32 @@
+import logging
+
+from src.logger_utils import _SizeRotatingHandler
+
+
+def _record(msg):
+    return logging.LogRecord("t", logging.INFO, __file__, 1, msg, None, None)
+
+
+def test_size_counts_encoded_bytes(tmp_path):
+    path = tmp_path / "app.log"
+    handler = _SizeRotatingHandler(path, maxBytes=10_000, backupCount=1, encoding="utf-8")
+    try:
+        handler.emit(_record("é" * 100))
+        handler.emit(_record("plain"))
+        handler.flush()
+        assert handler._size == path.stat().st_size == 200 + 1 + 5 + 1
+    finally:
+        handler.close()
+
+
+def test_rotates_on_bytes_not_characters(tmp_path):
+    path = tmp_path / "app.log"
+    handler = _SizeRotatingHandler(path, maxBytes=150, backupCount=1, encoding="utf-8")
+    try:
+        handler.emit(_record("é" * 60))   # 121 bytes, 61 characters
+        handler.emit(_record("é" * 20))   # would pass 150 bytes: rotates first
+        handler.flush()
+        assert (tmp_path / "app.log.1").stat().st_size == 121
+        assert path.stat().st_size == 41
+    finally:
+        handler.close()
@@ -0,0 +1,134 @@
+import json
+import socketserver
+import threading
+
+import pytest
+
+from src import mailqueue
+from src.mailqueue import MailQueue
+
+
+SMTP = {"host": "localhost", "port": 1, "starttls": False, "from_addr": "me@x.com"}
+
+
+def test_item_that_cannot_be_planned_goes_to_dead(tmp_path, monkeypatch, caplog):
+    def broken_plan(*args, **kwargs):
+        raise ValueError("oversize must be one of ('split', 'path')")
+
+    monkeypatch.setattr(mailqueue, "plan_attachment", broken_plan)
+    attachment = tmp_path / "report.xlsx"
+    attachment.write_bytes(b"x")
+
+    queue = MailQueue(SMTP, queue_dir=tmp_path / "queue")
+    queue.enqueue("a@x.com", "Report", "Hi", attachment)
+
+    assert queue.deliver_due() == {"sent": 0, "retry": 0, "dead": 1}
+    assert list((tmp_path / "queue").glob("*.json")) == []
+    dead = list((tmp_path / "queue" / "dead").glob("*.json"))
+    assert len(dead) == 1
+    assert json.loads(dead[0].read_text())["last_error"].startswith("ValueError")
+    assert "Traceback" in caplog.text
+    assert queue._next_try() is None
+
+
+def test_malformed_queue_file_goes_to_dead(tmp_path):
+    queue = MailQueue(SMTP, queue_dir=tmp_path / "queue")
+    (tmp_path / "queue" / "20240101000000_broken.json").write_text("{not json")
+    (tmp_path / "queue" / "20240101000001_list.json").write_text("[]")
+
+    queue.deliver_due()
+
+    assert list((tmp_path / "queue").glob("*.json")) == []
+    assert len(list((tmp_path / "queue" / "dead").glob("*.json"))) == 2
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, make_message, from_addr, to):
+        self.messages.append(b"".join(make_message()))
+
+    def close(self):
+        pass
+
+
+def test_copied_attachment_survives_the_original(tmp_path):
+    excerpt = tmp_path / "alert_1.log"
+    excerpt.write_text("boom\n")
+
+    queue = MailQueue(SMTP, queue_dir=tmp_path / "queue")
+    queue._conn = _FakeConnection()
+    msg_id = queue.enqueue("a@x.com", "Failed", "See log", excerpt, copy_attachment=True)
+    excerpt.unlink()   # pruned by the alert gate before the queue sends
+
+    assert queue.deliver_due() == {"sent": 1, "retry": 0, "dead": 0}
+    assert b'filename="alert_1.log"' in queue._conn.messages[0]
+    assert not (tmp_path / "queue" / "work" / msg_id).exists()
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """A minimal SMTP server: no TLS, no login, HELO / EHLO required before MAIL."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        greeted = False
+        self.reply("220 localhost ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                greeted = True
+                self.reply("250 localhost")
+            elif command.startswith("MAIL") and not greeted:
+                self.reply("503 Error: send HELO first")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b""
+                while not data.endswith(b"\r\n.\r\n"):
+                    data += self.rfile.readline()
+                self.server.messages.append(data)
+                self.reply("250 OK: queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+    server.daemon_threads = True
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sends_to_a_local_server_without_tls_or_login(tmp_path, smtp_server):
+    smtp = {"host": "127.0.0.1", "port": smtp_server.server_address[1], "starttls": False,
+            "from_addr": "me@x.com", "timeout": 5}
+    report = tmp_path / "report.csv"
+    report.write_text("a,b\n1,2\n")
+
+    queue = MailQueue(smtp, queue_dir=tmp_path / "queue")
+    queue.enqueue("a@x.com, b@y.com", "Report", "Hi", report)
+    queue.enqueue("a@x.com", "Second", "Same session")
+
+    assert queue.deliver_due() == {"sent": 2, "retry": 0, "dead": 0}
+    queue.close()
+    assert len(smtp_server.messages) == 2
+    assert b"Subject: Report" in smtp_server.messages[0]
+    assert b'filename="report.csv"' in smtp_server.messages[0]
+    assert queue.smtp_stats["connects"] == 1
@@ -0,0 +1,59 @@
+import os
+import threading
+
+from src import organizer
+from src.organizer import organize_folder
+
+
+CATEGORIES = {"Documents": [".txt"]}
+
+
+def test_moves_are_recorded_as_they_finish(tmp_path, monkeypatch):
+    for i in range(9):
+        (tmp_path / f"file_{i}.txt").write_text(str(i))
+    lock = threading.Lock()
+    records = []
+    others_recorded = threading.Event()
+    seen_before_slow_finished = []
+    slow = []
+
+    real_move = organizer._move_planned
+
+    def move(item, index):
+        with lock:
+            first = not slow
+            slow.append(item[0])
+        if first:
+            # The first move stays in flight until every other move is in the journal
+            others_recorded.wait(2)
+            seen_before_slow_finished.append(len(records))
+        return real_move(item, index)
+
+    def on_record(rec):
+        records.append(rec)
+        if len(records) == 8:
+            others_recorded.set()
+
+    monkeypatch.setattr(organizer, "_move_planned", move)
+    _, summary = organize_folder(tmp_path, "Organized", CATEGORIES, "Others", [], workers=2,
+                                 on_record=on_record)
+
+    assert seen_before_slow_finished == [8]
+    assert summary["moved_count"] == 9
+    assert sorted(os.path.basename(r["dst"]) for r in records) == [f"file_{i}.txt" for i in range(9)]
+
+
+def test_hardlinked_duplicates_with_workers(tmp_path):
+    for i in range(6):
+        (tmp_path / f"copy_{i}.txt").write_text("same content")
+    (tmp_path / "other.txt").write_text("different")
+
+    moved, summary = organize_folder(tmp_path, "Organized", CATEGORIES, "Others", [], workers=4,
+                                     dedupe={"action": "hardlink", "include_organized": False})
+
+    links = [r for r in moved if r.get("action") == "hardlinked"]
+    assert len(links) == 5
+    kept = {r["duplicate_of"] for r in links}
+    assert len(kept) == 1 and os.path.exists(kept.pop())
+    assert all(os.path.samefile(r["dst"], r["duplicate_of"]) for r in links)
+    assert summary["moved_count"] == 7
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+from src import organizer
+from src.organizer import place_no_clobber, safe_move
+
+
+@pytest.fixture(params=["native", "placeholder"])
+def mode(request, monkeypatch):
+    if request.param == "placeholder":
+        # As on a filesystem / OS without renameat2(RENAME_NOREPLACE)
+        monkeypatch.setattr(organizer, "_renameat2", None)
+    return request.param
+
+
+def test_same_drive_move_is_a_rename(tmp_path, mode):
+    src = tmp_path / "a.pdf"
+    src.write_text("data")
+    inode = src.stat().st_ino
+
+    place_no_clobber(src, tmp_path / "b.pdf")
+
+    assert not src.exists()
+    assert (tmp_path / "b.pdf").read_text() == "data"
+    assert (tmp_path / "b.pdf").stat().st_ino == inode
+
+
+def test_existing_destination_is_never_overwritten(tmp_path, mode):
+    src = tmp_path / "a.pdf"
+    src.write_text("new")
+    (tmp_path / "b.pdf").write_text("old")
+
+    with pytest.raises(FileExistsError):
+        place_no_clobber(src, tmp_path / "b.pdf")
+
+    assert src.read_text() == "new"
+    assert (tmp_path / "b.pdf").read_text() == "old"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="symlinks need privileges on Windows")
+def test_symlink_is_moved_as_a_link(tmp_path, mode):
+    target = tmp_path / "target.txt"
+    target.write_text("data")
+    link = tmp_path / "link.txt"
+    link.symlink_to(target)
+
+    place_no_clobber(link, tmp_path / "moved.txt")
+
+    assert os.path.islink(tmp_path / "moved.txt")
+    assert os.readlink(tmp_path / "moved.txt") == str(target)
+
+
+def test_safe_move_picks_the_next_free_name(tmp_path, mode):
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "a.pdf").write_text("old")
+    src = tmp_path / "a.pdf"
+    src.write_text("new")
+
+    final = safe_move(src, tmp_path / "out" / "a.pdf")
+
+    assert final.name == "a (1).pdf"
+    assert final.read_text() == "new"
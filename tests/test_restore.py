@@ -0,0 +1,59 @@
+from src.organizer import DestinationIndex
+from src.restore import _move_back, restore_run
+
+
+def record(src, dst, category="PDFs", **extra):
+    return {"src": str(src), "dst": str(dst), "category": category, "dry_run": False, **extra}
+
+
+def test_files_go_back_to_their_original_paths(tmp_path):
+    (tmp_path / "Organized" / "PDFs").mkdir(parents=True)
+    moved = tmp_path / "Organized" / "PDFs" / "a.pdf"
+    moved.write_text("a")
+
+    counts = restore_run([record(tmp_path / "sub" / "a.pdf", moved)], workers=1)
+
+    assert counts == {"restored": 1, "missing": 0, "skipped": 0}
+    assert (tmp_path / "sub" / "a.pdf").read_text() == "a"
+
+
+def test_taken_original_path_gets_a_numbered_name(tmp_path):
+    (tmp_path / "Organized").mkdir()
+    moved = tmp_path / "Organized" / "a.pdf"
+    moved.write_text("restored")
+    (tmp_path / "a.pdf").write_text("new file")
+
+    results = []
+    restore_run([record(tmp_path / "a.pdf", moved)], workers=1, on_record=results.append)
+
+    assert results[0]["restored_to"] == str(tmp_path / "a (1).pdf")
+    assert (tmp_path / "a.pdf").read_text() == "new file"
+
+
+def test_name_taken_after_planning_is_numbered_from_the_original_name(tmp_path):
+    (tmp_path / "a.pdf").write_text("was there")
+    moved = tmp_path / "moved.pdf"
+    moved.write_text("restored")
+
+    index = DestinationIndex()
+    planned = index.reserve(tmp_path / "a.pdf")
+    assert planned.name == "a (1).pdf"
+    # Another program takes the planned name before the move runs
+    (tmp_path / "a (1).pdf").write_text("someone else")
+
+    final = _move_back((moved, planned, tmp_path / "a.pdf"), index)
+
+    assert final.name == "a (2).pdf"
+    assert final.read_text() == "restored"
+
+
+def test_missing_and_skipped_records_are_counted(tmp_path):
+    records = [
+        record(tmp_path / "gone.pdf", tmp_path / "Organized" / "gone.pdf"),
+        record(tmp_path / "dup.pdf", tmp_path / "dup.pdf", action="skipped"),
+        record(tmp_path / "x.jpg", tmp_path / "Organized" / "x.jpg", category="Images"),
+    ]
+
+    counts = restore_run(records, categories=["PDFs"], workers=1)
+
+    assert counts == {"restored": 0, "missing": 1, "skipped": 2}
@@ -0,0 +1,58 @@
+from src.rules import compile_rules
+
+
+def test_backreference_rule():
+    matcher = compile_rules([
+        {"category": "Plain", "regex": "^report"},
+        {"category": "Doubled", "regex": r"^(\w)\1"},
+    ])
+
+    assert matcher.classify("aab.txt") == "Doubled"
+    assert matcher.classify("abc.txt") is None
+    assert matcher.classify("report.txt") == "Plain"
+
+
+def test_inline_flag_in_a_later_rule():
+    matcher = compile_rules([
+        {"category": "Scans", "regex": r"^scan\d+"},
+        {"category": "Notes", "regex": r"(?x) ^ note [_-]? \d+"},
+    ])
+
+    assert matcher.classify("scan12.pdf") == "Scans"
+    assert matcher.classify("note_7.txt") == "Notes"
+    assert matcher.classify("note 7.txt") is None
+
+
+def test_same_group_name_in_two_rules():
+    matcher = compile_rules([
+        {"category": "Invoices", "regex": r"^invoice_(?P<year>\d{4})"},
+        {"category": "Receipts", "regex": r"^receipt_(?P<year>\d{4})"},
+    ])
+
+    assert matcher.classify("invoice_2024.pdf") == "Invoices"
+    assert matcher.classify("receipt_2023.pdf") == "Receipts"
+
+
+def test_first_matching_rule_wins_across_combined_and_separate_regexes():
+    matcher = compile_rules([
+        {"category": "Grouped", "regex": r"^(a)\1"},
+        {"category": "Plain", "regex": "^a"},
+        {"category": "Later grouped", "regex": r"^(b)"},
+        {"category": "Any", "regex": "."},
+    ])
+
+    assert matcher.classify("aa.txt") == "Grouped"
+    assert matcher.classify("ab.txt") == "Plain"
+    assert matcher.classify("b.txt") == "Later grouped"
+    assert matcher.classify("c.txt") == "Any"
+
+
+def test_separate_regex_with_failed_size_check_falls_through():
+    matcher = compile_rules([
+        {"category": "Big doubled", "regex": r"^(\w)\1", "min_size_mb": 1},
+        {"category": "Doubled", "regex": "^aa"},
+    ], {"Docs": [".txt"]})
+
+    assert matcher.classify("aa.txt", size=10) == "Doubled"
+    assert matcher.classify("aa.txt", size=2 * 1024 * 1024) == "Big doubled"
+    assert matcher.classify("xy.txt", size=10) == "Docs"
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from src.scheduler import StageScheduler
+
+
+LOGGER = logging.getLogger("test_scheduler")
+
+
+def make_stage(name, order, seconds=0.0, fail=False):
+    def stage():
+        order.append(name)
+        time.sleep(seconds)
+        if fail:
+            raise RuntimeError(f"{name} broke")
+        return name
+    return stage
+
+
+def add_pipeline(scheduler, order, fail=()):
+    scheduler.add("organize", make_stage("organize", order, fail="organize" in fail))
+    scheduler.add("report", make_stage("report", order, fail="report" in fail), needs=["organize"])
+    scheduler.add("backup", make_stage("backup", order, fail="backup" in fail), needs=["organize"])
+    scheduler.add("email", make_stage("email", order, fail="email" in fail), needs=["report"])
+
+
+def test_one_worker_runs_in_the_order_added():
+    order = []
+    scheduler = StageScheduler(LOGGER, max_workers=1)
+    add_pipeline(scheduler, order)
+
+    results = scheduler.run()
+
+    assert order == ["organize", "report", "backup", "email"]
+    assert results == {s: s for s in order}
+
+
+def test_one_worker_starts_nothing_after_a_failure():
+    order = []
+    scheduler = StageScheduler(LOGGER, max_workers=1)
+    add_pipeline(scheduler, order, fail=["report"])
+
+    with pytest.raises(RuntimeError, match="report broke"):
+        scheduler.run()
+
+    assert order == ["organize", "report"]
+
+
+def test_failed_need_skips_dependents():
+    order = []
+    scheduler = StageScheduler(LOGGER, max_workers=4)
+    add_pipeline(scheduler, order, fail=["organize"])
+
+    with pytest.raises(RuntimeError, match="organize broke"):
+        scheduler.run()
+
+    assert order == ["organize"]
+
+
+def test_independent_stages_overlap():
+    both_running = threading.Barrier(2, timeout=5)
+
+    def waits():
+        # Only passes if the other stage runs at the same time
+        both_running.wait()
+
+    scheduler = StageScheduler(LOGGER, max_workers=2)
+    scheduler.add("report", waits)
+    scheduler.add("backup", waits)
+
+    assert set(scheduler.run()) == {"report", "backup"}
+
+
+def test_first_failure_is_raised_and_running_stages_finish():
+    order = []
+    scheduler = StageScheduler(LOGGER, max_workers=2)
+    scheduler.add("report", make_stage("report", order, fail=True))
+    scheduler.add("backup", make_stage("backup", order, seconds=0.2))
+
+    with pytest.raises(RuntimeError, match="report broke"):
+        scheduler.run()
+
+    assert sorted(order) == ["backup", "report"]
+
+
+def test_missing_need_is_ignored():
+    order = []
+    scheduler = StageScheduler(LOGGER, max_workers=1)
+    scheduler.add("report", make_stage("report", order), needs=["organize"])
+
+    assert scheduler.run() == {"report": "report"}
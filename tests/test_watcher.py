@@ -0,0 +1,32 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from src.watcher import watch_folder
+
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="watch mode needs inotify")
+
+
+def test_catch_up_skips_partial_downloads_and_sees_new_files(tmp_path):
+    (tmp_path / "done.pdf").write_text("x")
+    (tmp_path / "movie.mp4.crdownload").write_text("still downloading")
+
+    batches = []
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_folder, args=(tmp_path, lambda b: batches.extend(e.name for e in b)),
+                               kwargs={"settle_seconds": 0.2, "batch_window_seconds": 0.05,
+                                       "partial_suffixes": [".crdownload"], "stop_event": stop})
+    watcher.start()
+    time.sleep(0.05)
+    (tmp_path / "new.txt").write_text("y")
+
+    deadline = time.monotonic() + 5
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stop.set()
+    watcher.join()
+
+    assert sorted(batches) == ["done.pdf", "new.txt"]
@@ -0,0 +1,80 @@
+import os
+import random
+import zipfile
+
+import pytest
+
+from src import zipwriter
+from src.compression import CompressionStats
+from src.zipwriter import ParallelZipWriter
+
+
+BLOCK = 4096
+
+
+def sample_files(root):
+    rng = random.Random(7)
+    text = " ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(20_000)).encode()
+    files = {
+        "empty.txt": b"",
+        "one_byte.txt": b"x",
+        "Docs/exact_blocks.txt": text[:3 * BLOCK],
+        "Docs/many_blocks.txt": text[:10 * BLOCK + 123],
+        "Docs/one_block.txt": text[:BLOCK - 1],
+        "Images/random.bin": rng.randbytes(5 * BLOCK + 7),
+    }
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+@pytest.mark.parametrize("method", ["store", "fast", "deflate", "bzip2", "lzma"])
+def test_round_trip(tmp_path, monkeypatch, method, parallel):
+    if not parallel:
+        monkeypatch.setattr(zipwriter, "_has_internals", lambda zf: False)
+    files = sample_files(tmp_path / "src")
+    zip_path = tmp_path / "out.zip"
+    stats = CompressionStats()
+
+    with ParallelZipWriter(zip_path, workers=3, block_size=BLOCK, stats=stats) as zw:
+        assert zw.parallel is parallel
+        for rel in files:
+            zw.add(str(tmp_path / "src" / rel), rel, method)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(files)
+        for rel, data in files.items():
+            assert zf.read(rel) == data
+            assert zf.getinfo(rel).compress_type == zipwriter.METHODS[method][0]
+    assert stats.overall()["files"] == len(files)
+    assert stats.overall()["bytes_in"] == sum(len(d) for d in files.values())
+
+
+def test_mixed_methods_and_zip_folder(tmp_path):
+    from src.backup import zip_folder
+    from src.compression import CompressionPolicy
+
+    files = sample_files(tmp_path / "src")
+    zip_path = zip_folder(tmp_path / "src", tmp_path / "out.zip", workers=4, policy=CompressionPolicy())
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert {rel: zf.read(rel) for rel in zf.namelist()} == files
+
+
+def test_unreadable_file_is_refused_before_anything_is_written(tmp_path):
+    files = sample_files(tmp_path / "src")
+    zip_path = tmp_path / "out.zip"
+
+    with ParallelZipWriter(zip_path, workers=2, block_size=BLOCK) as zw:
+        with pytest.raises(FileNotFoundError):
+            zw.add(str(tmp_path / "src" / "missing.txt"), "missing.txt")
+        zw.add(str(tmp_path / "src" / "one_byte.txt"), "one_byte.txt")
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["one_byte.txt"]